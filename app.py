@@ -0,0 +1,1291 @@
+import os
+import re
+import time
+import atexit
+import threading
+import traceback
+from decimal import Decimal, InvalidOperation
+import psycopg2
+from colorama import Fore
+import colorama
+import numpy as np
+from psycopg2 import sql
+from dotenv import load_dotenv
+from trending import TrendingTracker, bootstrap_from_db
+from vector_search import ShardedIndex
+from text_batcher import TextEncodeBatcher
+from catalog_state import Catalog, LocalCatalog, SharedCatalog
+from lazy import LazyResource
+from statements import statements, UPDATABLE_PRODUCT_FIELDS, BROWSE_SORTS
+from transactions import TransactionManager
+from replicas import ReplicaPool, parse_dsns
+from exceptions import NotFoundError, InsufficientStockError, InsufficientFundsError
+from ledger import checkout, start_settling, respread_stock
+from image_query import ImageEmbeddingCache
+from facets import FacetIndex
+from rerank import RankFeatures, parse_weights
+from product_columns import ProductColumns, load_from_db as load_products, start_listening
+
+#--------------------- CONSTANTS --------------------------#
+
+PROJECT_NAME = "MUSINSA CLONE BACKEND"
+GENDERS = {
+    "남성": "Male",
+    "여성": "Female",
+    "기타": "Other",
+    "공용": "Unisex"
+}
+
+PRODUCT_FIELD_MAP = {
+    "이름": "goods_name",
+    "이미지 URL": "image_link",
+    "성별": "sex",
+    "카테고리": "category",
+    "가격": "price",
+    "수량": "stock_quantity"
+}
+
+ITEM_DB_PATH = './data/itemDB.csv'
+TRENDING_CHECKPOINT = './data/trending.pkl'
+SEARCH_WORKERS = int(os.getenv('SEARCH_WORKERS', os.cpu_count() or 1))
+SEARCH_MODE = os.getenv('SEARCH_MODE', 'thread')
+TEXT_BATCH_MAX_SIZE = int(os.getenv('TEXT_BATCH_MAX_SIZE', 32))
+TEXT_BATCH_MAX_WAIT_MS = float(os.getenv('TEXT_BATCH_MAX_WAIT_MS', 5))
+# style-search text encoder: fashion_clip (PyTorch) or onnx (int8 text tower, see text_onnx.py)
+TEXT_ENCODER = os.getenv('TEXT_ENCODER', 'fashion_clip')
+TEXT_ENCODER_DIR = os.getenv('TEXT_ENCODER_DIR', './data/text-onnx')
+TEXT_ENCODER_THREADS = int(os.getenv('TEXT_ENCODER_THREADS', 0))  # 0: onnxruntime default
+WARM_ON_STARTUP = os.getenv('WARM_ON_STARTUP', '1') == '1'
+STYLE_FUSION = os.getenv('STYLE_FUSION', 'sum')  # how multi-phrase style searches combine: sum / rrf
+RRF_K = int(os.getenv('RRF_K', 60))
+BROWSE_PAGE_SIZE = 10
+BROWSE_MAX_PRICE = 100000000  # above DECIMAL(10, 2)
+BROWSE_MAX_ID = 2147483647
+IMAGE_CACHE_DIR = os.getenv('IMAGE_CACHE_DIR', './data/image_cache')
+IMAGE_CACHE_SIZE = int(os.getenv('IMAGE_CACHE_SIZE', 1024))
+IMAGE_CACHE_DISK_SIZE = int(os.getenv('IMAGE_CACHE_DISK_SIZE', 10000))  # files in IMAGE_CACHE_DIR
+IMAGE_CACHE_MAX_AGE_DAYS = float(os.getenv('IMAGE_CACHE_MAX_AGE_DAYS', 30))
+LEDGER_SETTLE_SECONDS = float(os.getenv('LEDGER_SETTLE_SECONDS', 30))
+# style / image search re-ranking: vector candidates per search and the blend (see rerank.py)
+RERANK_CANDIDATES = int(os.getenv('RERANK_CANDIDATES', 50))
+RERANK_WEIGHTS = parse_weights(os.getenv('RERANK_WEIGHTS', ''))  # e.g. "popularity=0.1,in_stock=1"
+FEATURE_REFRESH_SECONDS = float(os.getenv('FEATURE_REFRESH_SECONDS', 30))
+PRODUCT_FULL_REFRESH_SECONDS = float(os.getenv('PRODUCT_FULL_REFRESH_SECONDS', 600))
+#--------------------- DB CONNECTION ----------------------#
+# importing this module only defines things: start() (called by FE.start()) opens the connections, loads
+# the in-memory indexes and starts the background jobs
+load_dotenv()
+
+db_name = os.getenv('PG_DBNAME')
+db_user = os.getenv('PG_USERNAME')
+db_password = os.getenv('PG_PASSWORD')
+db_host = os.getenv('PG_HOST')
+db_port = os.getenv('PG_PORT')
+
+def connect():
+    return psycopg2.connect(
+        dbname=db_name,
+        user=db_user,
+        password=db_password,
+        host=db_host,
+        port=db_port
+    )
+
+conn = None
+
+# optional read replicas for the read-only methods (PG_REPLICA_DSNS, ';'-separated libpq DSNs / URIs)
+replicas = ReplicaPool(parse_dsns(os.getenv('PG_REPLICA_DSNS')))
+
+# autocommit reads; one transaction per logical action through db.scope() / @db.transactional()
+# (the primary connection is attached by start_db())
+db = TransactionManager(replicas=replicas, read_your_writes=float(os.getenv('READ_YOUR_WRITES_SECONDS', 5)))
+
+ledger_settler = None
+
+def start_db():
+    global conn, ledger_settler
+    start_time = time.time()
+    print("DB Connecting...")
+    conn = connect()
+    db.attach(conn)
+    replicas.start_health_checks()
+    atexit.register(replicas.close)
+    # db's connection belongs to the FE thread; every background job below gets a connection of its own
+
+    # purchases credit sellers through seller_ledger; fold the credits into seller_account periodically
+    ledger_settler = start_settling(TransactionManager(connect()), LEDGER_SETTLE_SECONDS)
+    atexit.register(ledger_settler.set)
+    print("DB Connected!", f"({round(time.time()-start_time, 2)}s.)")
+
+# --------------------- TRENDING --------------------------#
+# streaming counters for trending products / popular queries (restored from the last checkpoint)
+trending = None
+
+def start_trending():
+    global trending
+    start_time = time.time()
+    print("Trending Loading...")
+    if os.path.exists(TRENDING_CHECKPOINT):
+        trending = TrendingTracker.load(TRENDING_CHECKPOINT)
+    else:
+        with db.scope(readonly=True):
+            trending = bootstrap_from_db(TrendingTracker(checkpoint_path=TRENDING_CHECKPOINT), conn)
+    trending.start_checkpointing()
+    atexit.register(trending.stop_checkpointing)
+    print("Trending Loaded!", f"({round(time.time()-start_time, 2)}s.)")
+# --------------------- RANK FEATURES ---------------------#
+# orders / impressions / stock per product for re-ranking style search candidates (stock: see below)
+rank_features = None
+rank_feature_refresher = threading.Event()
+
+def rank_feature_loop(stop):
+    # new buylog / searchresult rows every FEATURE_REFRESH_SECONDS
+    feature_db = TransactionManager(connect())
+    while not stop.wait(FEATURE_REFRESH_SECONDS):
+        try:
+            feature_db.run(lambda: rank_features.refresh(feature_db.cursor()), readonly=True)
+        except psycopg2.Error as e:
+            print(f"Rank feature refresh failed: {e}")
+
+def start_rank_features():
+    global rank_features
+    start_time = time.time()
+    print("Rank Features Loading...")
+    rank_features = db.run(lambda: RankFeatures().refresh(db.cursor()), readonly=True)
+    threading.Thread(target=rank_feature_loop, args=(rank_feature_refresher,), name="rank-features", daemon=True).start()
+    atexit.register(rank_feature_refresher.set)
+    print("Rank Features Loaded!", f"({round(time.time()-start_time, 2)}s.)")
+# --------------------- PRODUCTS --------------------------#
+# the in-memory copies of product: the columns for the name / sex / category searches, the category /
+# sex / price-bucket bitsets for filter menus and result-set counts, and the stock re-ranking uses.
+# All three are loaded from one read of product and then follow the product_change feed on one listener
+# thread (product_columns.py), which also delivers this process's own writes a moment after commit
+product_table = None
+facets = None
+product_listener = None
+
+def start_products():
+    global product_table, facets, product_listener
+    start_time = time.time()
+    print("Products Loading...")
+    product_table, facets = ProductColumns(), FacetIndex()
+    targets = [product_table, facets, rank_features]
+    product_feed = db.run(lambda: load_products(db.cursor(), targets), readonly=True)
+    product_listener = start_listening(connect, targets, product_feed, full_refresh=PRODUCT_FULL_REFRESH_SECONDS)
+    atexit.register(product_listener.set)
+    print("Products Loaded!", f"({round(time.time()-start_time, 2)}s.)")
+# --------------------- NL SEARCH RESOURCES ---------------#
+# the raw data (this works only for the NL search feature) and the fashion-clip model are loaded on
+# the first style search, or warmed in the background right after startup (WARM_ON_STARTUP)
+
+# sharded exact top-k over the embedding matrix, scored on SEARCH_WORKERS threads/processes;
+# rebuilt when the supervisor publishes a new catalog generation
+search_index_lock = threading.Lock()
+search_index = None
+
+def get_search_index(catalog):
+    global search_index
+    with search_index_lock:
+        if search_index is None or search_index[0] != catalog.generation:
+            if search_index:
+                # let in-flight searches on the previous generation finish first
+                threading.Timer(30, search_index[1].close).start()
+            # process workers map a shared generation's .npy file themselves instead of copying it
+            search_index = (catalog.generation, ShardedIndex(catalog.embeddings, n_workers=SEARCH_WORKERS, mode=SEARCH_MODE,
+                                                             path=catalog.embeddings_path))
+        return search_index[1]
+
+def close_search_index():
+    if search_index:
+        search_index[1].close()
+
+atexit.register(close_search_index)
+
+def load_catalog():
+    # under supervisor.py, CATALOG_DIR points at the shared catalog and this process only maps it read-only
+    catalog_dir = os.getenv('CATALOG_DIR')
+    source = SharedCatalog(catalog_dir) if catalog_dir else LocalCatalog(Catalog.from_csv(ITEM_DB_PATH))
+    get_search_index(source.current())
+    return source
+
+def load_fashion_clip():
+    from fashion_clip.fashion_clip import FashionCLIP
+    return FashionCLIP('fashion-clip')
+
+def load_text_model():
+    if TEXT_ENCODER == 'onnx':
+        from text_onnx import OnnxTextEncoder
+        return OnnxTextEncoder(TEXT_ENCODER_DIR, threads=TEXT_ENCODER_THREADS)
+    if TEXT_ENCODER != 'fashion_clip':
+        raise ValueError(f"unknown TEXT_ENCODER {TEXT_ENCODER!r} (fashion_clip / onnx)")
+    return fashion_clip.get()
+
+catalog_source = LazyResource("catalog", load_catalog)
+fashion_clip = LazyResource("fashion_clip", load_fashion_clip)
+text_model = LazyResource("text_encoder", load_text_model)
+
+# concurrent style searches share one encode_text forward pass
+text_encoder = TextEncodeBatcher(lambda texts, batch_size: text_model.get().encode_text(texts, batch_size=batch_size),
+                                 max_batch_size=TEXT_BATCH_MAX_SIZE, max_wait_ms=TEXT_BATCH_MAX_WAIT_MS)
+atexit.register(text_encoder.close)
+
+image_encoder = None
+
+def start_nl_search():
+    global image_encoder
+    # query photos are embedded once per distinct image content (prunes IMAGE_CACHE_DIR on creation)
+    image_encoder = ImageEmbeddingCache(lambda images: fashion_clip.get().encode_images(images, batch_size=len(images)),
+                                        capacity=IMAGE_CACHE_SIZE, cache_dir=IMAGE_CACHE_DIR,
+                                        disk_capacity=IMAGE_CACHE_DISK_SIZE, max_age=IMAGE_CACHE_MAX_AGE_DAYS * 86400)
+    if WARM_ON_STARTUP:
+        catalog_source.warm()
+        text_model.warm()
+        # with the onnx text encoder, FashionCLIP is only needed by image search and loads on its first use
+        if TEXT_ENCODER == 'fashion_clip':
+            fashion_clip.warm()
+# --------------------- STARTUP ---------------------------#
+started = False
+
+def start():
+    # everything the BE needs before serving: connections, in-memory indexes, background jobs
+    global started
+    if started:
+        return
+    started = True
+    start_db()
+    start_trending()
+    start_rank_features()
+    start_products()
+    start_nl_search()
+# --------------------- UTILS -----------------------------#
+
+colorama.init(autoreset=True)
+
+def get_choice(*args, msg="", get_label=False):
+    print(f"{msg if msg else '옵션을 선택해 주세요.'} (1-{len(args)}):")
+    for i, arg in enumerate(args):
+        print(f"  {Fore.YELLOW}{i+1}. {Fore.WHITE}{arg}")
+    while True:
+        try:
+            c = int(input())
+            if c not in range(1, len(args) + 1):
+                print(f"{Fore.RED}유효한 입력이 아닙니다. 1과 {len(args)} 사이의 숫자를 입력해 주세요.")
+            else:
+                return args[c - 1] if get_label else c
+        except ValueError:
+            print(f"{Fore.RED}유효한 숫자를 입력해 주세요.")
+
+
+def get_choice_list(options, msg="", get_label=False):
+    print(f"{msg if msg else 'Please choose an option'}")
+    for i, arg in enumerate(options):
+        print(f"{i+1}. {arg}")
+    while True:
+        c = int(input(f"Enter your choice (1-{len(options)}): "))
+        if c not in range(1, len(options)+1):
+            print(f"Invalid choice. Please enter a number between 1 and {len(options)}.")
+        else:
+            return options[c - 1] if get_label else c
+
+def get_numchoice():
+    top_k = None
+    while type(top_k) != int:
+        try:
+            top_k = int(input('얼마나 많은 수량을 찾으시겠습니까? (1~10): '))
+        except:
+            print('1~10 사이의 숫자를 입력해 주세요')
+    return top_k
+
+def parse_style_terms(text):
+    # "oversized + black - logo*0.5" -> [("oversized", 1.0), ("black", 1.0), ("logo", -0.5)]
+    # (+/- only separate phrases when surrounded by spaces, so "t-shirt" stays one phrase)
+    parts = re.split(r"(?:^|\s+)([+-])\s+", text.strip())
+    terms = []
+    for sign, term in zip(['+'] + parts[1::2], parts[0::2]):
+        phrase, _, weight = term.partition('*')
+        if phrase.strip():
+            weight = float(weight) if weight.strip() else 1.0
+            terms.append((phrase.strip(), -weight if sign == '-' else weight))
+    return terms
+
+def clear():
+    os.system('clear')
+    # can vary depending on the OS
+# --------------------- BACKEND ----------------------------#
+
+class BE:
+    def get_user(self, user_id):
+        cursor = db.cursor()
+        statements.execute(cursor, 'get_user', (user_id,))
+        result = cursor.fetchone()
+        if not result:
+            raise NotFoundError()
+        return {
+            "user_id": result[0],
+            "username": result[1],
+            "sex": result[3],
+            "email": result[4],
+            "date_of_birth": result[5],
+            "user_account": result[6]
+        }
+
+    def sign_in(self, username, password):
+        cursor = db.cursor()
+        statements.execute(cursor, 'sign_in', (username, password))
+        result = cursor.fetchone()
+        if not result:
+            raise NotFoundError()
+        return {
+            "user_id": result[0],
+            "username": result[1],
+            "sex": result[3],
+            "email": result[4],
+            "date_of_birth": result[5],
+            "user_account": result[6]
+        }
+
+    @db.transactional()
+    def sign_up(self, username, email, password, sex, birthday):
+        cursor = db.cursor()
+        cursor.execute("""
+            insert into users (username, email, password, sex, date_of_birth)
+            values (%s, %s, %s, %s, %s)
+            returning user_id""", (username, email, password, sex, birthday))
+        return cursor.fetchone()[0]
+
+    @db.transactional()
+    def charge_account(self, user_id, amount):
+        cursor = db.cursor()
+        statements.execute(cursor, 'charge_account', (amount, user_id))
+
+    def seller_login(self, seller_name, password):
+        cursor = db.cursor()
+        statements.execute(cursor, 'seller_login', (seller_name, password))
+        result = cursor.fetchone()
+        if not result:
+            raise NotFoundError()
+        return {
+            "seller_id": result[0],
+            "seller_name": result[1],
+            "contact_email": result[3],
+            "seller_account": result[4]
+        }
+
+    @db.transactional(pin_reads=False)
+    def add_searchlog(self, user_id, search_query):
+        cursor = db.cursor()
+        statements.execute(cursor, 'add_searchlog', (user_id, search_query))
+        return cursor.fetchone()[0]
+
+    @db.transactional(pin_reads=False)
+    def add_searchresult(self, searchlog_id, product_id, rank):
+        cursor = db.cursor()
+        statements.execute(cursor, 'add_searchresult', (searchlog_id, product_id, rank))
+        return cursor.fetchone()[0]
+
+    @db.transactional(pin_reads=False)
+    def log_search(self, user_id, search_query, products):
+        # one searchlog row per shown product, each with its rank; all of them in one transaction
+        rank = 1
+        for product in products:
+            searchlog_id = self.add_searchlog(user_id=user_id, search_query=search_query)
+            self.add_searchresult(searchlog_id, product['product_id'], rank)
+            rank += 1
+        if products:
+            db.after_commit(lambda: trending.record_query(search_query))
+
+    def catalog_products(self, catalog, indecies, similarities=None):
+        # catalog rows -> product dicts, in the given order (rows whose product is gone are skipped)
+        cursor = db.cursor()
+        goods_name = catalog.goods_name.take(indecies.tolist())
+        statements.execute(cursor, 'products_by_names', (goods_name,))
+        by_name = {result[1]: result for result in cursor.fetchall()}
+        products = []
+        for i, gn in enumerate(goods_name):
+            if gn not in by_name:
+                continue
+            result = by_name[gn]
+            products.append({
+                "product_id": result[0],
+                "goods_name": result[1],
+                "image_link": result[2],
+                "sex": result[3],
+                "category": result[4],
+                "price": result[5]
+            })
+            if similarities is not None:
+                products[-1]["similarity"] = float(similarities[i])
+        return products
+
+    # the searches below read through these @db.replica_read() helpers and write their searchlog on the
+    # primary afterwards: a replica failover re-runs the whole decorated function, which must not repeat a write
+    @db.replica_read()
+    def nl_products(self, query_embedding, top_k):
+        # top_k products for an L2-normalized FashionCLIP embedding (text or image), best first
+        # Cos Sim over the top RERANK_CANDIDATES, then re-ranked with sales / conversion / stock
+        catalog = catalog_source.get().current()
+        indecies, similarities = get_search_index(catalog).search(query_embedding, max(top_k, RERANK_CANDIDATES))
+        products = self.catalog_products(catalog, indecies, similarities)
+        return rank_features.rerank(products, top_k, RERANK_WEIGHTS)
+
+    @db.replica_read()
+    def fused_products(self, text_embeddings, weights, top_k, fusion):
+        catalog = catalog_source.get().current()
+        # a weighted sum (of per-phrase z-normalized scores, mapped back to cosines) is on the scale the
+        # re-ranking weights assume; RRF scores are not
+        depth = max(top_k, RERANK_CANDIDATES) if fusion == 'sum' else top_k
+        indecies, similarities = get_search_index(catalog).search_fused(
+            text_embeddings, weights, depth, method=fusion, rrf_k=RRF_K)
+        products = self.catalog_products(catalog, indecies, similarities)
+        if fusion == 'sum':
+            products = rank_features.rerank(products, top_k, RERANK_WEIGHTS)
+        return products
+
+    @db.replica_read()
+    def browse_rows(self, sort, category, params):
+        cursor = db.cursor()
+        if category:
+            statements.execute(cursor, f'browse_{sort}_category', params + (category,))
+        else:
+            statements.execute(cursor, f'browse_{sort}', params)
+        return cursor.fetchall()
+
+    def search_nl(self, search_keyword, top_k, user_id):
+        # search_keyword embedding
+        text_embeddings = text_encoder.encode('a photo of ' + search_keyword)[np.newaxis, :]
+        text_embeddings = text_embeddings/np.linalg.norm(text_embeddings, ord=2, axis=-1, keepdims=True)
+        products = self.nl_products(text_embeddings[0], top_k)
+        # update searchlog
+        self.log_search(user_id, f"Search Style: {search_keyword}", products)
+
+        return products
+
+    def search_styles(self, terms, top_k, user_id, fusion=None):
+        # terms: [(phrase, weight), ...], negative weights push matching items down
+        # all phrases share one encode_text batch and one pass over the catalog, then are fused (sum / rrf)
+        text_embeddings = text_encoder.encode_many(['a photo of ' + phrase for phrase, _ in terms])
+        text_embeddings = text_embeddings/np.linalg.norm(text_embeddings, ord=2, axis=-1, keepdims=True)
+        products = self.fused_products(text_embeddings, [weight for _, weight in terms], top_k, fusion or STYLE_FUSION)
+        # update searchlog
+        query = " ".join(f"{'-' if weight < 0 else '+'} {phrase}*{abs(weight):g}" for phrase, weight in terms)
+        self.log_search(user_id, f"Search Styles: {query}", products)
+
+        return products
+
+    def search_image(self, image, top_k, user_id):
+        # image: a local file path or the image bytes
+        image_embedding, image_hash = image_encoder.embed(image)
+        products = self.nl_products(image_embedding, top_k)
+        # update searchlog
+        label = os.path.basename(image) if isinstance(image, str) else image_hash[:12]
+        self.log_search(user_id, f"Search Image: {label}", products)
+
+        return products
+
+    def search_sex(self, sex, top_k, user_id): # split search and filter? or merge?
+        # answered from the in-memory product columns; the result is a RecordList of dict-like views
+        products = product_table.where(sex=sex)
+        if not products:
+            raise NotFoundError()
+        # update searchlog
+        self.log_search(user_id, f"Filter Sex: {sex}", products[:top_k])
+
+        return products
+
+    def search_category(self, category, top_k, user_id):
+        products = product_table.where(category=category)
+        if not products:
+            raise NotFoundError()
+        # update searchlog
+        self.log_search(user_id, f"Filter Category: {category}", products[:top_k])
+
+        return products
+
+    def browse_products(self, category=None, sex=None, min_price=None, max_price=None, sort='price_asc',
+                        in_stock=False, page_size=BROWSE_PAGE_SIZE, after=None, user_id=None):
+        # one page in sort order (BROWSE_SORTS), read from a covering index: the cost is that of the page, not
+        # of the category. after: the previous page's "next" cursor, None for the first page.
+        # in_stock looks at product.stock_quantity, which lags behind for sharded stock until the next settle
+        column, direction = BROWSE_SORTS[sort]
+        min_price = 0 if min_price is None else min_price
+        max_price = BROWSE_MAX_PRICE if max_price is None else max_price
+        first_page = after is None
+        if first_page:
+            # start just outside the range
+            if column == 'price':
+                after = (min_price, 0) if direction == 'ASC' else (max_price, BROWSE_MAX_ID)
+            else:
+                after = ('infinity', BROWSE_MAX_ID)
+        sexes = [sex] if isinstance(sex, str) else list(sex or ('Male', 'Female', 'Unisex'))
+        params = (after[0], after[1], min_price, max_price, sexes, 1 if in_stock else 0, page_size + 1)
+        rows = self.browse_rows(sort, category, params)
+        if first_page and not rows:
+            raise NotFoundError()
+        products = []
+        for result in rows[:page_size]:
+            products.append({
+                "product_id": result[0],
+                "goods_name": result[1],
+                "image_link": result[2],
+                "sex": result[3],
+                "category": result[4],
+                "price": result[5],
+                "stock_quantity": result[6],
+                "date_added": result[7]
+            })
+        last = products[-1] if products else None
+        next_page = (last[column], last["product_id"]) if len(rows) > page_size else None
+        # update searchlog (first page only)
+        if first_page and user_id is not None:
+            self.log_search(user_id, f"Browse: {category or 'all'}, {'/'.join(sexes)}, {min_price}~{max_price}, "
+                                     f"{sort}{', in stock' if in_stock else ''}", products)
+        return {"products": products, "next": next_page}
+
+    def search_name(self, name, top_k, user_id):
+        products = product_table.where(name=name)
+        if not products:
+            raise NotFoundError()
+        # update searchlog
+        self.log_search(user_id, f"Search name: {name}", products[:top_k])
+        return products
+
+    @db.replica_read()
+    def seller_info(self, seller_id):
+        cursor = db.cursor()
+        statements.execute(cursor, 'seller_info', (seller_id,))
+        result = cursor.fetchone()
+        if not result:
+            raise NotFoundError()
+        return {
+            "seller_id": result[0],
+            "seller_name": result[1],
+            "contact_email": result[3],
+            "seller_account": result[4]
+        }
+
+    @db.transactional()
+    def purchase(self, user_id, product_id, quantity):
+        cursor = db.cursor()
+        try:
+            # conditional stock / balance updates instead of FOR UPDATE checks; the seller is credited
+            # through the ledger, so concurrent checkouts do not queue on the seller row (see ledger.py)
+            category, sex = checkout(cursor, user_id, product_id, quantity)
+            db.after_commit(lambda: trending.record_purchase(product_id, category, sex, quantity))
+
+        except (Exception, psycopg2.DatabaseError) as error:
+            print(f"Error during purchase: {error}")
+            raise error
+
+    @db.replica_read()
+    def product_info(self, product_id, seller_id):
+        cursor = db.cursor()
+        statements.execute(cursor, 'product_info', (product_id, seller_id))
+        result = cursor.fetchone()
+        if not result:
+            raise NotFoundError()
+        return {
+            "product_id": result[0],
+            "goods_name": result[1],
+            "image_link": result[2],
+            "sex": result[3],
+            "category": result[4],
+            "price": result[5],
+            "seller_id": seller_id,  # Update to use self.authorized_seller['seller_id']
+            "stock_quantity": result[7],
+            "date_added": result[8]
+        }
+
+    @db.transactional()
+    def register_product(self, goods_name, image_link, sex, category, price, seller_id, stock_quantity):
+        cursor = db.cursor()
+        statements.execute(cursor, 'register_product',
+            (goods_name, image_link, sex, category, price, seller_id, stock_quantity))
+        return cursor.fetchone()[0]
+
+    @db.transactional()
+    def update_product(self, product_id, field_name, new_value, seller_id):
+        cursor = db.cursor()
+        if field_name not in UPDATABLE_PRODUCT_FIELDS:
+            raise ValueError(f"Field {field_name} cannot be updated.")
+        statements.execute(cursor, f'update_product_{field_name}', (new_value, product_id, seller_id))
+        if cursor.rowcount == 0:
+            raise NotFoundError("Product not found or unauthorized to update this product.")
+        if field_name == 'stock_quantity':
+            respread_stock(cursor, [product_id])
+
+    @db.transactional()
+    def delete_product(self, product_id, seller_id):
+        cursor = db.cursor()
+        statements.execute(cursor, 'delete_product', (product_id, seller_id))
+        if cursor.rowcount == 0:
+            raise NotFoundError()
+
+    @db.replica_read()
+    def get_purchase_history(self, user_id):
+        cursor = db.cursor()
+        cursor.execute("""SELECT goods_name, price, quantity, purchase_date FROM purchase_history WHERE user_id = %s ORDER BY purchase_date DESC;""", (user_id,))
+        return cursor.fetchall()
+
+    @db.replica_read()
+    def get_sales_history(self, seller_id):
+        cursor = db.cursor()
+        cursor.execute("""
+            SELECT ph.user_id, ph.username, ph.product_id, ph.goods_name, ph.price, ph.stock_quantity, ph.quantity,
+                TO_CHAR(ph.purchase_date, 'YYYY-MM-DD HH24:MI') AS purchase_date
+            FROM sales_history ph
+            WHERE ph.product_id IN (
+                SELECT product_id
+                FROM product
+                WHERE seller_id = %s
+            )
+            ORDER BY ph.purchase_date DESC;
+        """, (seller_id,))
+        return cursor.fetchall() # ADD: minchan
+
+    # --- seller bulk operations: files are streamed through COPY, so memory stays bounded ---
+
+    @db.transactional()
+    def import_products(self, seller_id, csv_file):
+        # CSV header: goods_name,image_link,sex,category,price,stock_quantity
+        # rows matching one of the seller's goods_name update that product, the rest are inserted
+        cursor = db.cursor()
+        cursor.execute("""
+            CREATE TEMP TABLE product_import (
+                line_no BIGSERIAL,
+                goods_name VARCHAR(255) NOT NULL,
+                image_link VARCHAR(255) NOT NULL,
+                sex product_sex_type NOT NULL,
+                category VARCHAR(100) NOT NULL,
+                price DECIMAL(10, 2) NOT NULL,
+                stock_quantity INT NOT NULL
+            ) ON COMMIT DROP""")
+        cursor.copy_expert("""
+            COPY product_import (goods_name, image_link, sex, category, price, stock_quantity)
+            FROM STDIN WITH (FORMAT csv, HEADER true)""", csv_file)
+        cursor.execute("""
+            WITH staged AS (
+                SELECT DISTINCT ON (goods_name) * FROM product_import ORDER BY goods_name, line_no DESC
+            ), updated AS (
+                UPDATE product p
+                SET image_link = s.image_link, sex = s.sex, category = s.category,
+                    price = s.price, stock_quantity = s.stock_quantity
+                FROM staged s
+                WHERE p.seller_id = %(seller_id)s AND p.goods_name = s.goods_name
+                RETURNING p.goods_name
+            ), inserted AS (
+                INSERT INTO product (goods_name, image_link, sex, category, price, seller_id, stock_quantity)
+                SELECT s.goods_name, s.image_link, s.sex, s.category, s.price, %(seller_id)s, s.stock_quantity
+                FROM staged s
+                WHERE NOT EXISTS (SELECT 1 FROM product p WHERE p.seller_id = %(seller_id)s AND p.goods_name = s.goods_name)
+                RETURNING 1
+            )
+            SELECT (SELECT COUNT(*) FROM inserted), (SELECT COUNT(DISTINCT goods_name) FROM updated)""",
+            {"seller_id": seller_id})
+        inserted, updated = cursor.fetchone()
+        cursor.execute("""
+            SELECT product_id FROM product
+            WHERE seller_id = %s AND stock_shards > 0 AND goods_name IN (SELECT goods_name FROM product_import)""",
+            (seller_id,))
+        respread_stock(cursor, [product_id for (product_id,) in cursor.fetchall()])
+        return {"inserted": inserted, "updated": updated}
+
+    @db.transactional()
+    def batch_update_products(self, seller_id, csv_file):
+        # CSV header: product_id,price,stock_quantity (an empty cell keeps the current value)
+        cursor = db.cursor()
+        cursor.execute("""
+            CREATE TEMP TABLE product_batch_update (
+                product_id INT NOT NULL,
+                price DECIMAL(10, 2),
+                stock_quantity INT
+            ) ON COMMIT DROP""")
+        cursor.copy_expert("""
+            COPY product_batch_update (product_id, price, stock_quantity)
+            FROM STDIN WITH (FORMAT csv, HEADER true)""", csv_file)
+        cursor.execute("""
+            UPDATE product p
+            SET price = COALESCE(u.price, p.price),
+                stock_quantity = COALESCE(u.stock_quantity, p.stock_quantity)
+            FROM product_batch_update u
+            WHERE p.product_id = u.product_id AND p.seller_id = %s""", (seller_id,))
+        updated = cursor.rowcount
+        cursor.execute("""
+            SELECT p.product_id FROM product p JOIN product_batch_update u ON u.product_id = p.product_id
+            WHERE p.seller_id = %s AND p.stock_shards > 0 AND u.stock_quantity IS NOT NULL""", (seller_id,))
+        respread_stock(cursor, [product_id for (product_id,) in cursor.fetchall()])
+        cursor.execute("SELECT COUNT(DISTINCT product_id) FROM product_batch_update")
+        requested = cursor.fetchone()[0]
+        # ids that are unknown or belong to another seller are skipped
+        return {"updated": updated, "skipped": requested - updated}
+
+    def export_products(self, seller_id, out_file):
+        cursor = db.cursor()
+        query = cursor.mogrify("""
+            SELECT product_id, goods_name, image_link, sex, category, price, stock_quantity, date_added
+            FROM product WHERE seller_id = %s ORDER BY product_id""", (seller_id,)).decode()
+        cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER true)", out_file)
+
+    def export_sales(self, seller_id, out_file):
+        cursor = db.cursor()
+        query = cursor.mogrify("""
+            SELECT b.purchase_date, b.product_id, p.goods_name, p.price, b.quantity, b.user_id
+            FROM buylog b
+            JOIN product p ON p.product_id = b.product_id
+            WHERE p.seller_id = %s
+            ORDER BY b.purchase_date""", (seller_id,)).decode()
+        cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER true)", out_file)
+
+    @db.replica_read()
+    def get_search_history(self, user_id):
+        cursor = db.cursor()
+        cursor.execute("""SELECT search_query, search_date FROM user_search_history WHERE user_id = %s ORDER BY search_date DESC;""", (user_id,))
+        return cursor.fetchall()
+
+    def trending_products(self, category=None, sex=None, top_k=10):
+        cursor = db.cursor()
+        ranked = trending.trending_products(category=category, sex=sex, n=top_k)
+        if not ranked:
+            return []
+        cursor.execute("""
+            SELECT product_id, goods_name, category, sex, price FROM product WHERE product_id = ANY(%s)""",
+            ([product_id for product_id, _ in ranked],))
+        rows = {row[0]: row for row in cursor.fetchall()}
+        products = []
+        for product_id, score in ranked:
+            if product_id not in rows:
+                continue
+            _, goods_name, category, sex, price = rows[product_id]
+            products.append({
+                "product_id": product_id,
+                "goods_name": goods_name,
+                "category": category,
+                "sex": sex,
+                "price": price,
+                "score": score
+            })
+        return products
+
+    def top_queries(self, top_k=10):
+        return trending.top_queries(n=top_k)
+
+    def readiness(self):
+        # load state of the lazily loaded NL-search resources: idle / loading / ready / failed
+        return {resource.name: resource.status() for resource in (catalog_source, text_model, fashion_clip)}
+
+    def search_ready(self, *names):
+        # True if the named resources (all by default) are loaded
+        return all(status["state"] == "ready" for name, status in self.readiness().items() if not names or name in names)
+
+    def transaction_stats(self):
+        # commits / rollbacks / serialization retries since startup
+        return db.stats()
+
+    def text_encoder_metrics(self):
+        # batch sizes and queueing delay added by the text-encoding batcher
+        return text_encoder.metrics()
+
+    def facet_counts(self, filters=None, product_ids=None):
+        # {'category' | 'sex' | 'price': {value: count}} for the catalog (or the given products) under
+        # filters like {'category': ['데님'], 'sex': 'Male', 'price': '50~100'}
+        return facets.counts(filters, product_ids)
+
+    def product_column_metrics(self):
+        return product_table.metrics()
+
+    def rank_feature_metrics(self):
+        return rank_features.metrics()
+
+    def image_query_metrics(self):
+        # cache hits / misses and cold (model) vs warm (cached) latency of query-image embeddings
+        return image_encoder.metrics()
+
+    # Fill free to add or mutate skeleton methods as needed, with various parameters
+
+backend = BE()
+
+# --------------------- FRONTEND ---------------------------#
+
+class FE:
+    state = "home"
+    prev_state = "home"
+    authorized_user = None
+    authorized_seller = None
+
+    def start(self):
+        # connect and load before the first menu (see start())
+        start()
+        return self
+
+    def run(self):
+        while True:
+            self.__getattribute__(self.state)()
+
+    def push(self, state=""):
+        self.prev_state = self.state
+        self.state = state if state else self.state
+
+    def proceed(self, state="home"):
+        input("계속하려면 엔터 키를 눌러주세요.")
+        self.push(state)
+
+    @staticmethod
+    def route(protected):
+        def decorator(func):
+            def wrapper(self, *args, **kwargs):
+                clear()
+                print('==============================================================================')
+                print(f"\033[1mBKMS1-Team13 Project:{PROJECT_NAME}\033[0m")
+                print('==============================================================================')
+                print()
+                if protected:
+                    if not (self.authorized_user) and not (self.authorized_seller):
+                        self.unauthorized("로그인되지 않았습니다. 로그인 페이지로 이동합니다.")
+                        return
+                    if self.authorized_user:
+                        try:
+                            self.authorized_user = backend.get_user(self.userID())
+                        except NotFoundError:
+                            self.unauthorized("사용자를 찾지 못했습니다. 로그인 페이지로 이동합니다.")
+                            return
+                    else:
+                        try:
+                            self.authorized_seller = backend.seller_info(self.sellerID())
+                        except NotFoundError:
+                            self.unauthorized("판매자를 찾지 못했습니다. 로그인 페이지로 이동합니다.")
+                            return
+
+                try:
+                    func(self, *args, **kwargs)
+                except NotImplementedError:
+                    print(f"State {self.state} not implemented.")
+                    self.state = self.prev_state
+                except NotFoundError as e:
+                    print(f"Not Found: {e}")
+                    self.state = self.prev_state
+                except Exception as e:
+                    print(f"An unexcepted error occured: {e}")
+                    traceback.print_exc()
+                    self.state = self.prev_state
+            return wrapper
+        return decorator
+
+    public = route(False)
+    protected = route(True)
+
+    @public
+    def unauthorized(self, msg=""):
+        print(msg)
+        choice = get_choice("고객 로그인", "고객 회원가입", "판매자 로그인")
+        if choice == 1:
+            self.push("signin")
+        elif choice == 2:
+            self.push("signup")
+        elif choice == 3:
+            self.push("seller_login")
+
+    @protected
+    def home(self):
+        if self.authorized_user:
+            print("반갑습니다!", self.authorized_user["username"], "고객님!")
+            choice = get_choice("검색", "트렌드", "마이페이지", "로그아웃")
+            if choice == 1:
+                self.push("search_result")
+            elif choice == 2:
+                self.push("trending")
+            elif choice == 3:
+                self.push("mypage")
+            elif choice == 4:
+                self.authorized_user = None
+                self.push("home") # go back to login page
+        else:
+            print("반갑습니다,", self.authorized_seller["seller_name"], "판매자님!")
+            choice = get_choice("제품 관리", "판매 관리", "로그아웃")
+            if choice == 1:
+                self.push("myproduct")
+            elif choice == 2:
+                self.push("sales_history")
+            elif choice == 3:
+                self.authorized_seller = None
+                self.push("home") # go back to login page
+
+    @public
+    def signin(self):
+        username = input("사용자 이름: ")
+        password = input("비밀번호: ")
+        self.authorized_user = backend.sign_in(username, password)
+        self.push("home")
+
+    @public
+    def signup(self):
+        username = input("사용자 이름: ")
+        email = input("이메일: ")
+        password = input("비밀번호: ")
+        while True:
+            password_confirm = input("비밀번호 확인: ")
+            if password != password_confirm:
+                print("비밀번호가 일치하지 않습니다. 다시 시도해 주세요")
+            else:
+                break
+        sex = GENDERS[get_choice("남성", "여성", "기타", msg="성별", get_label=True)]
+        birthday = input("생년월일 (YYYY-MM-DD): ")
+        try:
+            user_id = backend.sign_up(username, email, password, sex, birthday)
+            print(f"새로운 계정이 등록되었습니다!: {user_id}")
+        except:
+            print("회원가입에 실패했습니다.")
+        self.proceed()
+
+    @public
+    def seller_login(self):
+        name = input("판매자 이름: ")
+        password = input("비밀번호: ")
+        self.authorized_seller = backend.seller_login(name, password)
+        self.push("home")
+
+    @protected
+    def search_result(self):
+        choice = get_choice("이름으로 검색", "스타일로 검색", "여러 키워드로 스타일 검색", "이미지로 검색", "카테고리 필터", "성별 필터",
+                            "가격대/정렬로 둘러보기", "뒤로")
+        user_id = self.authorized_user['user_id']
+        if choice == 1:
+            name = input('이름 입력: ')
+            top_k = get_numchoice()
+            products = backend.search_name(name, top_k, user_id)
+        elif choice == 2:
+            nl = input('원하시는 스타일을 자유롭게 입력해 주세요: ')
+            top_k = get_numchoice()
+            if not backend.search_ready("catalog", "text_encoder"):
+                print("스타일 검색을 준비하는 중입니다. 잠시만 기다려 주세요...")
+            products = backend.search_nl(nl, top_k, user_id)
+        elif choice == 3:
+            print("키워드를 + / - 로 이어서 입력해 주세요. 가중치는 *로 줄 수 있습니다. (예: oversized + black*2 - logo)")
+            terms = parse_style_terms(input('키워드: '))
+            if not terms:
+                print(f"{Fore.RED}키워드를 입력해 주세요.")
+                return
+            top_k = get_numchoice()
+            if not backend.search_ready("catalog", "text_encoder"):
+                print("스타일 검색을 준비하는 중입니다. 잠시만 기다려 주세요...")
+            products = backend.search_styles(terms, top_k, user_id)
+        elif choice == 4:
+            image_path = input('비슷한 스타일을 찾을 이미지 파일 경로를 입력해 주세요: ').strip()
+            if not os.path.isfile(image_path):
+                print(f"{Fore.RED}파일을 찾을 수 없습니다.")
+                return
+            top_k = get_numchoice()
+            if not backend.search_ready("catalog", "fashion_clip"):
+                print("스타일 검색을 준비하는 중입니다. 잠시만 기다려 주세요...")
+            products = backend.search_image(image_path, top_k, user_id)
+        elif choice == 5:
+            category_counts = backend.facet_counts()['category']
+            categories = sorted(category_counts, key=lambda category: -category_counts[category])
+            sub_choice = categories[get_choice(*[f"{category} ({category_counts[category]})" for category in categories]) - 1]
+            top_k = get_numchoice()
+            products = backend.search_category(sub_choice, top_k, user_id)
+        elif choice == 6:
+            sex_counts = backend.facet_counts()['sex']
+            sub_choice = get_choice(f"남성 ({sex_counts.get('Male', 0)})", f"여성 ({sex_counts.get('Female', 0)})")
+            sex = 'Male' if sub_choice==1 else 'Female'
+            top_k = get_numchoice()
+            products = backend.search_sex(sex, top_k, user_id)
+        elif choice == 7:
+            products = self.browse(user_id)
+            top_k = len(products)
+        else:
+            self.push("home")
+            return
+        # show result
+        products = products[:top_k]
+        for idx, product in enumerate(products):
+            print("-----------------------------------------------")
+            print(f"\033[1m#{idx + 1}\033[0m")
+            print(f"이름: {product['goods_name']}")
+            print(f"이미지 URL: {product['image_link']}")
+            print(f"성별: {product['sex']}")
+            print(f"카테고리: {product['category']}")
+            print(f"가격: {product['price']}")
+        print("-----------------------------------------------")
+        if products:
+            result_facets = backend.facet_counts(product_ids=[product['product_id'] for product in products])
+            for label, facet in (("카테고리", 'category'), ("성별", 'sex'), ("가격대", 'price')):
+                print(f"{label}: " + ", ".join(f"{value} {count}" for value, count in result_facets[facet].items()))
+            print("-----------------------------------------------")
+        # purchase
+        while(1):
+            choices = [product['goods_name'] for product in products]+['Nothing']
+            choice = get_choice(*choices, msg="구매하실 품목을 선택해주세요.")
+            if choice <= len(products):
+                try:
+                    quantity = int(input("수량을 입력해 주세요.: "))
+                    user_id = self.userID()
+                    product_id = products[choice-1]['product_id']
+                    backend.purchase(user_id, product_id, quantity)
+                    print("구매에 성공했습니다!")
+                except NotFoundError as e:
+                    print(f"구매에 실패했습니다.: {e}")
+                except InsufficientStockError:
+                    print("재고가 부족합니다.")
+                except InsufficientFundsError:
+                    print("잔액이 부족합니다.")
+                except ValueError:
+                    print("올바른 입력이 아닙니다. 유효한 아이디와 수량을 입력해 주세요.")
+                except Exception as e:
+                    print(f"An unexpected error occurred: {e}")
+                    traceback.print_exc()
+                finally:
+                    input("계속하려면 엔터 키를 눌러주세요.")
+            else:
+                break
+        self.push("search_result")
+
+    def browse(self, user_id):
+        # pages through browse_products; returns the page the user wants to buy from
+        categories = sorted(backend.facet_counts()['category'])
+        category = get_choice("전체", *categories, msg="카테고리를 선택해 주세요.", get_label=True)
+        category = None if category == "전체" else category
+        sex = get_choice("전체", "남성", "여성", "공용", msg="성별을 선택해 주세요.", get_label=True)
+        sex = None if sex == "전체" else GENDERS[sex]
+        prices = []
+        for label in ("최저", "최고"):
+            while True:
+                value = input(f"{label} 가격 (없으면 엔터): ").strip()
+                try:
+                    prices.append(Decimal(value) if value else None)
+                    break
+                except InvalidOperation:
+                    print(f"{Fore.RED}유효한 숫자를 입력해 주세요.")
+        sort = ('price_asc', 'price_desc', 'newest')[get_choice("낮은 가격순", "높은 가격순", "최신순", msg="정렬 기준을 선택해 주세요.") - 1]
+        in_stock = get_choice("재고 있는 상품만", "전체", msg="재고 여부를 선택해 주세요.") == 1
+        after, page_no = None, 1
+        while True:
+            page = backend.browse_products(category, sex, prices[0], prices[1], sort, in_stock, after=after, user_id=user_id)
+            print(f"----------------- {page_no} 페이지 -----------------")
+            for product in page["products"]:
+                print(f"{product['goods_name']} ({product['category']}, {product['sex']}) - {product['price']}, "
+                      f"재고 {product['stock_quantity']}, {product['date_added']:%Y-%m-%d}")
+            if page["next"] is None or get_choice("다음 페이지", "이 페이지에서 구매", msg="") == 2:
+                return page["products"]
+            after, page_no = page["next"], page_no + 1
+
+    @protected
+    def trending(self):
+        choice = get_choice("전체", "카테고리별", "성별", msg="인기 상품 기준을 선택해 주세요.")
+        category, sex = None, None
+        if choice == 2:
+            # the categories of the product table (facet index), without loading the NL-search catalog
+            category = get_choice(*sorted(backend.facet_counts()['category']), get_label=True)
+        elif choice == 3:
+            sex = GENDERS[get_choice("남성", "여성", "공용", get_label=True)]
+        print("인기 상품")
+        print("-----------------------------------------------")
+        for idx, product in enumerate(backend.trending_products(category, sex)):
+            print(f"#{idx + 1} {product['goods_name']} ({product['category']}, {product['sex']}) - {product['price']}")
+        print("-----------------------------------------------")
+        print("인기 검색어")
+        print("-----------------------------------------------")
+        for idx, (query, _) in enumerate(backend.top_queries()):
+            print(f"#{idx + 1} {query}")
+        print("-----------------------------------------------")
+        self.proceed()
+
+    @protected
+    def product_info(self):
+        product_id = int(input("Enter the product ID: "))
+        try:
+            product = backend.product_info(product_id, self.sellerID())
+            print(f"품목 ID: {product['product_id']}")
+            print(f"이름: {product['goods_name']}")
+            print(f"이미지 URL: {product['image_link']}")
+            print(f"성별: {product['sex']}")
+            print(f"카테고리: {product['category']}")
+            print(f"가격: {product['price']}")
+            print(f"판매자 ID: {self.sellerID()}")
+            print(f"수량: {product['stock_quantity']}")
+            print(f"추가된 날짜: {product['date_added']}")
+        except NotFoundError:
+            print("품목을 찾지 못했습니다.")
+        self.proceed("myproduct")
+
+    @protected
+    def seller_info(self):
+        seller_id = int(input("Enter the seller ID: "))
+        try:
+            seller = backend.seller_info(seller_id)
+            print(f"판매자 ID: {seller['seller_id']}")
+            print(f"판매자명: {seller['seller_name']}")
+            print(f"이메일: {seller['contact_email']}")
+            print(f"캐시: {seller['seller_account']}")
+        except NotFoundError:
+            print("판매자를 찾지 못했습니다.")
+        self.proceed()
+
+    @protected
+    def register_product(self):
+        goods_name = input("품목명을 입력해 주세요.: ")
+        image_link = input("이미지 링크를 입력해주세요.: ")
+        sex = GENDERS[get_choice("남성", "여성", "공용", msg="성별을 입력해 주세요.: ", get_label=True)]
+        category = input("카테고리를 입력해 주세요.: ")
+        price = float(input("가격을 입력해 주세요.: "))
+        stock_quantity = int(input("수량을 입력해 주세요.: "))
+        product_id = backend.register_product(goods_name, image_link, sex, category, price, self.sellerID(), stock_quantity)
+        print(f"ID {product_id}로 새로운 품목을 등록했습니다.")
+        self.proceed("myproduct")
+
+    @protected
+    def update_product(self):
+        product_id = input("업데이트할 품목 ID를 입력해 주세요.: ")
+
+        field_to_update = get_choice("이름", "이미지 URL", "성별", "카테고리", "가격", "수량", msg="무엇을 업데이트하시겠습니까?", get_label=True)
+        fail = False
+
+        if field_to_update == "이름":
+            new_value = input("새로운 이름을 입력해 주세요.: ")
+        elif field_to_update == "이미지 URL":
+            new_value = input("새로운 이미지 URL을 입력해 주세요.: ")
+        elif field_to_update == "성별":
+            new_value = GENDERS[get_choice("남성", "여성", "공용", msg="성별을 입력해 주세요. ", get_label=True)]
+        elif field_to_update == "카테고리":
+            new_value = input("새로운 카테고리를 입력해 주세요. ")
+        elif field_to_update == "가격":
+            new_value = float(input("새로운 가격을 입력해 주세요.: "))
+        elif field_to_update == "수량":
+            new_value = int(input("새로운 수량을 입력해 주세요.: "))
+        else:
+            print("Invalid field selected.")
+            fail = True
+
+        if not fail:
+            backend.update_product(product_id, PRODUCT_FIELD_MAP[field_to_update], new_value, self.sellerID())
+            print(f"Product with ID {product_id} has been updated.")
+        self.proceed("myproduct") # ADD: minchan
+
+    @protected
+    def delete_product(self):
+        product_id = int(input("삭제할 품목 ID를 입력해 주세요: "))
+        try:
+            backend.delete_product(product_id, self.sellerID())
+            print("품목이 삭제되었습니다.")
+        except NotFoundError:
+            print("품목을 찾을 수 없습니다.")
+        self.proceed("myproduct") # ADD: minchan
+
+    @protected
+    def mypage(self):
+        print("My Page")
+        print("-----------------------------------------------")
+        print(f"이름: {self.authorized_user['username']}")
+        print(f"이메일: {self.authorized_user['email']}")
+        print(f"성별: {self.authorized_user['sex']}")
+        print(f"생일: {self.authorized_user['date_of_birth']}")
+        print(f"캐시: {self.authorized_user['user_account']}")
+        print("-----------------------------------------------")
+        choice = get_choice("구매 기록", "검색 기록", "캐시 충전", "뒤로")
+        if choice == 1:
+            self.push("purchase_history")
+        elif choice == 2:
+            self.push("search_history")
+        elif choice == 3:
+            charge_amount = int(input("충전할 금액을 입력해 주세요.: "))
+            if (charge_amount and charge_amount > 0 and charge_amount <= 2000000):
+                backend.charge_account(self.userID(), charge_amount)
+                print(f"{charge_amount} 만큼의 캐시가 충전되었습니다.")
+            else:
+                print("올바르지 않은 수량입니다. 1 이상 2000000개 이하 수량을 입력해 주세요.")
+                self.proceed()
+        elif choice == 4:
+            self.push("home")
+
+    @protected
+    def myproduct(self):
+        print("제품 관리")
+        choice = get_choice("품목 확인", "품목 추가", "품목 업데이트", "품목 삭제", "대량 관리 (CSV)", "뒤로")
+        if choice == 1:
+            self.push("product_info")
+        elif choice == 2:
+            self.push("register_product")
+        elif choice == 3:
+            self.push("update_product")
+        elif choice == 4:
+            self.push("delete_product")
+        elif choice == 5:
+            self.push("bulk_products")
+        elif choice == 6:
+            self.push("home") # ADD: minchan
+
+    @protected
+    def bulk_products(self):
+        print("대량 관리")
+        choice = get_choice("품목 일괄 등록/갱신", "가격/재고 일괄 수정", "품목 내보내기", "판매 기록 내보내기", "뒤로")
+        if choice == 5:
+            self.push("myproduct")
+            return
+        path = input("CSV 파일 경로를 입력해 주세요.: ")
+        if choice == 1:
+            print("형식: goods_name,image_link,sex,category,price,stock_quantity")
+            with open(path, encoding='utf-8') as f:
+                result = backend.import_products(self.sellerID(), f)
+            print(f"{result['inserted']}개 등록, {result['updated']}개 갱신되었습니다.")
+        elif choice == 2:
+            print("형식: product_id,price,stock_quantity (빈 칸은 기존 값 유지)")
+            with open(path, encoding='utf-8') as f:
+                result = backend.batch_update_products(self.sellerID(), f)
+            print(f"{result['updated']}개 수정, {result['skipped']}개 건너뛰었습니다.")
+        elif choice == 3:
+            with open(path, 'w', encoding='utf-8') as f:
+                backend.export_products(self.sellerID(), f)
+            print(f"{path}에 저장했습니다.")
+        elif choice == 4:
+            with open(path, 'w', encoding='utf-8') as f:
+                backend.export_sales(self.sellerID(), f)
+            print(f"{path}에 저장했습니다.")
+        self.proceed("myproduct")
+
+    @protected
+    def purchase_history(self):
+        print("구매 기록")
+        print("품목명 \t\t 가격 \t\t 수량 \t\t 구매날짜")
+        print("--------------------------------------------------------")
+        history = backend.get_purchase_history(self.userID())
+        for product_name, price, quantity, purchase_date in history:
+            print(f"{product_name} \t\t {price} \t\t {quantity} \t\t {purchase_date}")
+        print("--------------------------------------------------------")
+        self.proceed("mypage")
+
+    @protected
+    def search_history(self):
+        print("검색 기록")
+        print("검색어 \t\t 검색 날짜")
+        print("--------------------------------------------------------")
+        history = backend.get_search_history(self.userID())
+        for query, search_date in history:
+            print(f"{query} \t\t {search_date}")
+        print("--------------------------------------------------------")
+        self.proceed("mypage")
+
+    @protected
+    def sales_history(self):
+        print("-----------------------------------------------")
+        print(f"username: {self.authorized_seller['seller_name']}")
+        print(f"account: {self.authorized_seller['seller_account']}")
+        print("-----------------------------------------------")
+
+        sales_history = backend.get_sales_history(self.sellerID())
+        if sales_history:
+            print("판매 기록")
+            print("구매일자 | 품목 ID | 품목명 | 가격 | 잔여 수량 || 유저 ID | 유저이름 | 수량 ")
+            print("-------------------------------------------------------------------------------------------------------")
+            for row in sales_history:
+                product_id, goods_name, price, stock_quantity, user_id, username, quantity, purchase_date = row
+                print(f"{purchase_date} | {product_id} | {goods_name} | {price} | {stock_quantity} || {user_id} | {username} | {quantity}")
+            print("-------------------------------------------------------------------------------------------------------")
+        else:
+            print("No sales history found.")
+        self.proceed("home") # ADD: minchan
+
+    def userID(self):
+        return self.authorized_user['user_id']
+
+    def sellerID(self):
+        return self.authorized_seller['seller_id'] # ADD: minchan
+
+    # Fill free to add or mutate skeleton methods as needed, with various parameters
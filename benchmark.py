@@ -0,0 +1,407 @@
+import os
+import re
+import argparse
+import time
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from vector_search import ShardedIndex
+from text_batcher import TextEncodeBatcher
+from facets import FacetIndex, FACETS, price_bucket
+from image_query import ImageEmbeddingCache, read_image, open_image
+from rerank import RankFeatures, DEFAULT_WEIGHTS
+
+# Micro-benchmarks for the search path. Run e.g. `python3 benchmark.py vector --rows 200000`.
+# They use synthetic data unless stated otherwise, so they need neither the CSV nor the DB.
+
+
+def normalized(rng, rows, dim):
+    x = rng.standard_normal((rows, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, ord=2, axis=-1, keepdims=True)
+
+
+def timeit(fn, repeat):
+    fn()  # warm-up
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start_time) / repeat
+
+#--------------------- VECTOR SEARCH ----------------------#
+
+def bench_vector(args):
+    rng = np.random.default_rng(args.seed)
+    matrix = normalized(rng, args.rows, args.dim)
+    queries = normalized(rng, args.batch, args.dim)
+    print(f"catalog {args.rows}x{args.dim}, k={args.k}, batch={args.batch}")
+
+    # the original search_nl: one np.dot over the whole matrix and a full argsort
+    def baseline():
+        scores = np.dot(matrix, queries[:1].T)
+        return np.flip(scores.argsort(0)[-args.k:]).flatten()
+
+    expected = baseline()
+    base = timeit(baseline, args.repeat)
+    print(f"baseline (dot + argsort): {base * 1000:.2f} ms/query")
+
+    print("mode    | workers | single ms | batch ms/query | speedup (single)")
+    for mode in args.modes:
+        for n_workers in args.workers:
+            index = ShardedIndex(matrix, n_workers=n_workers, mode=mode)
+            try:
+                found, _ = index.search(queries[0], args.k)
+                assert set(found.tolist()) == set(expected.tolist()), "sharded top-k differs from baseline"
+                single = timeit(lambda: index.search(queries[0], args.k), args.repeat)
+                batch = timeit(lambda: index.search(queries, args.k), args.repeat) / args.batch
+            finally:
+                index.close()
+            print(f"{mode:7} | {n_workers:7} | {single * 1000:9.2f} | {batch * 1000:14.3f} | {base / single:.2f}x")
+
+#--------------------- TEXT BATCHING ----------------------#
+
+def bench_batcher(args):
+    # stand-in for encode_text: a fixed per-call overhead plus a small per-text cost, one call at a time
+    model_lock = threading.Lock()
+    rng = np.random.default_rng(args.seed)
+
+    def encode_text(texts, batch_size=32):
+        with model_lock:
+            time.sleep(args.call_ms / 1000 + args.item_ms / 1000 * len(texts))
+            return rng.standard_normal((len(texts), args.dim)).astype(np.float32)
+
+    def run(encode):
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.clients) as pool:
+            list(pool.map(lambda i: encode(f"a photo of style {i}"), range(args.requests)))
+        return time.perf_counter() - start_time
+
+    print(f"{args.clients} concurrent clients, {args.requests} requests, "
+          f"encoder cost {args.call_ms} ms/call + {args.item_ms} ms/text")
+    unbatched = run(lambda text: encode_text([text], batch_size=32)[0])
+    print(f"one call per request: {args.requests / unbatched:8.1f} req/s")
+
+    batcher = TextEncodeBatcher(encode_text, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+    batched = run(batcher.encode)
+    batcher.close()
+    print(f"micro-batched:        {args.requests / batched:8.1f} req/s ({unbatched / batched:.2f}x)")
+    for name, value in batcher.metrics().items():
+        print(f"  {name}: {value}")
+
+#--------------------- TEXT ENCODER -----------------------#
+
+def bench_encoder(args):
+    # FashionCLIP (PyTorch) vs the int8 ONNX text tower: first call, single-query latency, batch throughput
+    # (needs fashion_clip, onnxruntime and an exported model: python3 text_onnx.py export)
+    from fashion_clip.fashion_clip import FashionCLIP
+    from text_onnx import OnnxTextEncoder, PARITY_TEXTS, INT8_MODEL, FP32_MODEL, parity
+    texts = ['a photo of ' + text for text in PARITY_TEXTS]
+    batch = (texts * (args.batch // len(texts) + 1))[:args.batch]
+
+    def measure(encoder):
+        start_time = time.perf_counter()
+        encoder.encode_text(texts[:1], batch_size=1)
+        first = time.perf_counter() - start_time
+        latencies = []
+        for i in range(args.repeat):
+            start_time = time.perf_counter()
+            encoder.encode_text([texts[i % len(texts)]], batch_size=1)
+            latencies.append((time.perf_counter() - start_time) * 1000)
+        throughput = args.batch / timeit(lambda: encoder.encode_text(batch, batch_size=args.batch), max(args.repeat // 10, 1))
+        return first * 1000, np.array(latencies), throughput
+
+    import torch
+    fclip = FashionCLIP('fashion-clip')
+    encoders = [("fashion_clip (torch)", torch.get_num_threads(), fclip)]
+    model_files = [INT8_MODEL] + ([FP32_MODEL] if args.fp32 else [])
+    for model_file in model_files:
+        for threads in args.threads:
+            encoders.append((f"onnx {'int8' if model_file == INT8_MODEL else 'fp32'}", threads,
+                             OnnxTextEncoder(args.model_dir, threads=threads, model_file=model_file)))
+    print(f"single queries x{args.repeat}, batch of {args.batch}")
+    print("backend              | threads | first ms | mean ms | p95 ms | batch texts/s | min cosine")
+    for name, threads, encoder in encoders:
+        first, latencies, throughput = measure(encoder)
+        cosine = parity(fclip, encoder, PARITY_TEXTS)["cosine"].min()
+        print(f"{name:20} | {threads:7} | {first:8.1f} | {latencies.mean():7.2f} | {np.percentile(latencies, 95):6.2f} | "
+              f"{throughput:13.1f} | {cosine:.4f}")
+
+#--------------------- IMAGE QUERIES ----------------------#
+
+def bench_image(args):
+    import glob
+    import tempfile
+    rng = np.random.default_rng(args.seed)
+    matrix = normalized(rng, args.rows, args.dim)
+    index = ShardedIndex(matrix, n_workers=args.workers)
+    if args.images:
+        images = [read_image(path) for pattern in args.images for path in sorted(glob.glob(pattern))]
+    else:
+        images = [rng.bytes(64 * 1024) for _ in range(args.count)]
+
+    if args.model:
+        from fashion_clip.fashion_clip import FashionCLIP
+        fclip = FashionCLIP('fashion-clip')
+        encode_images, decode = (lambda batch: fclip.encode_images(batch, batch_size=len(batch))), open_image
+    else:
+        # stand-in for encode_images: a fixed cost per image, a vector derived from the bytes
+        def encode_images(batch):
+            time.sleep(args.encode_ms / 1000 * len(batch))
+            return np.stack([np.random.default_rng(len(data)).standard_normal(args.dim) for data in batch])
+        decode = lambda data: data
+
+    def run(cache):
+        latencies = []
+        for data in images:
+            start_time = time.perf_counter()
+            query, _ = cache.embed(data)
+            index.search(query, args.k)
+            latencies.append((time.perf_counter() - start_time) * 1000)
+        return np.array(latencies)
+
+    print(f"{len(images)} query images, catalog {args.rows}x{args.dim}, k={args.k}, "
+          f"{'FashionCLIP' if args.model else f'synthetic encoder {args.encode_ms} ms/image'}")
+    print("pass                     | mean ms | p50 ms | p95 ms")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = ImageEmbeddingCache(encode_images, cache_dir=cache_dir, decode_fn=decode)
+        passes = [("cold (encode)", run(cache)), ("warm (memory cache)", run(cache)),
+                  ("warm (disk, restarted)", run(ImageEmbeddingCache(encode_images, cache_dir=cache_dir, decode_fn=decode)))]
+    index.close()
+    for name, latencies in passes:
+        print(f"{name:24} | {latencies.mean():7.2f} | {np.percentile(latencies, 50):6.2f} | {np.percentile(latencies, 95):6.2f}")
+    print(f"cache metrics: {cache.metrics()}")
+
+#--------------------- STYLE FUSION -----------------------#
+
+def bench_fusion(args):
+    # N phrases: one encode + one search per phrase (merged by summed score) vs one batched encode
+    # and a single fused search
+    model_lock = threading.Lock()
+    rng = np.random.default_rng(args.seed)
+    matrix = normalized(rng, args.rows, args.dim)
+    phrases = normalized(rng, args.phrases, args.dim)
+    weights = [1.0] * args.phrases
+    index = ShardedIndex(matrix, n_workers=args.workers)
+
+    def encode_text(rows):
+        with model_lock:
+            time.sleep(args.call_ms / 1000 + args.item_ms / 1000 * len(rows))
+        return phrases[rows]
+
+    def separate():
+        scores = {}
+        for i in range(args.phrases):
+            found, values = index.search(encode_text([i])[0], args.depth)
+            for j, value in zip(found.tolist(), values.tolist()):
+                scores[j] = scores.get(j, 0.0) + value
+        return sorted(scores, key=scores.get, reverse=True)[:args.k]
+
+    def fused(method):
+        queries = encode_text(list(range(args.phrases)))
+        return index.search_fused(queries, weights, args.k, method=method, depth=args.depth)[0]
+
+    # exact sum of the per-phrase z-normalized scores over the whole catalog, for recall
+    scores = matrix @ phrases.T
+    exact = set(np.argsort(-((scores - scores.mean(0)) / scores.std(0)).sum(1))[:args.k].tolist())
+
+    print(f"{args.phrases} phrases, catalog {args.rows}x{args.dim}, k={args.k}, depth={args.depth}, "
+          f"encoder cost {args.call_ms} ms/call + {args.item_ms} ms/text")
+    print("strategy                  | ms/search | recall@k vs exact normalized sum")
+    rows = [("separate (N encode+top-k)", separate), ("fused sum (1 batch)", lambda: fused('sum')),
+            ("fused rrf (1 batch)", lambda: fused('rrf'))]
+    for name, fn in rows:
+        recall = len(exact & set(np.asarray(fn()).tolist())) / args.k
+        print(f"{name:25} | {timeit(fn, args.repeat) * 1000:9.2f} | {recall:.2f}")
+    index.close()
+
+#--------------------- RE-RANKING -------------------------#
+
+def bench_rerank(args):
+    # the added latency of re-ranking N vector candidates, and of applying one refresh delta
+    rng = np.random.default_rng(args.seed)
+    features = RankFeatures()
+    features.add_orders(rng.integers(1, args.products, args.orders), np.ones(args.orders))
+    features.add_impressions(rng.integers(1, args.products, args.orders * 20), np.ones(args.orders * 20))
+    features.set_stock(np.arange(1, args.products), rng.integers(0, 50, args.products - 1))
+    print(f"{args.products} products, features {features.metrics()['bytes'] / 2 ** 20:.1f} MiB, k={args.k}")
+    print("candidates | rerank us")
+    for n in args.candidates:
+        ids = rng.choice(np.arange(1, args.products), n, replace=False)
+        products = [{"product_id": int(product_id), "similarity": float(similarity)}
+                    for product_id, similarity in zip(ids, np.sort(rng.random(n))[::-1] * 0.4)]
+        elapsed = timeit(lambda: features.rerank(list(products), args.k, DEFAULT_WEIGHTS), args.repeat)
+        print(f"{n:10} | {elapsed * 1e6:9.1f}")
+    delta = rng.integers(1, args.products, args.delta)
+    elapsed = timeit(lambda: features.add_orders(delta, np.ones(args.delta)), args.repeat)
+    print(f"refresh delta of {args.delta} orders: {elapsed * 1e6:.1f} us (plus the delta query)")
+
+#--------------------- FACETS -----------------------------#
+
+def bench_facets(args):
+    rng = np.random.default_rng(args.seed)
+    categories = [f"category{i}" for i in range(args.categories)]
+    sexes = ['Male', 'Female', 'Unisex']
+    rows = [(product_id, categories[c], sexes[s], float(p)) for product_id, c, s, p in zip(
+        range(1, args.rows + 1), rng.integers(0, len(categories), args.rows), rng.integers(0, 3, args.rows),
+        rng.uniform(10, 1000, args.rows).round(2))]
+    start_time = time.perf_counter()
+    index = FacetIndex(rows)
+    print(f"{args.rows} products, built in {(time.perf_counter() - start_time) * 1000:.1f} ms")
+
+    # what a GROUP BY per facet would compute, in python
+    def grouped(filters, product_ids=None):
+        candidates = set(product_ids) if product_ids is not None else None
+        result = {facet: {} for facet in FACETS}
+        for product_id, *values in rows:
+            if candidates is not None and product_id not in candidates:
+                continue
+            key = (values[0], values[1], price_bucket(values[2]))
+            for i, facet in enumerate(FACETS):
+                if all(key[j] in filters[other] for j, other in enumerate(FACETS) if other != facet and other in filters):
+                    result[facet][key[i]] = result[facet].get(key[i], 0) + 1
+        return result
+
+    top_n = rng.choice(args.rows, args.top_n, replace=False) + 1
+    cases = {
+        "no filter": ({}, None),
+        "category": ({'category': {categories[0]}}, None),
+        "category + sex + price": ({'category': set(categories[:3]), 'sex': {'Male'}, 'price': {'50~100'}}, None),
+        f"NL top-{args.top_n}, sex": ({'sex': {'Female'}}, top_n.tolist()),
+    }
+    print("case                      | bitset us | group-by ms")
+    for name, (filters, product_ids) in cases.items():
+        assert index.counts(filters, product_ids) == grouped(filters, product_ids), f"{name}: counts differ"
+        fast = timeit(lambda: index.counts(filters, product_ids), args.repeat)
+        slow = timeit(lambda: grouped(filters, product_ids), 3)
+        print(f"{name:25} | {fast * 1e6:9.1f} | {slow * 1000:11.1f}")
+
+#--------------------- PREPARED STATEMENTS ---------------#
+
+def connect():
+    # needs the Postgres from .env (and the data from database_setup.py)
+    import psycopg2
+    from dotenv import load_dotenv
+    load_dotenv()
+    return psycopg2.connect(dbname=os.getenv('PG_DBNAME'), user=os.getenv('PG_USERNAME'), password=os.getenv('PG_PASSWORD'),
+                            host=os.getenv('PG_HOST'), port=os.getenv('PG_PORT'))
+
+
+def bench_prepared(args):
+    from statements import StatementRegistry, HOT_STATEMENTS
+    conn = connect()
+    conn.autocommit = True
+    cur = conn.cursor()
+    cur.execute("SELECT user_id, username, password FROM users ORDER BY user_id LIMIT 1")
+    user_id, username, password = cur.fetchone()
+    cur.execute("SELECT product_id, seller_id, category, goods_name FROM product ORDER BY product_id LIMIT 1")
+    product_id, seller_id, category, goods_name = cur.fetchone()
+    cases = {
+        'get_user': (user_id,),
+        'sign_in': (username, password),
+        'seller_info': (seller_id,),
+        'product_info': (product_id, seller_id),
+        'purchase_product': (product_id,),
+        'search_category': (category,),
+        'products_by_names': ([goods_name],),
+    }
+    registry = StatementRegistry(HOT_STATEMENTS)
+
+    print(f"{args.repeat} executions each (autocommit)")
+    print("statement         | plain ms | prepared ms | saved ms/req | planning ms (plain)")
+    for name, params in cases.items():
+        if args.statements and name not in args.statements:
+            continue
+        named = {f"p{i + 1}": value for i, value in enumerate(params)}
+        inline = registry.inline_sql(name)
+        plain = timeit(lambda: (cur.execute(inline, named), cur.fetchall()), args.repeat)
+        prepared = timeit(lambda: (registry.execute(cur, name, params), cur.fetchall()), args.repeat)
+        cur.execute("EXPLAIN (ANALYZE, SUMMARY) " + inline, named)
+        planning = next(float(m.group(1)) for (line,) in cur.fetchall()
+                        if (m := re.match(r"Planning Time: ([\d.]+) ms", line.strip())))
+        print(f"{name:17} | {plain * 1000:8.3f} | {prepared * 1000:11.3f} | {(plain - prepared) * 1000:12.3f} | {planning:.3f}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search path benchmarks.")
+    sub = parser.add_subparsers(dest='bench', required=True)
+
+    vector = sub.add_parser('vector', help="sharded exact top-k scaling over 1/2/4/8 workers")
+    vector.add_argument('--rows', type=int, default=100000)
+    vector.add_argument('--dim', type=int, default=512)
+    vector.add_argument('--k', type=int, default=10)
+    vector.add_argument('--batch', type=int, default=32)
+    vector.add_argument('--repeat', type=int, default=20)
+    vector.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    vector.add_argument('--modes', nargs='+', default=['thread', 'process'], choices=['thread', 'process'])
+    vector.add_argument('--seed', type=int, default=13)
+    vector.set_defaults(run=bench_vector)
+
+    batcher = sub.add_parser('batcher', help="micro-batched vs per-request text encoding under concurrency")
+    batcher.add_argument('--clients', type=int, default=16)
+    batcher.add_argument('--requests', type=int, default=256)
+    batcher.add_argument('--call-ms', type=float, default=20.0)
+    batcher.add_argument('--item-ms', type=float, default=1.0)
+    batcher.add_argument('--dim', type=int, default=512)
+    batcher.add_argument('--max-batch-size', type=int, default=32)
+    batcher.add_argument('--max-wait-ms', type=float, default=5.0)
+    batcher.add_argument('--seed', type=int, default=13)
+    batcher.set_defaults(run=bench_batcher)
+
+    encoder = sub.add_parser('encoder', help="FashionCLIP vs int8 ONNX text encoder latency and parity (needs the model)")
+    encoder.add_argument('--model-dir', default='./data/text-onnx')
+    encoder.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4])
+    encoder.add_argument('--fp32', action='store_true', help="also run the unquantized ONNX export")
+    encoder.add_argument('--batch', type=int, default=32)
+    encoder.add_argument('--repeat', type=int, default=100)
+    encoder.set_defaults(run=bench_encoder)
+
+    image = sub.add_parser('image', help="cold vs cached latency of query-by-image (embedding + top-k)")
+    image.add_argument('--images', nargs='*', default=None, help="image files / globs (default: random bytes)")
+    image.add_argument('--count', type=int, default=32)
+    image.add_argument('--model', action='store_true', help="embed with FashionCLIP instead of a synthetic encoder")
+    image.add_argument('--encode-ms', type=float, default=40.0)
+    image.add_argument('--rows', type=int, default=100000)
+    image.add_argument('--dim', type=int, default=512)
+    image.add_argument('--k', type=int, default=10)
+    image.add_argument('--workers', type=int, default=None)
+    image.add_argument('--seed', type=int, default=13)
+    image.set_defaults(run=bench_image)
+
+    fusion = sub.add_parser('fusion', help="multi-phrase style search: separate searches vs one batched fused search")
+    fusion.add_argument('--phrases', type=int, default=3)
+    fusion.add_argument('--rows', type=int, default=100000)
+    fusion.add_argument('--dim', type=int, default=512)
+    fusion.add_argument('--k', type=int, default=10)
+    fusion.add_argument('--depth', type=int, default=50, help="per-phrase candidates (separate / rrf)")
+    fusion.add_argument('--call-ms', type=float, default=20.0)
+    fusion.add_argument('--item-ms', type=float, default=1.0)
+    fusion.add_argument('--workers', type=int, default=None)
+    fusion.add_argument('--repeat', type=int, default=20)
+    fusion.add_argument('--seed', type=int, default=13)
+    fusion.set_defaults(run=bench_fusion)
+
+    rerank = sub.add_parser('rerank', help="latency of re-ranking style search candidates with product features")
+    rerank.add_argument('--products', type=int, default=500000)
+    rerank.add_argument('--orders', type=int, default=1000000)
+    rerank.add_argument('--candidates', type=int, nargs='+', default=[50, 200, 1000])
+    rerank.add_argument('--k', type=int, default=10)
+    rerank.add_argument('--delta', type=int, default=1000, help="orders per incremental refresh")
+    rerank.add_argument('--repeat', type=int, default=1000)
+    rerank.add_argument('--seed', type=int, default=13)
+    rerank.set_defaults(run=bench_rerank)
+
+    facets = sub.add_parser('facets', help="facet counts from bitsets vs a per-request group-by")
+    facets.add_argument('--rows', type=int, default=100000)
+    facets.add_argument('--categories', type=int, default=16)
+    facets.add_argument('--top-n', type=int, default=50)
+    facets.add_argument('--repeat', type=int, default=200)
+    facets.add_argument('--seed', type=int, default=13)
+    facets.set_defaults(run=bench_facets)
+
+    prepared = sub.add_parser('prepared', help="plain vs PREPARE/EXECUTE latency of the hot BE statements (needs the DB)")
+    prepared.add_argument('--repeat', type=int, default=1000)
+    prepared.add_argument('--statements', nargs='*', default=None)
+    prepared.set_defaults(run=bench_prepared)
+
+    args = parser.parse_args()
+    args.run(args)
@@ -0,0 +1,157 @@
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+
+# Catalog state used by the NL search: the embedding matrix plus row-aligned name/category/sex columns.
+# A supervisor parses the CSV once and publishes it as a "generation" of .npy files (a directory that
+# can live on /dev/shm); worker processes memory-map the files read-only, so N workers share one copy.
+# Rebuilding the catalog publishes a new generation and swaps the CURRENT manifest with os.replace;
+# workers notice the swap on their next request and re-attach, without restarting.
+
+MANIFEST = 'CURRENT'
+SEX_CODES = ['M', 'W', 'MW']
+
+
+def parse_vector(x):
+    return np.array(list(map(float, x.replace('[', '').replace(']', '').replace(' ', '').split(','))))
+
+#--------------------- STRING COLUMN ----------------------#
+
+class StringColumn:
+    # UTF-8 bytes of all strings back to back + offsets: compact, and mmap-able unlike an object array
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings):
+        encoded = [s.encode('utf-8') for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        data = np.frombuffer(b''.join(encoded), dtype=np.uint8) if encoded else np.zeros(0, dtype=np.uint8)
+        return cls(data, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes().decode('utf-8')
+
+    def take(self, indices):
+        return [self[i] for i in indices]
+
+#--------------------- CATALOG ----------------------------#
+
+class Catalog:
+    def __init__(self, embeddings, goods_name, category_codes, categories, sex_codes, generation=0, embeddings_path=None):
+        self.embeddings = embeddings
+        # the .npy file behind an attached (mmap'd) generation, None for a catalog parsed in this process
+        self.embeddings_path = embeddings_path
+        self.goods_name = goods_name
+        self.category_codes = category_codes
+        self.categories = categories
+        self.sex_codes = sex_codes
+        self.generation = generation
+
+    def __len__(self):
+        return self.embeddings.shape[0]
+
+    @classmethod
+    def from_csv(cls, path):
+        df = pd.read_csv(path)
+        embeddings = np.stack(df['vector'].apply(parse_vector).values).astype(np.float32)
+        category_codes, categories = pd.factorize(df['category'])
+        sex_codes = df['sex'].map({code: i for i, code in enumerate(SEX_CODES)}).fillna(-1)
+        return cls(embeddings, StringColumn.from_strings(df['goods_name'].astype(str)),
+                   category_codes.astype(np.int16), categories.tolist(), sex_codes.values.astype(np.int8))
+
+    def arrays(self):
+        return {
+            'embeddings': self.embeddings,
+            'goods_name_data': self.goods_name.data,
+            'goods_name_offsets': self.goods_name.offsets,
+            'category_codes': self.category_codes,
+            'sex_codes': self.sex_codes,
+        }
+
+#--------------------- PUBLISH / ATTACH -------------------#
+
+def read_manifest(root):
+    with open(os.path.join(root, MANIFEST)) as f:
+        return json.load(f)
+
+
+def publish(catalog, root, keep=2):
+    # write a new generation next to the current one, then atomically point CURRENT at it
+    os.makedirs(root, exist_ok=True)
+    try:
+        generation = read_manifest(root)['generation'] + 1
+    except (OSError, ValueError, KeyError):
+        generation = 1
+    name = f"gen-{generation:06d}"
+    tmp_dir = os.path.join(root, f".{name}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for key, array in catalog.arrays().items():
+        np.save(os.path.join(tmp_dir, f"{key}.npy"), np.ascontiguousarray(array))
+    os.rename(tmp_dir, os.path.join(root, name))
+
+    manifest = {"generation": generation, "dir": name, "categories": catalog.categories, "rows": len(catalog)}
+    tmp_manifest = os.path.join(root, f".{MANIFEST}.tmp")
+    with open(tmp_manifest, 'w') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_manifest, os.path.join(root, MANIFEST))
+
+    # older generations can go: workers that still map them keep their pages until they re-attach
+    generations = sorted(d for d in os.listdir(root) if d.startswith('gen-'))
+    for old in generations[:-keep]:
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+    catalog.generation = generation
+    return generation
+
+
+def attach(root, manifest=None):
+    manifest = manifest or read_manifest(root)
+    path = os.path.join(root, manifest['dir'])
+    load = lambda key: np.load(os.path.join(path, f"{key}.npy"), mmap_mode='r')
+    return Catalog(load('embeddings'),
+                   StringColumn(load('goods_name_data'), load('goods_name_offsets')),
+                   load('category_codes'), manifest['categories'], load('sex_codes'),
+                   generation=manifest['generation'], embeddings_path=os.path.join(path, 'embeddings.npy'))
+
+
+class LocalCatalog:
+    # single-process mode: the catalog parsed by this process
+    def __init__(self, catalog):
+        self.catalog = catalog
+
+    def current(self):
+        return self.catalog
+
+
+class SharedCatalog:
+    # worker mode: follows the generation published by the supervisor
+    def __init__(self, root):
+        self.root = root
+        self.manifest_path = os.path.join(root, MANIFEST)
+        self.stamp = None
+        self.catalog = None
+        self.current()
+
+    def current(self):
+        st = os.stat(self.manifest_path)
+        stamp = (st.st_ino, st.st_mtime_ns)
+        if stamp != self.stamp:
+            manifest = read_manifest(self.root)
+            if self.catalog is None or manifest['generation'] != self.catalog.generation:
+                try:
+                    self.catalog = attach(self.root, manifest)
+                except FileNotFoundError:
+                    # superseded and collected between reading CURRENT and attaching; take the newer one
+                    self.catalog = attach(self.root)
+            self.stamp = stamp
+        return self.catalog
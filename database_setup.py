@@ -3,11 +3,22 @@ import traceback
 import psycopg2
 from dotenv import load_dotenv
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, date
 import random
+from schema import create_indexes
+from product_columns import install as install_product_change
 
 PROJECT_NAME = "MUSINSA CLONE BACKEND"
 
+# log tables are range-partitioned by month on these columns
+PARTITIONED_LOGS = {
+    'searchlog': 'search_date',
+    'searchresult': 'search_date',
+    'buylog': 'purchase_date',
+}
+PARTITION_MONTHS_BACK = 1
+PARTITION_MONTHS_AHEAD = 3
+
 load_dotenv()
 
 db_name = os.getenv('PG_DBNAME')
@@ -30,15 +41,61 @@ except Exception as e:
     print("Failed to connect to the database.")
     print(traceback.format_exc())
 
+def add_months(day, months):
+    month_index = day.year * 12 + day.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+def partition_name(table, month):
+    return f"{table}_y{month.year}m{month.month:02d}"
+
+def create_log_partitions(months_back=PARTITION_MONTHS_BACK, months_ahead=PARTITION_MONTHS_AHEAD, today=None):
+    # idempotent: creates the monthly partitions of every log table in [today - back, today + ahead], plus one
+    # for every month that has rows in the table's DEFAULT partition
+    this_month = add_months(today or date.today(), 0)
+    created = []
+    for table, column in PARTITIONED_LOGS.items():
+        # catches rows no month partition covers (e.g. maintenance did not run), so log inserts never fail
+        default = f"{table}_default"
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {default} PARTITION OF {table} DEFAULT;")
+        cursor.execute(f"SELECT DISTINCT date_trunc('month', {column})::date FROM {default};")
+        stranded = {row[0] for row in cursor.fetchall()}
+        months = {add_months(this_month, offset) for offset in range(-months_back, months_ahead + 1)}
+        for month in sorted(months | stranded):
+            name = partition_name(table, month)
+            bounds = (str(month), str(add_months(month, 1)))
+            if month in stranded:
+                # (no partition exists for these months) a new partition may not overlap rows left in DEFAULT:
+                # move them into it first, then attach
+                cursor.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS);")
+                cursor.execute(f"""
+                WITH moved AS (
+                    DELETE FROM {default} WHERE {column} >= %s AND {column} < %s RETURNING *
+                )
+                INSERT INTO {name} SELECT * FROM moved;
+                """, bounds)
+                cursor.execute(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s);", bounds)
+            else:
+                cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table}
+                    FOR VALUES FROM (%s) TO (%s);
+                """, bounds)
+            created.append(name)
+    return created
+
 def create_tables():
     try:
         # Drop tables if they exist
         cursor.execute("DROP TABLE IF EXISTS searchresult CASCADE;")
         cursor.execute("DROP TABLE IF EXISTS searchlog CASCADE;")
         cursor.execute("DROP TABLE IF EXISTS buylog CASCADE;")
+        cursor.execute("DROP TABLE IF EXISTS product_change CASCADE;")
+        cursor.execute("DROP TABLE IF EXISTS seller_ledger CASCADE;")
+        cursor.execute("DROP TABLE IF EXISTS product_stock_shard CASCADE;")
         cursor.execute("DROP TABLE IF EXISTS product CASCADE;")
         cursor.execute("DROP TABLE IF EXISTS users CASCADE;")
         cursor.execute("DROP TABLE IF EXISTS seller CASCADE;")
+        cursor.execute("DROP TABLE IF EXISTS search_daily_rollup CASCADE;")
+        cursor.execute("DROP TABLE IF EXISTS sales_daily_rollup CASCADE;")
 
         cursor.execute("""
         DO $$
@@ -85,41 +142,95 @@ def create_tables():
             price DECIMAL(10, 2) NOT NULL,
             seller_id INT NOT NULL REFERENCES seller(seller_id),
             stock_quantity INT NOT NULL,
-            date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            stock_shards INT NOT NULL DEFAULT 0,
+            date_added TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+        """)
+
+        # product_change + trigger: feeds the in-memory product columns of every BE process
+        install_product_change(cursor)
+
+        # stock of hot products split over stock_shards rows (see ledger.py); product.stock_quantity caches the sum
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS product_stock_shard (
+            product_id INT NOT NULL REFERENCES product(product_id) ON DELETE CASCADE,
+            shard INT NOT NULL,
+            quantity INT NOT NULL CHECK (quantity >= 0),
+            PRIMARY KEY (product_id, shard)
+        );
+        """)
+
+        # append-only seller credits, one per purchase; settled_at is set when folded into seller_account
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS seller_ledger (
+            entry_id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+            seller_id INT NOT NULL REFERENCES seller(seller_id),
+            product_id INT NOT NULL,
+            quantity INT NOT NULL,
+            amount DECIMAL(12, 2) NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            settled_at TIMESTAMP
         );
         """)
 
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS searchlog (
-            searchlog_id INT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+            searchlog_id INT GENERATED ALWAYS AS IDENTITY,
             user_id INT NOT NULL REFERENCES users(user_id),
             search_query VARCHAR(255) NOT NULL,
-            search_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
+            search_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (searchlog_id, search_date)
+        ) PARTITION BY RANGE (search_date);
         """)
 
+        # no FK to searchlog: both are partitioned by month so expired months can be detached independently
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS searchresult (
-            result_id INT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
-            searchlog_id INT NOT NULL REFERENCES searchlog(searchlog_id),
+            result_id INT GENERATED ALWAYS AS IDENTITY,
+            searchlog_id INT NOT NULL,
             product_id INT NOT NULL REFERENCES product(product_id),
-            rank INT NOT NULL
-        );
+            rank INT NOT NULL,
+            search_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (result_id, search_date)
+        ) PARTITION BY RANGE (search_date);
         """)
 
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS buylog (
-            buylog_id INT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+            buylog_id INT GENERATED ALWAYS AS IDENTITY,
             user_id INT NOT NULL REFERENCES users(user_id),
             product_id INT NOT NULL REFERENCES product(product_id),
             quantity INT NOT NULL,
-            purchase_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
+            purchase_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (buylog_id, purchase_date)
+        ) PARTITION BY RANGE (purchase_date);
         """)
 
-        cursor.execute("""CREATE INDEX IF NOT EXISTS idx_search_searchlog ON searchlog(user_id);""")
+        create_log_partitions()
 
-        cursor.execute("""CREATE INDEX IF NOT EXISTS idx_user_buylog ON buylog(user_id);""")
+        # every index the BE queries rely on is declared in schema.py
+        create_indexes(cursor)
+
+        # daily rollups, filled by log_maintenance.py; they outlive the partitions they summarize
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS search_daily_rollup (
+            day DATE NOT NULL,
+            search_query VARCHAR(255) NOT NULL,
+            searches INT NOT NULL,
+            results INT NOT NULL,
+            PRIMARY KEY (day, search_query)
+        );
+        """)
+
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sales_daily_rollup (
+            day DATE NOT NULL,
+            product_id INT NOT NULL,
+            orders INT NOT NULL,
+            quantity INT NOT NULL,
+            PRIMARY KEY (day, product_id)
+        );
+        """)
 
         cursor.execute("""
         CREATE OR REPLACE VIEW purchase_history AS
@@ -136,13 +247,14 @@ def create_tables():
             ORDER BY user_id, search_date DESC;
         """)
 
+        # no ORDER BY: a sorted view is planned on its own, so get_sales_history's seller filter could not reach
+        # buylog and every sale was joined and sorted first
         cursor.execute("""
         CREATE OR REPLACE VIEW sales_history AS
             SELECT b.user_id, u.username, p.product_id, p.goods_name, p.price, p.stock_quantity, b.quantity, b.purchase_date
             FROM buylog b
             JOIN product p ON b.product_id = p.product_id
-            JOIN users u ON b.user_id = u.user_id
-            ORDER BY b.user_id, b.purchase_date DESC;
+            JOIN users u ON b.user_id = u.user_id;
         """)
 
         conn.commit()
@@ -0,0 +1,8 @@
+class NotFoundError(Exception):
+    pass
+
+class InsufficientStockError(Exception):
+    pass
+
+class InsufficientFundsError(Exception):
+    pass
@@ -0,0 +1,187 @@
+import threading
+import numpy as np
+
+# Facet counts (category / sex / price bucket) for filter menus and search result sets.
+# Every product gets a bit position; each facet value keeps a bitset (a python int) of the products
+# having it, so the count for any filter combination is an AND of a few bitsets plus a popcount
+# instead of a GROUP BY over product. BE loads it and keeps it current through the product_change feed
+# (product_columns.py), like the product columns: reload() and apply() are only called from the
+# listener thread, so a rebuild cannot overwrite an update made while it was being built.
+# Unfiltered counts are kept as running totals, and small candidate sets (an NL top-N) are counted by
+# looking at their rows directly, which is cheaper than popcounts over catalog-wide bitsets.
+
+PRICE_BUCKETS = (50, 100, 200, 500, 1000)
+FACETS = ('category', 'sex', 'price')
+
+# candidate sets up to this size are counted row by row
+DIRECT_COUNT_LIMIT = 4096
+
+popcount = int.bit_count if hasattr(int, 'bit_count') else (lambda bits: bin(bits).count('1'))
+
+
+def price_bucket(price, bounds=PRICE_BUCKETS):
+    lower = 0
+    for upper in bounds:
+        if price < upper:
+            return f"{lower}~{upper}"
+        lower = upper
+    return f"{lower}~"
+
+
+def to_bitset(positions, size):
+    # packing through numpy instead of OR-ing 1 << position keeps a rebuild linear in the catalog size
+    bits = np.zeros(size, dtype=bool)
+    bits[positions] = True
+    return int.from_bytes(np.packbits(bits, bitorder='little').tobytes(), 'little')
+
+
+def selection(filters):
+    # {facet: value or list of values} -> {facet: set of values}
+    return {facet: {selected} if isinstance(selected, str) else set(selected)
+            for facet, selected in (filters or {}).items()}
+
+
+def matches(key, selected):
+    return all(value in selected[facet] for facet, value in zip(FACETS, key) if facet in selected)
+
+
+class FacetIndex:
+    def __init__(self, rows=(), price_buckets=PRICE_BUCKETS):
+        # rows: (product_id, category, sex, price)
+        self.price_buckets = price_buckets
+        self.lock = threading.Lock()
+        self.rebuild(rows)
+
+    def rebuild(self, rows):
+        positions, ids, values, members = {}, [], [], {facet: {} for facet in FACETS}
+        for position, (product_id, category, sex, price) in enumerate(rows):
+            key = (category, sex, price_bucket(price, self.price_buckets))
+            positions[product_id] = position
+            ids.append(product_id)
+            values.append(key)
+            for facet, value in zip(FACETS, key):
+                members[facet].setdefault(value, []).append(position)
+        bitsets = {facet: {value: to_bitset(members[facet][value], len(values)) for value in members[facet]}
+                   for facet in FACETS}
+        totals = {facet: {value: len(members[facet][value]) for value in members[facet]} for facet in FACETS}
+        alive = (1 << len(values)) - 1
+        with self.lock:
+            self.positions = positions
+            self.ids = ids
+            self.values = values
+            self.bitsets = bitsets
+            self.totals = totals
+            self.alive = alive
+        return self
+
+    def __len__(self):
+        return popcount(self.alive)
+
+    def _clear(self, position):
+        bit = 1 << position
+        for facet, value in zip(FACETS, self.values[position]):
+            remaining = self.bitsets[facet][value] & ~bit
+            if remaining:
+                self.bitsets[facet][value] = remaining
+                self.totals[facet][value] -= 1
+            else:
+                del self.bitsets[facet][value]
+                del self.totals[facet][value]
+        self.alive &= ~bit
+
+    def upsert(self, product_id, category, sex, price):
+        key = (category, sex, price_bucket(price, self.price_buckets))
+        with self.lock:
+            position = self.positions.get(product_id)
+            if position is None:
+                position = self.positions[product_id] = len(self.values)
+                self.ids.append(product_id)
+                self.values.append(key)
+            else:
+                self._clear(position)
+                self.values[position] = key
+            bit = 1 << position
+            for facet, value in zip(FACETS, key):
+                self.bitsets[facet][value] = self.bitsets[facet].get(value, 0) | bit
+                self.totals[facet][value] = self.totals[facet].get(value, 0) + 1
+            self.alive |= bit
+
+    def remove(self, product_id):
+        # the position stays allocated (and empty) until the next rebuild
+        with self.lock:
+            position = self.positions.pop(product_id, None)
+            if position is not None:
+                self._clear(position)
+
+    # product_change feed target: product_columns.FRAME_COLUMNS rows, prices in cents
+    def reload(self, frame):
+        return self.rebuild(zip(frame['product_id'].tolist(), frame['category'].tolist(), frame['sex'].tolist(),
+                                (frame['price_cents'] / 100).tolist()))
+
+    def apply(self, rows, removed):
+        for product_id, _, _, sex, category, price_cents, _ in rows:
+            self.upsert(product_id, category, sex, price_cents / 100)
+        for product_id in removed:
+            self.remove(product_id)
+
+    def _mask(self, filters, product_ids, skip=None):
+        # filters: {facet: value or list of values}; values of one facet are OR-ed, facets AND-ed
+        mask = self.alive
+        if product_ids is not None:
+            candidates = 0
+            for product_id in product_ids:
+                position = self.positions.get(product_id)
+                if position is not None:
+                    candidates |= 1 << position
+            mask &= candidates
+        for facet, selected in (filters or {}).items():
+            if facet == skip:
+                continue
+            if isinstance(selected, str):
+                selected = [selected]
+            bits = 0
+            for value in selected:
+                bits |= self.bitsets[facet].get(value, 0)
+            mask &= bits
+        return mask
+
+    def _candidate_keys(self, product_ids):
+        positions = {self.positions[product_id] for product_id in product_ids if product_id in self.positions}
+        return [self.values[position] for position in positions]
+
+    def count(self, filters=None, product_ids=None):
+        with self.lock:
+            if product_ids is not None and len(product_ids) <= DIRECT_COUNT_LIMIT:
+                selected = selection(filters)
+                return sum(1 for key in self._candidate_keys(product_ids) if matches(key, selected))
+            return popcount(self._mask(filters, product_ids))
+
+    def counts(self, filters=None, product_ids=None):
+        # {facet: {value: count}}; a facet's own selection is ignored for its counts, so the menu still
+        # shows what switching to another value of that facet would give
+        with self.lock:
+            if not filters and product_ids is None:
+                return {facet: dict(totals) for facet, totals in self.totals.items()}
+            if product_ids is not None and len(product_ids) <= DIRECT_COUNT_LIMIT:
+                selected = selection(filters)
+                result = {facet: {} for facet in FACETS}
+                for key in self._candidate_keys(product_ids):
+                    failed = [i for i, facet in enumerate(FACETS) if facet in selected and key[i] not in selected[facet]]
+                    # a row counts for every facet if it matches all filters, or only for the one facet it fails
+                    for i in (range(len(FACETS)) if not failed else failed if len(failed) == 1 else ()):
+                        counts = result[FACETS[i]]
+                        counts[key[i]] = counts.get(key[i], 0) + 1
+                return result
+            result = {}
+            for facet in FACETS:
+                mask = self._mask(filters, product_ids, skip=facet)
+                counts = {value: popcount(bits & mask) for value, bits in self.bitsets[facet].items()}
+                result[facet] = {value: count for value, count in counts.items() if count}
+            return result
+
+    def product_ids(self, filters=None, product_ids=None):
+        with self.lock:
+            mask = self._mask(filters, product_ids)
+            ids = self.ids
+        # bit i of the mask is character -1 - i of its binary string
+        return [ids[position] for position, bit in enumerate(reversed(bin(mask)[2:])) if bit == '1']
@@ -0,0 +1,172 @@
+import io
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict, deque
+import numpy as np
+
+# Query-by-example for style search: embeds a query photo with FashionCLIP's encode_images and caches
+# the (L2-normalized) embedding under the blake2b digest of the file's bytes, so uploading the same
+# picture again - under any file name - skips the model. Entries live in an in-memory LRU and, if
+# cache_dir is set, as <digest>.npy files that survive restarts. The files are bounded too: a disk hit
+# touches the file's mtime, and pruning drops the least recently used ones beyond disk_capacity and any
+# older than max_age seconds.
+
+PRUNE_TO = 0.9  # fraction of disk_capacity left after pruning, so not every write prunes
+PRUNE_INTERVAL = 3600  # seconds between age-only prunes
+
+
+def read_image(image):
+    # a local path or the raw bytes of an image -> bytes
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return bytes(image)
+    with open(image, 'rb') as f:
+        return f.read()
+
+
+def content_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def open_image(data):
+    from PIL import Image
+    return Image.open(io.BytesIO(data)).convert('RGB')
+
+
+class ImageEmbeddingCache:
+    def __init__(self, encode_fn, capacity=1024, cache_dir=None, history=1024, decode_fn=open_image,
+                 disk_capacity=10000, max_age=None):
+        # encode_fn(list of decode_fn(bytes), i.e. PIL images) -> (N, D) array
+        # disk_capacity: files kept in cache_dir (None: unbounded), max_age: seconds (None: no expiry)
+        self.encode_fn = encode_fn
+        self.decode_fn = decode_fn
+        self.capacity = capacity
+        self.cache_dir = cache_dir
+        self.disk_capacity = disk_capacity
+        self.max_age = max_age
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.disk_files = 0
+        self.last_prune = 0.0
+        self.pruned = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self.prune()
+        # metrics
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.cold_ms = deque(maxlen=history)
+        self.warm_ms = deque(maxlen=history)
+
+    def _remember(self, key, embedding):
+        with self.lock:
+            self.entries[key] = embedding
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+
+    def _load(self, key):
+        if not self.cache_dir:
+            return None
+        path = os.path.join(self.cache_dir, f"{key}.npy")
+        try:
+            embedding = np.load(path)
+            os.utime(path)  # recency for prune()
+            return embedding
+        except (OSError, ValueError):
+            return None
+
+    def _store(self, key, embedding):
+        if not self.cache_dir:
+            return
+        # write-then-rename, so a concurrent reader never sees a half-written file
+        path = os.path.join(self.cache_dir, f"{key}.npy")
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            np.save(f, embedding)
+        os.replace(tmp, path)
+        with self.lock:
+            self.disk_files += 1
+            due = ((self.disk_capacity is not None and self.disk_files > self.disk_capacity)
+                   or (self.max_age is not None and time.time() - self.last_prune > PRUNE_INTERVAL))
+        if due:
+            self.prune()
+
+    def prune(self):
+        # drop the least recently used files beyond disk_capacity (down to PRUNE_TO of it) and the ones
+        # older than max_age; returns how many files were removed
+        now = time.time()
+        files = []
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.npy'):
+                    try:
+                        files.append((entry.stat().st_mtime, entry.path))
+                    except OSError:
+                        pass  # removed by a concurrent prune
+        files.sort()
+        excess = 0
+        if self.disk_capacity is not None and len(files) > self.disk_capacity:
+            excess = len(files) - int(self.disk_capacity * PRUNE_TO)
+        removed = 0
+        for i, (mtime, path) in enumerate(files):
+            if i < excess or (self.max_age is not None and now - mtime > self.max_age):
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+        with self.lock:
+            self.disk_files = len(files) - removed
+            self.last_prune = now
+            self.pruned += removed
+        return removed
+
+    def embed(self, image):
+        # -> (normalized 1-D embedding, content hash)
+        start = time.perf_counter()
+        data = read_image(image)
+        key = content_hash(data)
+        with self.lock:
+            embedding = self.entries.get(key)
+            if embedding is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+        if embedding is None:
+            embedding = self._load(key)
+            if embedding is not None:
+                with self.lock:
+                    self.disk_hits += 1
+                self._remember(key, embedding)
+        if embedding is not None:
+            self.warm_ms.append((time.perf_counter() - start) * 1000)
+            return embedding, key
+
+        embedding = np.asarray(self.encode_fn([self.decode_fn(data)])[0], dtype=np.float32)
+        embedding = embedding / np.linalg.norm(embedding, ord=2)
+        self._remember(key, embedding)
+        self._store(key, embedding)
+        with self.lock:
+            self.misses += 1
+        self.cold_ms.append((time.perf_counter() - start) * 1000)
+        return embedding, key
+
+    def metrics(self):
+        def summary(samples):
+            values = np.array(samples) if samples else np.zeros(1)
+            return {"count": len(samples), "mean_ms": float(values.mean()),
+                    "p50_ms": float(np.percentile(values, 50)), "p95_ms": float(np.percentile(values, 95))}
+
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "entries": len(self.entries),
+                "disk_files": self.disk_files,
+                "pruned": self.pruned,
+                "cold": summary(list(self.cold_ms)),
+                "warm": summary(list(self.warm_ms))
+            }
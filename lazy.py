@@ -0,0 +1,83 @@
+import time
+import threading
+import traceback
+
+# Lazily loaded, optionally background-warmed resources (the FashionCLIP model, the NL-search catalog).
+# get() blocks until the resource is ready, loading it in the calling thread if nobody has started yet;
+# warm() starts loading in a daemon thread so the first menu appears without waiting for it.
+
+IDLE = 'idle'
+LOADING = 'loading'
+READY = 'ready'
+FAILED = 'failed'
+
+
+class LazyResource:
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+        self.state = IDLE
+        self.value = None
+        self.error = None
+        self.started_at = None
+        self.load_seconds = None
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+
+    def _claim(self):
+        # True if the caller should run the loader
+        with self.lock:
+            if self.state in (IDLE, FAILED):
+                self.state = LOADING
+                self.error = None
+                self.started_at = time.time()
+                self.done.clear()
+                return True
+            return False
+
+    def _load(self):
+        try:
+            value = self.loader()
+        except Exception as e:
+            with self.lock:
+                self.state = FAILED
+                self.error = e
+                self.load_seconds = time.time() - self.started_at
+            traceback.print_exc()
+        else:
+            with self.lock:
+                self.value = value
+                self.state = READY
+                self.load_seconds = time.time() - self.started_at
+        finally:
+            self.done.set()
+
+    def warm(self):
+        if self._claim():
+            threading.Thread(target=self._load, name=f"warm-{self.name}", daemon=True).start()
+        return self
+
+    def get(self, timeout=None):
+        if self.state == READY:
+            return self.value
+        if self._claim():
+            self._load()
+        elif not self.done.wait(timeout):
+            raise TimeoutError(f"{self.name} is still loading")
+        if self.state == FAILED:
+            raise RuntimeError(f"{self.name} failed to load: {self.error}")
+        return self.value
+
+    def ready(self):
+        return self.state == READY
+
+    def status(self):
+        with self.lock:
+            status = {"state": self.state}
+            if self.state == LOADING:
+                status["elapsed"] = round(time.time() - self.started_at, 2)
+            elif self.load_seconds is not None:
+                status["load_seconds"] = round(self.load_seconds, 2)
+            if self.error is not None:
+                status["error"] = str(self.error)
+            return status
@@ -0,0 +1,391 @@
+import time
+import random
+import argparse
+import threading
+import traceback
+from statements import statements
+from exceptions import NotFoundError, InsufficientStockError, InsufficientFundsError
+
+# Hot-row contention relief for checkouts.
+# With ~10 sellers every purchase used to update one of a handful of seller rows, and every purchase of
+# a popular item the same product row, so concurrent checkouts queued on those row locks.
+#   - seller credits are appended to seller_ledger (no lock on the seller row); settle() folds the
+#     unsettled entries into seller_account, and seller_info / seller_login add the unsettled rest on read.
+#     Settled entries are kept LEDGER_RETENTION (reconcile() compares them with buylog), then settle()
+#     deletes them, at most PRUNE_BATCH per call
+#   - a hot product can have its stock split over N rows of product_stock_shard (set_stock_shards);
+#     a checkout takes from one shard nobody else holds (SKIP LOCKED) and only falls back to locking all
+#     shards when none can cover the order alone. product.stock_quantity of a sharded product is a cache
+#     refreshed by settle().
+#
+#   python3 ledger.py settle
+#   python3 ledger.py shard <product_id> 16      (0 folds the shards back into product.stock_quantity)
+#   python3 ledger.py reconcile
+#   python3 ledger.py stress --clients 1 4 16 --shards 0 16
+
+SETTLE_SQL = """
+    WITH moved AS (
+        UPDATE seller_ledger SET settled_at = now() WHERE settled_at IS NULL RETURNING seller_id, amount
+    ), totals AS (
+        SELECT seller_id, SUM(amount) AS amount FROM moved GROUP BY seller_id
+    )
+    UPDATE seller s SET seller_account = s.seller_account + t.amount
+    FROM totals t WHERE s.seller_id = t.seller_id
+"""
+
+LEDGER_RETENTION = '7 days'
+PRUNE_BATCH = 10000
+
+# oldest first, so the entries left are always everything since MIN(created_at) (see reconcile)
+PRUNE_SQL = """
+    DELETE FROM seller_ledger WHERE entry_id IN (
+        SELECT entry_id FROM seller_ledger
+        WHERE settled_at IS NOT NULL AND created_at < LOCALTIMESTAMP - %s::INTERVAL
+        ORDER BY created_at, entry_id
+        LIMIT %s)
+"""
+
+SYNC_STOCK_SQL = """
+    UPDATE product p SET stock_quantity = t.total
+    FROM (SELECT product_id, SUM(quantity)::INT AS total FROM product_stock_shard GROUP BY product_id) t
+    WHERE p.product_id = t.product_id AND p.stock_shards > 0 AND p.stock_quantity <> t.total
+"""
+
+# spread product.stock_quantity (just written by the seller) evenly over the existing shards
+RESPREAD_SQL = """
+    UPDATE product_stock_shard s
+    SET quantity = p.stock_quantity / p.stock_shards + CASE WHEN s.shard < p.stock_quantity %% p.stock_shards THEN 1 ELSE 0 END
+    FROM product p
+    WHERE p.product_id = s.product_id AND p.stock_shards > 0 AND p.product_id = ANY(%s)
+"""
+
+#--------------------- CHECKOUT ---------------------------#
+
+def take_stock(cursor, product_id, quantity, stock_shards):
+    if not stock_shards:
+        statements.execute(cursor, 'take_stock', (quantity, product_id))
+        return cursor.rowcount == 1
+    # start at a random shard so concurrent checkouts spread over the shards
+    statements.execute(cursor, 'take_stock_shard', (product_id, quantity, random.randrange(stock_shards)))
+    if cursor.rowcount == 1:
+        return True
+    # no free shard can cover the order alone: wait for all of them and take from several
+    statements.execute(cursor, 'lock_stock_shards', (product_id,))
+    shards = cursor.fetchall()
+    if sum(available for _, available in shards) < quantity:
+        return False
+    remaining = quantity
+    for shard, available in shards:
+        taken = min(available, remaining)
+        statements.execute(cursor, 'drain_stock_shard', (taken, product_id, shard))
+        remaining -= taken
+        if remaining == 0:
+            break
+    return True
+
+
+def checkout(cursor, user_id, product_id, quantity):
+    # the purchase writes of BE.purchase; runs inside the caller's transaction
+    statements.execute(cursor, 'purchase_product', (product_id,))
+    result = cursor.fetchone()
+    if not result:
+        raise NotFoundError("Product or User not found")
+    price, seller_id, category, sex, stock_shards = result
+    total_price = price * quantity
+
+    if not take_stock(cursor, product_id, quantity, stock_shards):
+        raise InsufficientStockError("Not enough stock available")
+
+    statements.execute(cursor, 'debit_user', (total_price, user_id))
+    if cursor.rowcount == 0:
+        statements.execute(cursor, 'get_user', (user_id,))
+        if cursor.fetchone() is None:
+            raise NotFoundError("Product or User not found")
+        raise InsufficientFundsError("Insufficient funds in user account")
+
+    statements.execute(cursor, 'credit_seller', (seller_id, product_id, quantity, total_price))
+    statements.execute(cursor, 'add_buylog', (quantity, product_id, user_id))
+    return category, sex
+
+#--------------------- SETTLEMENT / SHARDS ----------------#
+
+def settle(cursor, retention=LEDGER_RETENTION):
+    # fold unsettled ledger credits into seller_account, refresh the cached stock of sharded products and
+    # delete entries settled more than retention ago
+    cursor.execute(SETTLE_SQL)
+    sellers = cursor.rowcount
+    cursor.execute(SYNC_STOCK_SQL)
+    products = cursor.rowcount
+    cursor.execute(PRUNE_SQL, (retention, PRUNE_BATCH))
+    return {"sellers": sellers, "products": products, "pruned": cursor.rowcount}
+
+
+def start_settling(db, interval):
+    # settle every interval seconds on db's connection (give it one nobody else uses); returns the event
+    # that stops the loop
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(interval):
+            try:
+                db.run(lambda: settle(db.cursor()))
+            except Exception as e:
+                # keep settling: a dead loop would leave every later credit unsettled
+                print(f"Ledger settlement failed: {e}")
+                traceback.print_exc()
+
+    threading.Thread(target=loop, name="ledger-settle", daemon=True).start()
+    return stop
+
+
+def set_stock_shards(cursor, product_id, shards):
+    cursor.execute("SELECT stock_quantity, stock_shards FROM product WHERE product_id = %s FOR UPDATE", (product_id,))
+    result = cursor.fetchone()
+    if not result:
+        raise NotFoundError()
+    stock, current = result
+    if current:
+        cursor.execute("DELETE FROM product_stock_shard WHERE product_id = %s RETURNING quantity", (product_id,))
+        stock = sum(quantity for (quantity,) in cursor.fetchall())
+    if shards > 0:
+        cursor.execute("""
+            INSERT INTO product_stock_shard (product_id, shard, quantity)
+            SELECT %(product_id)s, shard, %(stock)s / %(shards)s + CASE WHEN shard < %(stock)s %% %(shards)s THEN 1 ELSE 0 END
+            FROM generate_series(0, %(shards)s - 1) AS shard""",
+            {"product_id": product_id, "stock": stock, "shards": shards})
+    cursor.execute("UPDATE product SET stock_quantity = %s, stock_shards = %s WHERE product_id = %s",
+                   (stock, shards, product_id))
+    return stock
+
+
+def respread_stock(cursor, product_ids):
+    # after a seller sets stock_quantity of products that may be sharded
+    cursor.execute(RESPREAD_SQL, (list(product_ids),))
+
+#--------------------- RECONCILIATION ---------------------#
+
+def reconcile(cursor):
+    # invariants that must hold at any time; returns {check: offending rows}
+    checks = {
+        "negative_stock": """
+            SELECT product_id, stock_quantity FROM product WHERE stock_shards = 0 AND stock_quantity < 0""",
+        "shard_count": """
+            SELECT p.product_id, p.stock_shards, COUNT(s.shard)
+            FROM product p LEFT JOIN product_stock_shard s ON s.product_id = p.product_id
+            GROUP BY p.product_id HAVING COUNT(s.shard) <> p.stock_shards""",
+        # every purchase since the ledger exists credits its seller exactly once, for exactly that quantity
+        "ledger_vs_buylog": """
+            -- buylog rows before the oldest ledger entry left (older ones are pruned by settle) or in expired
+            -- partitions have no counterpart
+            WITH since AS (
+                SELECT GREATEST((SELECT MIN(created_at) FROM seller_ledger), (SELECT MIN(purchase_date) FROM buylog)) AS t
+            ), sold AS (
+                SELECT b.product_id, SUM(b.quantity) AS quantity FROM buylog b, since
+                WHERE b.purchase_date >= since.t GROUP BY b.product_id
+            ), credited AS (
+                SELECT l.product_id, SUM(l.quantity) AS quantity FROM seller_ledger l, since
+                WHERE l.created_at >= since.t GROUP BY l.product_id
+            )
+            SELECT COALESCE(s.product_id, c.product_id), s.quantity, c.quantity
+            FROM sold s FULL JOIN credited c ON c.product_id = s.product_id
+            WHERE s.quantity IS DISTINCT FROM c.quantity""",
+    }
+    problems = {}
+    for name, query in checks.items():
+        cursor.execute(query)
+        problems[name] = cursor.fetchall()
+    # informational: sharded products whose cached stock_quantity is behind (fixed by the next settle)
+    cursor.execute("""
+        SELECT COUNT(*) FROM product p
+        WHERE p.stock_shards > 0 AND p.stock_quantity <>
+            (SELECT COALESCE(SUM(quantity), 0) FROM product_stock_shard s WHERE s.product_id = p.product_id)""")
+    return problems, cursor.fetchone()[0]
+
+#--------------------- STRESS -----------------------------#
+
+STRESS_NAME = 'ledger-stress'
+STRESS_PRICE = 10
+STRESS_BALANCE = 1000000
+
+
+def stress_fixture(cursor, n_users):
+    cursor.execute("""
+        INSERT INTO seller (seller_name, password, contact_email) VALUES (%s, 'x', %s) RETURNING seller_id""",
+        (STRESS_NAME, f"{STRESS_NAME}@example.com"))
+    seller_id = cursor.fetchone()[0]
+    cursor.execute("""
+        INSERT INTO product (goods_name, image_link, sex, category, price, seller_id, stock_quantity)
+        VALUES (%s, '', 'Unisex', %s, %s, %s, 0) RETURNING product_id""",
+        (STRESS_NAME, STRESS_NAME, STRESS_PRICE, seller_id))
+    product_id = cursor.fetchone()[0]
+    user_ids = []
+    for i in range(n_users):
+        cursor.execute("""
+            INSERT INTO users (username, password, sex, email) VALUES (%s, 'x', 'Male', %s) RETURNING user_id""",
+            (f"{STRESS_NAME}-{i}", f"{STRESS_NAME}-{i}@example.com"))
+        user_ids.append(cursor.fetchone()[0])
+    return seller_id, product_id, user_ids
+
+
+def stress_reset(cursor, seller_id, product_id, user_ids, stock, shards):
+    cursor.execute("DELETE FROM seller_ledger WHERE seller_id = %s", (seller_id,))
+    cursor.execute("DELETE FROM buylog WHERE product_id = %s", (product_id,))
+    cursor.execute("UPDATE seller SET seller_account = 0 WHERE seller_id = %s", (seller_id,))
+    cursor.execute("UPDATE users SET user_account = %s WHERE user_id = ANY(%s)", (STRESS_BALANCE, user_ids))
+    set_stock_shards(cursor, product_id, 0)
+    cursor.execute("UPDATE product SET stock_quantity = %s WHERE product_id = %s", (stock, product_id))
+    set_stock_shards(cursor, product_id, shards)
+
+
+def stress_teardown(cursor, seller_id, product_id, user_ids):
+    cursor.execute("DELETE FROM seller_ledger WHERE seller_id = %s", (seller_id,))
+    cursor.execute("DELETE FROM buylog WHERE product_id = %s", (product_id,))
+    cursor.execute("DELETE FROM product WHERE product_id = %s", (product_id,))
+    cursor.execute("DELETE FROM users WHERE user_id = ANY(%s)", (user_ids,))
+    cursor.execute("DELETE FROM seller WHERE seller_id = %s", (seller_id,))
+
+
+def stress_verify(cursor, seller_id, product_id, user_ids, stock, quantity, bought, sold_out):
+    # returns a list of violated invariants (empty: the books balance)
+    cursor.execute("SELECT COUNT(*), COALESCE(SUM(quantity), 0) FROM buylog WHERE product_id = %s", (product_id,))
+    orders, sold = cursor.fetchone()
+    cursor.execute("""
+        SELECT CASE WHEN p.stock_shards > 0
+            THEN (SELECT COALESCE(SUM(quantity), 0) FROM product_stock_shard s WHERE s.product_id = p.product_id)
+            ELSE p.stock_quantity END
+        FROM product p WHERE p.product_id = %s""", (product_id,))
+    remaining = cursor.fetchone()[0]
+    cursor.execute("SELECT seller_account FROM seller WHERE seller_id = %s", (seller_id,))
+    seller_account = cursor.fetchone()[0]
+    cursor.execute("SELECT COUNT(*) FILTER (WHERE settled_at IS NULL), COALESCE(SUM(amount), 0) FROM seller_ledger WHERE seller_id = %s",
+                   (seller_id,))
+    unsettled, credited = cursor.fetchone()
+    cursor.execute("SELECT SUM(user_account) FROM users WHERE user_id = ANY(%s)", (user_ids,))
+    balances = cursor.fetchone()[0]
+
+    revenue = STRESS_PRICE * sold
+    failures = []
+    if orders != bought:
+        failures.append(f"{bought} successful checkouts but {orders} buylog rows")
+    if remaining != stock - sold or remaining < 0:
+        failures.append(f"stock {stock} - sold {sold} != remaining {remaining}")
+    if sold_out and remaining >= quantity:
+        failures.append(f"{sold_out} checkouts refused with {remaining} in stock")
+    if unsettled:
+        failures.append(f"{unsettled} ledger entries left unsettled")
+    if seller_account != credited or seller_account != revenue:
+        failures.append(f"seller_account {seller_account}, ledger {credited}, revenue {revenue}")
+    if STRESS_BALANCE * len(user_ids) - balances != revenue:
+        failures.append(f"users paid {STRESS_BALANCE * len(user_ids) - balances}, revenue {revenue}")
+    return failures
+
+
+def stress(connect, clients_list, shards_list, orders_per_client, quantity, sellout):
+    # concurrent checkouts of one product from separate connections, then check that money and stock balance
+    from transactions import TransactionManager
+    setup = connect()
+    cursor = setup.cursor()
+    seller_id, product_id, user_ids = stress_fixture(cursor, max(clients_list))
+    setup.commit()
+    all_passed = True
+    print("shards | clients | checkouts/s | sold | sold out | retries | books")
+    try:
+        for shards in shards_list:
+            for clients in clients_list:
+                # enough stock for `sellout` of the demand, so the sold-out path runs too
+                stock = int(clients * orders_per_client * quantity * sellout)
+                stress_reset(cursor, seller_id, product_id, user_ids, stock, shards)
+                setup.commit()
+
+                counts = {"bought": 0, "sold_out": 0, "retries": 0}
+                counts_lock = threading.Lock()
+                start = threading.Barrier(clients + 1)
+
+                def client(user_id):
+                    db = TransactionManager(connect())
+                    bought = sold_out = 0
+                    start.wait()
+                    for _ in range(orders_per_client):
+                        try:
+                            db.run(lambda: checkout(db.cursor(), user_id, product_id, quantity))
+                            bought += 1
+                        except InsufficientStockError:
+                            sold_out += 1
+                    db.conn.close()
+                    with counts_lock:
+                        counts["bought"] += bought
+                        counts["sold_out"] += sold_out
+                        counts["retries"] += db.retried
+
+                threads = [threading.Thread(target=client, args=(user_ids[i],)) for i in range(clients)]
+                for thread in threads:
+                    thread.start()
+                start.wait()
+                begin = time.perf_counter()
+                for thread in threads:
+                    thread.join()
+                elapsed = time.perf_counter() - begin
+
+                settle(cursor)
+                setup.commit()
+                failures = stress_verify(cursor, seller_id, product_id, user_ids, stock, quantity,
+                                         counts["bought"], counts["sold_out"])
+                setup.commit()
+                all_passed = all_passed and not failures
+                print(f"{shards:6} | {clients:7} | {(counts['bought'] + counts['sold_out']) / elapsed:11.1f} | "
+                      f"{counts['bought'] * quantity:4} | {counts['sold_out']:8} | {counts['retries']:7} | "
+                      f"{'OK' if not failures else 'FAIL: ' + '; '.join(failures)}")
+    finally:
+        setup.rollback()
+        stress_teardown(cursor, seller_id, product_id, user_ids)
+        setup.commit()
+        setup.close()
+    return all_passed
+
+
+if __name__ == "__main__":
+    import sys
+    import psycopg2
+    import database_setup
+
+    parser = argparse.ArgumentParser(description="Seller ledger settlement, stock shards and reconciliation.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('settle', help="fold unsettled ledger credits into seller_account")
+    shard = sub.add_parser('shard', help="split a hot product's stock over N rows (0: unshard)")
+    shard.add_argument('product_id', type=int)
+    shard.add_argument('shards', type=int)
+    sub.add_parser('reconcile', help="check stock / ledger / buylog invariants")
+    stress_parser = sub.add_parser('stress', help="concurrent checkouts against a temporary product, then reconcile")
+    stress_parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 16])
+    stress_parser.add_argument('--shards', type=int, nargs='+', default=[0, 16])
+    stress_parser.add_argument('--orders', type=int, default=200, help="checkouts per client")
+    stress_parser.add_argument('--quantity', type=int, default=1)
+    stress_parser.add_argument('--sellout', type=float, default=0.8,
+                               help="stock as a fraction of the total demand")
+    args = parser.parse_args()
+
+    conn = database_setup.conn
+    cursor = conn.cursor()
+    ok = True
+    if args.command == 'settle':
+        print(settle(cursor))
+        conn.commit()
+    elif args.command == 'shard':
+        stock = set_stock_shards(cursor, args.product_id, args.shards)
+        conn.commit()
+        print(f"product {args.product_id}: {stock} in stock over {args.shards} shard(s)")
+    elif args.command == 'reconcile':
+        problems, stale = reconcile(cursor)
+        conn.rollback()
+        for name, rows in problems.items():
+            print(f"{name}: {'OK' if not rows else rows}")
+        print(f"sharded products with a stale stock_quantity cache: {stale}")
+        ok = not any(problems.values())
+    else:
+        ok = stress(lambda: psycopg2.connect(dbname=database_setup.db_name, user=database_setup.db_user,
+                                             password=database_setup.db_password, host=database_setup.db_host,
+                                             port=database_setup.db_port),
+                    args.clients, args.shards, args.orders, args.quantity, args.sellout)
+    cursor.close()
+    conn.close()
+    sys.exit(0 if ok else 1)
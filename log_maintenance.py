@@ -0,0 +1,127 @@
+import argparse
+import time
+import traceback
+from datetime import date, timedelta
+from database_setup import (conn, cursor, PARTITIONED_LOGS, PARTITION_MONTHS_AHEAD,
+                            add_months, partition_name, create_log_partitions)
+
+# Periodic maintenance of the monthly log partitions (run from cron, e.g. once a day):
+#   1. create the partitions for the coming months, and move rows that landed in a DEFAULT partition into theirs
+#   2. refresh the daily rollup tables for the last few days
+#   3. roll up and then detach (archive) or drop the partitions older than the retention window
+# Detach / drop only touch catalog entries, so expiring a month never DELETEs rows one by one.
+
+ARCHIVE_SCHEMA = 'log_archive'
+
+
+def rollup_range(start, end):
+    # [start, end) as dates; re-running a day overwrites its rollup rows
+    cursor.execute("""
+    INSERT INTO search_daily_rollup (day, search_query, searches, results)
+    SELECT sl.search_date::date, sl.search_query,
+           COUNT(sr.result_id) FILTER (WHERE sr.rank = 1), COUNT(*)
+    FROM searchlog sl
+    LEFT JOIN searchresult sr
+        ON sr.searchlog_id = sl.searchlog_id
+        AND sr.search_date >= %(start)s::date - 1 AND sr.search_date < %(end)s::date + 1
+    WHERE sl.search_date >= %(start)s AND sl.search_date < %(end)s
+    GROUP BY 1, 2
+    ON CONFLICT (day, search_query) DO UPDATE
+        SET searches = EXCLUDED.searches, results = EXCLUDED.results;
+    """, {"start": start, "end": end})
+
+    cursor.execute("""
+    INSERT INTO sales_daily_rollup (day, product_id, orders, quantity)
+    SELECT purchase_date::date, product_id, COUNT(*), SUM(quantity)
+    FROM buylog
+    WHERE purchase_date >= %(start)s AND purchase_date < %(end)s
+    GROUP BY 1, 2
+    ON CONFLICT (day, product_id) DO UPDATE
+        SET orders = EXCLUDED.orders, quantity = EXCLUDED.quantity;
+    """, {"start": start, "end": end})
+
+
+def list_partitions(table):
+    cursor.execute("""
+    SELECT c.relname
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    JOIN pg_class p ON p.oid = i.inhparent
+    WHERE p.relname = %s
+    ORDER BY c.relname;
+    """, (table,))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def partition_month(table, name):
+    # partitions follow database_setup.partition_name: <table>_yYYYYmMM
+    suffix = name[len(table) + 1:]
+    try:
+        return date(int(suffix[1:5]), int(suffix[6:8]), 1)
+    except ValueError:
+        return None
+
+
+def expire_partitions(retention_months, archive=True, today=None):
+    cutoff = add_months(today or date.today(), -retention_months)
+    expired = {}
+    for table in PARTITIONED_LOGS:
+        for name in list_partitions(table):
+            month = partition_month(table, name)
+            if month and partition_name(table, month) == name and add_months(month, 1) <= cutoff:
+                expired.setdefault(month, []).append((table, name))
+
+    if archive:
+        cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA};")
+    for month, partitions in sorted(expired.items()):
+        # make sure the month is summarized before its detail rows leave the live tables
+        rollup_range(month, add_months(month, 1))
+        for table, name in partitions:
+            cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {name};")
+            if archive:
+                cursor.execute(f"DROP TABLE IF EXISTS {ARCHIVE_SCHEMA}.{name};")
+                cursor.execute(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA};")
+            else:
+                cursor.execute(f"DROP TABLE {name};")
+    return [name for partitions in expired.values() for _, name in partitions]
+
+
+def run(months_ahead=PARTITION_MONTHS_AHEAD, rollup_days=2, retention_months=None, archive=True):
+    try:
+        start_time = time.time()
+        created = create_log_partitions(months_back=0, months_ahead=months_ahead)
+        print(f"Partitions ensured: {len(created)}")
+
+        today = date.today()
+        rollup_range(today - timedelta(days=rollup_days - 1), today + timedelta(days=1))
+        print(f"Daily rollups refreshed for the last {rollup_days} day(s).")
+
+        if retention_months is not None:
+            expired = expire_partitions(retention_months, archive=archive)
+            action = f"archived to {ARCHIVE_SCHEMA}" if archive else "dropped"
+            print(f"Expired partitions {action}: {', '.join(expired) if expired else 'none'}")
+
+        conn.commit()
+        print("Log maintenance done!", f"({round(time.time()-start_time, 2)}s.)")
+    except Exception as e:
+        print("Failed to run log maintenance.")
+        print(traceback.format_exc())
+        conn.rollback()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the monthly log partitions and daily rollups.")
+    parser.add_argument('--months-ahead', type=int, default=PARTITION_MONTHS_AHEAD,
+                        help="create partitions up to this many months ahead")
+    parser.add_argument('--rollup-days', type=int, default=2,
+                        help="refresh the daily rollups for this many recent days")
+    parser.add_argument('--retention-months', type=int, default=None,
+                        help="expire partitions that ended more than this many months ago")
+    parser.add_argument('--drop', action='store_true',
+                        help=f"drop expired partitions instead of moving them to the {ARCHIVE_SCHEMA} schema")
+    args = parser.parse_args()
+
+    run(args.months_ahead, args.rollup_days, args.retention_months, archive=not args.drop)
+
+    cursor.close()
+    conn.close()
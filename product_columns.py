@@ -0,0 +1,408 @@
+import io
+import re
+import sys
+import time
+import select
+import traceback
+import threading
+import numpy as np
+import pandas as pd
+from decimal import Decimal
+
+# Column-wise in-memory copy of product for the filter searches (sex / category / name), so they no
+# longer run a query and build one dict per matching row:
+#   product_id / price (cents) / stock as numpy arrays, category and sex as small integer codes,
+#   goods_name / image_link as lists of interned strings.
+# A search is a vectorized mask over the columns and returns a RecordList: positions plus a reference
+# to the columns, which hands out ProductRecord views (dict-like, read on access) only for the rows used.
+#
+# Kept current from the database: a row trigger on product appends to product_change and NOTIFYs
+# product_change; the listener thread (its own connection to the primary) wakes up on the
+# notification, re-reads the changed products and applies them. The last CHANGE_OVERLAP change ids are
+# read again on every pass (only the ones not applied yet are used) to cover transactions that commit
+# out of id order, and a periodic full reload catches anything missed while disconnected.
+#
+# The feed is the one source for every in-memory copy of product: the listener loads and updates a list
+# of targets (these columns, facets.FacetIndex, rerank.RankFeatures' stock), each with
+#   reload(frame)         the whole table, a DataFrame of FRAME_COLUMNS
+#   apply(rows, removed)  changed rows (tuples in FRAME_COLUMNS order) and the ids of deleted products
+# all called from the listener thread only, so a full reload and an update never interleave.
+#
+# The trigger fires on inserts, deletes and updates of TRACKED_COLUMNS, stock_quantity included. NOTIFY
+# takes a lock at commit that serializes the notifying transactions, so every checkout of an unsharded
+# product now queues there; a product hot enough for that to matter should have its stock sharded
+# (ledger.py shard), whose checkouts leave the product row alone and whose stock reaches the feed when
+# settle() syncs product.stock_quantity.
+
+CHANNEL = 'product_change'
+SEXES = ('Male', 'Female', 'Unisex')
+CHANGE_OVERLAP = 1000
+CHANGE_RETENTION = '1 day'
+TRACKED_COLUMNS = ('goods_name', 'image_link', 'sex', 'category', 'price', 'stock_quantity')
+# listener reconnects wait poll, 2 * poll, 4 * poll, .. up to this many seconds
+RECONNECT_MAX_WAIT = 300
+
+PRODUCT_ROWS_SQL = """
+    SELECT product_id, goods_name, image_link, sex::TEXT, category, (price * 100)::BIGINT, stock_quantity
+    FROM product"""
+
+INSTALL_SQL = f"""
+    CREATE TABLE IF NOT EXISTS product_change (
+        change_id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+        product_id INT NOT NULL,
+        changed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE OR REPLACE FUNCTION log_product_change() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO product_change (product_id)
+            VALUES (CASE WHEN TG_OP = 'DELETE' THEN OLD.product_id ELSE NEW.product_id END);
+        -- identical notifications of one transaction are delivered once
+        PERFORM pg_notify('{CHANNEL}', '');
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS product_change_trigger ON product;
+    CREATE TRIGGER product_change_trigger
+        AFTER INSERT OR DELETE OR UPDATE OF {', '.join(TRACKED_COLUMNS)} ON product
+        FOR EACH ROW EXECUTE FUNCTION log_product_change();
+"""
+
+
+def install(cursor):
+    # idempotent: the change table, the trigger function and the trigger on product (recreated, so this
+    # also narrows the trigger of a database installed before TRACKED_COLUMNS)
+    cursor.execute(INSTALL_SQL)
+
+#--------------------- RECORD VIEWS -----------------------#
+
+FIELDS = ('product_id', 'goods_name', 'image_link', 'sex', 'category', 'price', 'stock_quantity')
+
+
+class ProductRecord:
+    # one row of a column state, read field by field on access; reads the current value, so a record
+    # taken before an update to its product shows the update
+    __slots__ = ('state', 'position')
+
+    def __init__(self, state, position):
+        self.state = state
+        self.position = position
+
+    def __getitem__(self, field):
+        state, position = self.state, self.position
+        if field == 'product_id':
+            return int(state.product_id[position])
+        if field == 'goods_name':
+            return state.names[position]
+        if field == 'image_link':
+            return state.images[position]
+        if field == 'sex':
+            return SEXES[state.sex_code[position]]
+        if field == 'category':
+            return state.categories[state.category_code[position]]
+        if field == 'price':
+            return Decimal(int(state.price_cents[position])).scaleb(-2)
+        if field == 'stock_quantity':
+            return int(state.stock[position])
+        raise KeyError(field)
+
+    def get(self, field, default=None):
+        return self[field] if field in FIELDS else default
+
+    def keys(self):
+        return FIELDS
+
+    def to_dict(self):
+        return {field: self[field] for field in FIELDS}
+
+    def __repr__(self):
+        return f"ProductRecord({self.to_dict()})"
+
+
+class RecordList:
+    # a search result: matching positions of one column state
+    def __init__(self, state, positions):
+        self.state = state
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return RecordList(self.state, self.positions[i])
+        return ProductRecord(self.state, int(self.positions[i]))
+
+    def __iter__(self):
+        for position in self.positions.tolist():
+            yield ProductRecord(self.state, position)
+
+    def product_ids(self):
+        return self.state.product_id[self.positions]
+
+#--------------------- COLUMNS ----------------------------#
+
+class ColumnState:
+    # the arrays of one (re)load; rows are appended in place, positions are never reused
+    def __init__(self, frame):
+        n = len(frame)
+        capacity = max(n, 1)
+        self.size = n
+        self.product_id = np.zeros(capacity, dtype=np.int32)
+        self.price_cents = np.zeros(capacity, dtype=np.int64)
+        self.stock = np.zeros(capacity, dtype=np.int32)
+        self.category_code = np.zeros(capacity, dtype=np.int16)
+        self.sex_code = np.zeros(capacity, dtype=np.int8)
+        self.alive = np.zeros(capacity, dtype=bool)
+        category_code, categories = pd.factorize(frame['category'])
+        self.categories = [sys.intern(str(category)) for category in categories]
+        self.category_index = {category: code for code, category in enumerate(self.categories)}
+        self.product_id[:n] = frame['product_id'].to_numpy()
+        self.price_cents[:n] = frame['price_cents'].to_numpy()
+        self.stock[:n] = frame['stock_quantity'].to_numpy()
+        self.category_code[:n] = category_code
+        self.sex_code[:n] = frame['sex'].map({sex: code for code, sex in enumerate(SEXES)}).to_numpy()
+        self.alive[:n] = True
+        self.names = [sys.intern(name) for name in frame['goods_name']]
+        self.images = frame['image_link'].tolist()
+        self.positions = dict(zip(self.product_id[:n].tolist(), range(n)))
+        # goods_name of every row joined by NUL, for substring search; rebuilt lazily after name changes
+        self.name_text = None
+        self.name_starts = None
+
+    def grow(self):
+        capacity = len(self.product_id) * 3 // 2 + 16
+        for name in ('product_id', 'price_cents', 'stock', 'category_code', 'sex_code', 'alive'):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def name_index(self):
+        if self.name_text is None:
+            lengths = np.fromiter((len(name) + 1 for name in self.names), dtype=np.int64, count=len(self.names))
+            self.name_starts = np.concatenate([[0], np.cumsum(lengths)])
+            self.name_text = '\0'.join(self.names) + '\0'
+        return self.name_text, self.name_starts
+
+
+class ProductColumns:
+    def __init__(self, frame=None):
+        self.lock = threading.Lock()
+        self.state = ColumnState(frame if frame is not None else empty_frame())
+
+    def rebuild(self, frame):
+        state = ColumnState(frame)
+        with self.lock:
+            self.state = state
+        return self
+
+    # feed target (see the header)
+    reload = rebuild
+
+    def apply(self, rows, removed):
+        for row in rows:
+            self.upsert(*row)
+        for product_id in removed:
+            self.remove(product_id)
+
+    def __len__(self):
+        state = self.state
+        return int(state.alive[:state.size].sum())
+
+    def upsert(self, product_id, goods_name, image_link, sex, category, price_cents, stock_quantity):
+        with self.lock:
+            state = self.state
+            position = state.positions.get(product_id)
+            if position is None:
+                if state.size == len(state.product_id):
+                    state.grow()
+                position = state.size
+                state.names.append(sys.intern(goods_name))
+                state.images.append(image_link)
+                state.product_id[position] = product_id
+                state.positions[product_id] = position
+                state.size += 1
+                state.name_text = None
+            elif state.names[position] != goods_name:
+                state.names[position] = sys.intern(goods_name)
+                state.name_text = None
+            state.images[position] = image_link
+            if category not in state.category_index:
+                state.category_index[category] = len(state.categories)
+                state.categories.append(sys.intern(category))
+            state.category_code[position] = state.category_index[category]
+            state.sex_code[position] = SEXES.index(sex)
+            state.price_cents[position] = price_cents
+            state.stock[position] = stock_quantity
+            state.alive[position] = True
+
+    def remove(self, product_id):
+        # the position stays allocated (and dead) until the next rebuild
+        with self.lock:
+            position = self.state.positions.pop(product_id, None)
+            if position is not None:
+                self.state.alive[position] = False
+
+    def where(self, sex=None, category=None, name=None):
+        # rows in load order (product_id, then products added since); name matches like LIKE '%name%'
+        # (case-sensitive)
+        with self.lock:
+            state = self.state
+            n = state.size
+            mask = state.alive[:n].copy()
+            if sex is not None:
+                mask &= state.sex_code[:n] == (SEXES.index(sex) if sex in SEXES else -1)
+            if category is not None:
+                mask &= state.category_code[:n] == state.category_index.get(category, -1)
+            if name is not None:
+                mask &= self._name_mask(state, name)
+        return RecordList(state, np.flatnonzero(mask))
+
+    def _name_mask(self, state, needle):
+        mask = np.zeros(state.size, dtype=bool)
+        if not needle:
+            mask[:] = True
+            return mask
+        if '\0' in needle:
+            return mask
+        text, starts = state.name_index()
+        # offsets of every occurrence -> rows, in one searchsorted
+        found = np.fromiter((match.start() for match in re.finditer(re.escape(needle), text)), dtype=np.int64)
+        mask[np.searchsorted(starts, found, side='right') - 1] = True
+        return mask
+
+    def categories(self):
+        return list(self.state.categories)
+
+    def metrics(self):
+        state = self.state
+        n = state.size
+        arrays = (state.product_id, state.price_cents, state.stock, state.category_code, state.sex_code, state.alive)
+        return {
+            "products": int(state.alive[:n].sum()),
+            "positions": n,
+            "categories": len(state.categories),
+            "column_bytes": sum(array.nbytes for array in arrays)
+        }
+
+#--------------------- LOADING / CHANGES ------------------#
+
+FRAME_COLUMNS = ['product_id', 'goods_name', 'image_link', 'sex', 'category', 'price_cents', 'stock_quantity']
+
+
+def empty_frame():
+    return pd.DataFrame({column: pd.Series(dtype=object if column in ('goods_name', 'image_link', 'sex', 'category')
+                                           else np.int64) for column in FRAME_COLUMNS})
+
+
+def read_frame(cursor):
+    # the whole product table through COPY, parsed by pandas
+    buffer = io.StringIO()
+    cursor.copy_expert(f"COPY ({PRODUCT_ROWS_SQL} ORDER BY product_id) TO STDOUT WITH (FORMAT csv)", buffer)
+    buffer.seek(0)
+    return pd.read_csv(buffer, names=FRAME_COLUMNS, keep_default_na=False,
+                       dtype={'goods_name': str, 'image_link': str, 'sex': str, 'category': str})
+
+
+def change_mark(cursor):
+    cursor.execute("SELECT COALESCE(MAX(change_id), 0) FROM product_change")
+    return cursor.fetchone()[0]
+
+
+def load_from_db(cursor, targets):
+    # reloads every target from one read of product -> the ChangeFeed to follow from there; the mark is
+    # read first, so changes racing the load are applied again later
+    feed = ChangeFeed(change_mark(cursor))
+    frame = read_frame(cursor)
+    for target in targets:
+        target.reload(frame)
+    return feed
+
+
+class ChangeFeed:
+    # position in product_change: every id up to mark - CHANGE_OVERLAP is applied, and of the ids above
+    # that, the ones in seen
+    def __init__(self, mark):
+        self.mark = mark
+        self.seen = set()
+
+    def apply(self, cursor, targets):
+        # re-reads the products changed since the last call; -> number of products applied
+        low = max(self.mark - CHANGE_OVERLAP, 0)
+        cursor.execute("SELECT change_id, product_id FROM product_change WHERE change_id > %s", (low,))
+        changes = [(change_id, product_id) for change_id, product_id in cursor.fetchall()
+                   if change_id not in self.seen]
+        if not changes:
+            return 0
+        product_ids = sorted({product_id for _, product_id in changes})
+        cursor.execute(PRODUCT_ROWS_SQL + " WHERE product_id = ANY(%s)", (product_ids,))
+        rows = cursor.fetchall()
+        found = {row[0] for row in rows}
+        removed = [product_id for product_id in product_ids if product_id not in found]
+        for target in targets:
+            target.apply(rows, removed)
+        self.mark = max(self.mark, max(change_id for change_id, _ in changes))
+        low = self.mark - CHANGE_OVERLAP
+        self.seen = {change_id for change_id in self.seen if change_id > low}
+        self.seen.update(change_id for change_id, _ in changes if change_id > low)
+        return len(product_ids)
+
+
+def start_listening(connect, targets, feed, full_refresh=600, poll=5):
+    # follows product_change on a dedicated connection (NOTIFY is not delivered through replicas) and
+    # applies it to targets; returns the event that stops the thread
+    stop = threading.Event()
+
+    def loop():
+        nonlocal feed
+        conn, last_full, last_prune, failures = None, time.time(), 0, 0
+        while not stop.is_set():
+            try:
+                if conn is None:
+                    conn = connect()
+                    conn.autocommit = True
+                    conn.cursor().execute(f"LISTEN {CHANNEL}")
+                    feed.apply(conn.cursor(), targets)
+                notified = select.select([conn], [], [], poll) != ([], [], [])
+                if notified:
+                    conn.poll()
+                    conn.notifies.clear()
+                cursor = conn.cursor()
+                if time.time() - last_full >= full_refresh:
+                    feed = load_from_db(cursor, targets)
+                    last_full = time.time()
+                elif notified:
+                    feed.apply(cursor, targets)
+                if time.time() - last_prune >= 3600:
+                    cursor.execute(f"DELETE FROM product_change WHERE changed_at < now() - interval '{CHANGE_RETENTION}'")
+                    last_prune = time.time()
+                failures = 0
+            except Exception as e:
+                # any error (not only psycopg2's) drops the connection; the thread must not die, or the
+                # targets silently stop following the database
+                failures += 1
+                wait = min(poll * 2 ** (failures - 1), RECONNECT_MAX_WAIT)
+                print(f"Product change listener failed ({failures} in a row), reconnecting in {wait:g}s: {e}")
+                traceback.print_exc()
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+                conn = None
+                stop.wait(wait)
+        if conn is not None:
+            conn.close()
+
+    threading.Thread(target=loop, name="product-changes", daemon=True).start()
+    return stop
+
+
+if __name__ == "__main__":
+    import database_setup
+    cursor = database_setup.conn.cursor()
+    install(cursor)
+    database_setup.conn.commit()
+    print("product_change table and trigger installed.")
@@ -0,0 +1,156 @@
+import time
+import itertools
+import threading
+import psycopg2
+
+# Read replicas for the read-only BE methods (see TransactionManager.replica_read).
+# Each replica keeps one autocommit, read-only connection. Reads are spread round-robin over the
+# healthy replicas; a replica that fails a query, cannot be reached or lags too far behind the
+# primary is taken out of rotation and re-checked in the background after a cooldown.
+
+def parse_dsns(value):
+    # PG_REPLICA_DSNS="host=localhost port=5433 dbname=postgres user=kdk; postgresql://kdk@localhost:5434/postgres"
+    return [dsn.strip() for dsn in (value or '').split(';') if dsn.strip()]
+
+
+class Replica:
+    def __init__(self, dsn):
+        self.dsn = dsn
+        self.conn = None
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.down_until = 0.0
+        self.served = 0
+        self.last_error = None
+
+    def connection(self):
+        with self.lock:
+            if self.conn is None or self.conn.closed:
+                self.conn = psycopg2.connect(self.dsn)
+                self.conn.set_session(readonly=True, autocommit=True)
+            return self.conn
+
+    def healthy(self, now=None):
+        return (now or time.monotonic()) >= self.down_until
+
+    def mark_down(self, error, cooldown):
+        with self.lock:
+            self.failures += 1
+            self.last_error = str(error).strip()
+            # back off up to 16x the cooldown while the replica keeps failing
+            self.down_until = time.monotonic() + cooldown * min(2 ** (self.failures - 1), 16)
+            if self.conn is not None and not self.conn.closed:
+                self.conn.close()
+            self.conn = None
+
+    def mark_up(self):
+        with self.lock:
+            self.failures = 0
+            self.down_until = 0.0
+            self.last_error = None
+
+    def check(self, max_lag_seconds):
+        # raises if the replica is unreachable or too far behind
+        cur = self.connection().cursor()
+        cur.execute("""
+            SELECT COALESCE(EXTRACT(EPOCH FROM (now() - pg_last_xact_replay_timestamp())), 0)
+            WHERE pg_is_in_recovery()""")
+        row = cur.fetchone()
+        cur.close()
+        lag = float(row[0]) if row else 0.0
+        if max_lag_seconds is not None and lag > max_lag_seconds:
+            raise RuntimeError(f"replication lag {lag:.1f}s exceeds {max_lag_seconds}s")
+        return lag
+
+
+class ReplicaPool:
+    def __init__(self, dsns, cooldown=5.0, health_interval=10.0, max_lag_seconds=30.0):
+        self.replicas = [Replica(dsn) for dsn in dsns]
+        self.cooldown = cooldown
+        self.health_interval = health_interval
+        self.max_lag_seconds = max_lag_seconds
+        self.rotation = itertools.count()
+        self._stop = None
+
+    def __bool__(self):
+        return bool(self.replicas)
+
+    def candidates(self):
+        # healthy replicas, starting at the next one in round-robin order
+        now = time.monotonic()
+        healthy = [replica for replica in self.replicas if replica.healthy(now)]
+        if not healthy:
+            return []
+        start = next(self.rotation) % len(healthy)
+        return healthy[start:] + healthy[:start]
+
+    def mark_down(self, replica, error):
+        replica.mark_down(error, self.cooldown)
+
+    def check_all(self):
+        for replica in self.replicas:
+            if replica.failures and not replica.healthy():
+                continue  # still cooling down
+            try:
+                replica.check(self.max_lag_seconds)
+                replica.mark_up()
+            except Exception as e:
+                self.mark_down(replica, e)
+
+    def start_health_checks(self):
+        if not self.replicas or self._stop:
+            return
+        self._stop = stop = threading.Event()
+
+        def loop():
+            while not stop.wait(self.health_interval):
+                self.check_all()
+
+        threading.Thread(target=loop, name="replica-health", daemon=True).start()
+
+    def close(self):
+        if self._stop:
+            self._stop.set()
+            self._stop = None
+        for replica in self.replicas:
+            if replica.conn is not None and not replica.conn.closed:
+                replica.conn.close()
+
+    def status(self):
+        now = time.monotonic()
+        return [{
+            "dsn": replica.dsn,
+            "healthy": replica.healthy(now),
+            "served": replica.served,
+            "failures": replica.failures,
+            "last_error": replica.last_error
+        } for replica in self.replicas]
+
+
+if __name__ == "__main__":
+    # smoke check against real servers: which server answers each routed read, and replica health
+    import os
+    from dotenv import load_dotenv
+    from transactions import TransactionManager
+
+    load_dotenv()
+    primary = psycopg2.connect(dbname=os.getenv('PG_DBNAME'), user=os.getenv('PG_USERNAME'), password=os.getenv('PG_PASSWORD'),
+                               host=os.getenv('PG_HOST'), port=os.getenv('PG_PORT'))
+    pool = ReplicaPool(parse_dsns(os.getenv('PG_REPLICA_DSNS')))
+    db = TransactionManager(primary, replicas=pool)
+    pool.check_all()
+
+    @db.replica_read()
+    def server_port():
+        cur = db.cursor()
+        cur.execute("SELECT inet_server_port()")
+        return cur.fetchone()[0]
+
+    print("reads:", [server_port() for _ in range(6)])
+    with db.scope():
+        db.cursor().execute("SELECT 1")
+    print("read right after a write:", server_port())
+    for status in pool.status():
+        print(status)
+    pool.close()
+    primary.close()
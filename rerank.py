@@ -0,0 +1,156 @@
+import threading
+import numpy as np
+
+# Second stage for style / image search: the top-N vector candidates are rescored with per-product
+# features instead of being returned purely by cosine similarity.
+#   popularity  log1p(orders) / log1p(max orders), orders = buylog rows
+#   conversion  (orders + a) / (impressions + b), impressions = searchresult rows (products shown in results)
+#   in_stock    1 if the product has stock left
+# score = similarity * w_similarity + popularity * w_popularity + conversion * w_conversion + in_stock * w_in_stock
+#
+# Features live in numpy arrays indexed by product_id (product ids are a dense identity), so rescoring
+# N candidates is a few gathers. refresh() reads only the buylog / searchresult rows after the last
+# seen ids. Stock comes from the product_change feed (product_columns.py: reload / apply), like the
+# other in-memory copies of product; for a sharded product that is product.stock_quantity, which
+# ledger.settle() keeps in step with the shards.
+# The id watermarks can skip a row whose transaction commits after a later id was already read; that
+# is one lost order / impression for ranking purposes, not a correctness problem.
+
+DEFAULT_WEIGHTS = {'similarity': 1.0, 'popularity': 0.05, 'conversion': 0.05, 'in_stock': 0.1}
+CONVERSION_PRIOR = (1.0, 20.0)
+
+ORDERS_DELTA_SQL = """
+    SELECT product_id, COUNT(*), MAX(buylog_id) FROM buylog WHERE buylog_id > %s GROUP BY product_id"""
+IMPRESSIONS_DELTA_SQL = """
+    SELECT product_id, COUNT(*), MAX(result_id) FROM searchresult WHERE result_id > %s GROUP BY product_id"""
+
+
+def parse_weights(text, defaults=DEFAULT_WEIGHTS):
+    # "popularity=0.1,in_stock=1" -> DEFAULT_WEIGHTS with those two replaced
+    weights = dict(defaults)
+    for item in filter(None, (part.strip() for part in (text or '').split(','))):
+        name, _, value = item.partition('=')
+        if name.strip() not in weights:
+            raise ValueError(f"unknown re-ranking weight {name.strip()!r} (expected one of {', '.join(weights)})")
+        weights[name.strip()] = float(value)
+    return weights
+
+
+class RankFeatures:
+    def __init__(self, capacity=1, conversion_prior=CONVERSION_PRIOR):
+        self.lock = threading.Lock()
+        self.conversion_prior = conversion_prior
+        self.orders = np.zeros(capacity, dtype=np.float32)
+        self.impressions = np.zeros(capacity, dtype=np.float32)
+        # -1: unknown (a product the feed has not delivered yet), treated as in stock
+        self.stock = np.full(capacity, -1, dtype=np.int32)
+        self.max_orders = 0.0
+        self.orders_mark = 0
+        self.impressions_mark = 0
+
+    def __len__(self):
+        return len(self.stock)
+
+    def _reserve(self, max_id):
+        # caller holds the lock
+        if max_id < len(self.stock):
+            return
+        size = max(max_id + 1, len(self.stock) * 3 // 2)
+        for name, fill in (('orders', 0), ('impressions', 0), ('stock', -1)):
+            old = getattr(self, name)
+            new = np.full(size, fill, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def add_orders(self, product_ids, counts):
+        if len(product_ids):
+            product_ids = np.asarray(product_ids, dtype=np.int64)
+            with self.lock:
+                self._reserve(int(product_ids.max()))
+                np.add.at(self.orders, product_ids, np.asarray(counts, dtype=np.float32))
+                # orders only grow, so the maximum can be kept without rescanning the array
+                self.max_orders = max(self.max_orders, float(self.orders[product_ids].max()))
+
+    def add_impressions(self, product_ids, counts):
+        if len(product_ids):
+            product_ids = np.asarray(product_ids, dtype=np.int64)
+            with self.lock:
+                self._reserve(int(product_ids.max()))
+                np.add.at(self.impressions, product_ids, np.asarray(counts, dtype=np.float32))
+
+    def set_stock(self, product_ids, stock):
+        if len(product_ids):
+            product_ids = np.asarray(product_ids, dtype=np.int64)
+            with self.lock:
+                self._reserve(int(product_ids.max()))
+                self.stock[product_ids] = stock
+
+    # product_change feed target: product_columns.FRAME_COLUMNS rows
+    def reload(self, frame):
+        self.set_stock(frame['product_id'].to_numpy(), frame['stock_quantity'].to_numpy())
+        return self
+
+    def apply(self, rows, removed):
+        self.set_stock([row[0] for row in rows], [row[-1] for row in rows])
+        self.set_stock(list(removed), 0)
+
+    def features(self, product_ids):
+        # -> (popularity, conversion, in_stock) for the given ids, float32 arrays
+        product_ids = np.asarray(product_ids, dtype=np.int64)
+        with self.lock:
+            orders, impressions, stock, max_orders = self.orders, self.impressions, self.stock, self.max_orders
+        known = product_ids < len(stock)
+        ids = np.where(known, product_ids, 0)
+        candidate_orders = np.where(known, orders[ids], 0).astype(np.float32)
+        candidate_impressions = np.where(known, impressions[ids], 0).astype(np.float32)
+        candidate_stock = np.where(known, stock[ids], -1)
+        popularity = np.log1p(candidate_orders) / np.log1p(max_orders) if max_orders > 0 else np.zeros_like(candidate_orders)
+        prior_orders, prior_impressions = self.conversion_prior
+        conversion = (candidate_orders + prior_orders) / (candidate_impressions + prior_impressions)
+        in_stock = (candidate_stock != 0).astype(np.float32)
+        return popularity, conversion, in_stock
+
+    def scores(self, product_ids, similarities, weights=DEFAULT_WEIGHTS):
+        popularity, conversion, in_stock = self.features(product_ids)
+        return (np.asarray(similarities, dtype=np.float32) * weights['similarity']
+                + popularity * weights['popularity'] + conversion * weights['conversion']
+                + in_stock * weights['in_stock'])
+
+    def rerank(self, products, top_k, weights=DEFAULT_WEIGHTS):
+        # products: dicts with "product_id" and "similarity", best first -> the top_k by blended "score"
+        if not products:
+            return products
+        scores = self.scores([product["product_id"] for product in products],
+                             [product["similarity"] for product in products], weights)
+        order = np.argsort(-scores, kind='stable')[:top_k]
+        ranked = []
+        for i in order:
+            products[i]["score"] = float(scores[i])
+            ranked.append(products[i])
+        return ranked
+
+    def refresh(self, cursor):
+        cursor.execute(ORDERS_DELTA_SQL, (self.orders_mark,))
+        rows = cursor.fetchall()
+        if rows:
+            product_ids, counts, marks = zip(*rows)
+            self.add_orders(product_ids, counts)
+            self.orders_mark = max(self.orders_mark, max(marks))
+
+        cursor.execute(IMPRESSIONS_DELTA_SQL, (self.impressions_mark,))
+        rows = cursor.fetchall()
+        if rows:
+            product_ids, counts, marks = zip(*rows)
+            self.add_impressions(product_ids, counts)
+            self.impressions_mark = max(self.impressions_mark, max(marks))
+        return self
+
+    def metrics(self):
+        with self.lock:
+            return {
+                "products": len(self.stock),
+                "orders": int(self.orders.sum()),
+                "impressions": int(self.impressions.sum()),
+                "out_of_stock": int((self.stock == 0).sum()),
+                "bytes": self.orders.nbytes + self.impressions.nbytes + self.stock.nbytes
+            }
@@ -0,0 +1,293 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+from statements import statements
+
+# The index set behind every query BE issues, and an EXPLAIN-based check that keeps it that way.
+# create_tables() (database_setup.py) calls create_indexes(); on an existing database run
+#   python3 schema.py create
+# and after a schema or query change
+#   python3 schema.py check [--seed]        (--seed first loads synthetic_data.py at --scale)
+# which plans every BE query against the current data and exits 1 if one of them reads a large table
+# with a sequential scan or goes over its cost budget, or if PLAN_TABLES are too small for that to mean
+# anything. The same checks run under pytest (tests/test_schema_plans.py), which skips them when the .env
+# database cannot be reached.
+#
+# Not indexed on purpose: password columns. sign_in goes through the UNIQUE index on users.username and
+# seller_login through idx_seller_name, which leave at most a few rows for the password comparison.
+
+INDEXES = [
+    # (name, definition, the BE queries it serves)
+    ('idx_product_goods_name', "product(goods_name)", "products_by_names (NL / image / style search hits)"),
+    ('idx_product_goods_name_trgm', "product USING GIN (goods_name gin_trgm_ops)", "search_name (LIKE '%...%')"),
+    # covering indexes for browse_products (statements.BROWSE_SORTS); index-only scans also need an
+    # up-to-date visibility map, i.e. autovacuum keeping up with product writes
+    ('idx_product_browse_category_price',
+     "product(category, price, product_id) INCLUDE (goods_name, image_link, sex, stock_quantity, date_added)",
+     "search_category, browse by category sorted by price"),
+    ('idx_product_browse_category_newest',
+     "product(category, date_added, product_id) INCLUDE (goods_name, image_link, sex, stock_quantity, price)",
+     "browse by category, newest first"),
+    ('idx_product_browse_price',
+     "product(price, product_id) INCLUDE (goods_name, image_link, sex, category, stock_quantity, date_added)",
+     "browse sorted by price"),
+    ('idx_product_browse_newest',
+     "product(date_added, product_id) INCLUDE (goods_name, image_link, sex, category, stock_quantity, price)",
+     "browse newest first"),
+    ('idx_product_seller', "product(seller_id, goods_name)",
+     "sales history, exports, import_products (seller + name match)"),
+    ('idx_seller_name', "seller(seller_name)", "seller_login"),
+    ('idx_unsettled_seller_ledger', "seller_ledger(seller_id) WHERE settled_at IS NULL",
+     "seller_info / seller_login (unsettled credits)"),
+    ('idx_seller_ledger_created', "seller_ledger(created_at)", "ledger.settle (pruning settled entries), reconcile"),
+    ('idx_searchlog_user_date', "searchlog(user_id, search_date)", "get_search_history"),
+    ('idx_searchlog_searchresult', "searchresult(searchlog_id)", "searchresult of a search (trending replay)"),
+    ('idx_buylog_user_date', "buylog(user_id, purchase_date)", "get_purchase_history"),
+    ('idx_buylog_product', "buylog(product_id)", "get_sales_history, export_sales, reconcile"),
+]
+
+# replaced by a wider index above
+RETIRED_INDEXES = ('idx_search_searchlog', 'idx_user_buylog', 'idx_product_category')
+
+EXTENSIONS = ('pg_trgm',)
+
+
+def create_indexes(cursor):
+    # idempotent; on the partitioned log tables the index is created on every partition
+    for extension in EXTENSIONS:
+        cursor.execute(f"CREATE EXTENSION IF NOT EXISTS {extension};")
+    for name in RETIRED_INDEXES:
+        cursor.execute(f"DROP INDEX IF EXISTS {name};")
+    for name, definition, _ in INDEXES:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition};")
+    return [name for name, _, _ in INDEXES]
+
+#--------------------- PLAN CHECKS ------------------------#
+
+# a sequential scan is only reported on relations with at least this many rows (pg_class.reltuples)
+SEQ_SCAN_MIN_ROWS = 10000
+# the tables the checks are about; with fewer rows than SEQ_SCAN_MIN_ROWS in them every plan passes
+PLAN_TABLES = ('users', 'product', 'searchlog', 'searchresult', 'buylog')
+POINT_COST = 200      # single-row lookups and writes (summed over partitions for the log tables)
+PAGE_COST = 5000      # a browse page: an index-ordered scan whose filters (sex, stock, price) skip some entries
+LIST_COST = 20000     # queries returning a user's / seller's / category's rows
+# the history samples are a heavy user at the 99th percentile: the heaviest synthetic users (Zipf) hold a
+# quarter of the log, and reading all of that is rightly a sequential scan
+HEAVY_USER_SQL = """
+    SELECT user_id FROM (SELECT user_id, COUNT(*) AS n FROM {table} GROUP BY user_id) c
+    ORDER BY n DESC LIMIT 1 OFFSET (SELECT COUNT(DISTINCT user_id) / 100 FROM {table})"""
+
+# name -> (sql: a HOT_STATEMENTS name or SQL with %(p1)s.. placeholders,
+#          sample: SQL returning one row of representative parameters p1, p2, ..,
+#          cost budget, relations a sequential scan is fine on)
+PLAN_CHECKS = {
+    'get_user': ('get_user', "SELECT MAX(user_id) FROM users", POINT_COST, ()),
+    'sign_in': ('sign_in', "SELECT username, password FROM users ORDER BY user_id DESC LIMIT 1", POINT_COST, ()),
+    'seller_login': ('seller_login', "SELECT seller_name, password FROM seller ORDER BY seller_id DESC LIMIT 1",
+                     POINT_COST, ()),
+    'seller_info': ('seller_info', "SELECT MAX(seller_id) FROM seller", POINT_COST, ()),
+    'charge_account': ('charge_account', "SELECT 1, MAX(user_id) FROM users", POINT_COST, ()),
+    'products_by_names': ('products_by_names',
+                          "SELECT ARRAY(SELECT goods_name FROM product ORDER BY product_id DESC LIMIT 10)",
+                          POINT_COST, ()),
+    'search_name': ('search_name', "SELECT goods_name FROM product ORDER BY product_id DESC LIMIT 1", LIST_COST, ()),
+    # a third of the catalog: a sequential scan is the right plan
+    'search_sex': ('search_sex', "SELECT 'Unisex'", None, ('product',)),
+    'search_category': ('search_category',
+                        "SELECT category FROM product GROUP BY category ORDER BY COUNT(*), category LIMIT 1",
+                        LIST_COST, ()),
+    'product_info': ('product_info', "SELECT product_id, seller_id FROM product ORDER BY product_id DESC LIMIT 1",
+                     POINT_COST, ()),
+    'purchase_product': ('purchase_product', "SELECT MAX(product_id) FROM product", POINT_COST, ()),
+    'debit_user': ('debit_user', "SELECT 1, MAX(user_id) FROM users", POINT_COST, ()),
+    'take_stock': ('take_stock', "SELECT 1, MAX(product_id) FROM product", POINT_COST, ()),
+    'take_stock_shard': ('take_stock_shard', "SELECT MAX(product_id), 1, 0 FROM product", POINT_COST, ()),
+    'add_buylog': ('add_buylog', "SELECT 1, MAX(product_id), (SELECT MAX(user_id) FROM users) FROM product",
+                   POINT_COST, ()),
+    'update_product': ('update_product_price',
+                       "SELECT 1, product_id, seller_id FROM product ORDER BY product_id DESC LIMIT 1", POINT_COST, ()),
+    'delete_product': ('delete_product', "SELECT product_id, seller_id FROM product ORDER BY product_id DESC LIMIT 1",
+                       POINT_COST, ()),
+    # first pages (cursor = start of the range) of a cheap category and of the whole catalog
+    'browse_price_asc_category': ('browse_price_asc_category', """
+        SELECT 0, 0, 0, 100000000, ARRAY['Male', 'Female', 'Unisex'], 1, 21, category
+        FROM product GROUP BY category ORDER BY COUNT(*) DESC LIMIT 1""", PAGE_COST, ()),
+    'browse_newest_category': ('browse_newest_category', """
+        SELECT 'infinity'::TIMESTAMP, 2147483647, 0, 100000000, ARRAY['Female'], 0, 21, category
+        FROM product GROUP BY category ORDER BY COUNT(*) DESC LIMIT 1""", PAGE_COST, ()),
+    'browse_price_desc': ('browse_price_desc',
+                          "SELECT 100000000, 2147483647, 0, 100000000, ARRAY['Male', 'Female', 'Unisex'], 1, 21",
+                          PAGE_COST, ()),
+    'browse_newest': ('browse_newest',
+                      "SELECT 'infinity'::TIMESTAMP, 2147483647, 0, 100000000, ARRAY['Male', 'Female', 'Unisex'], 0, 21",
+                      PAGE_COST, ()),
+    'purchase_history': ("""
+        SELECT goods_name, price, quantity, purchase_date FROM purchase_history
+        WHERE user_id = %(p1)s ORDER BY purchase_date DESC""",
+        HEAVY_USER_SQL.format(table='buylog'), LIST_COST, ()),
+    'search_history': ("""
+        SELECT search_query, search_date FROM user_search_history
+        WHERE user_id = %(p1)s ORDER BY search_date DESC""",
+        HEAVY_USER_SQL.format(table='searchlog'), LIST_COST, ()),
+    # every sale of every product of a seller: hash joins over buylog and product are fine at any size
+    'sales_history': ("""
+        SELECT ph.user_id, ph.username, ph.product_id, ph.goods_name, ph.price, ph.stock_quantity, ph.quantity,
+            ph.purchase_date
+        FROM sales_history ph
+        WHERE ph.product_id IN (SELECT product_id FROM product WHERE seller_id = %(p1)s)
+        ORDER BY ph.purchase_date DESC""",
+        "SELECT MAX(seller_id) FROM seller", LIST_COST, ('buylog', 'product')),
+    'export_products': ("""
+        SELECT product_id, goods_name, image_link, sex, category, price, stock_quantity, date_added
+        FROM product WHERE seller_id = %(p1)s ORDER BY product_id""",
+        "SELECT MAX(seller_id) FROM seller", LIST_COST, ()),
+    'trending_products': ("SELECT product_id, goods_name, category, sex, price FROM product WHERE product_id = ANY(%(p1)s)",
+                          "SELECT ARRAY(SELECT product_id FROM product ORDER BY product_id DESC LIMIT 10)",
+                          POINT_COST, ()),
+}
+
+
+# these must be answered from the index alone, in index order (no Sort)
+INDEX_ONLY_CHECKS = ('browse_price_asc_category', 'browse_newest_category', 'browse_price_desc', 'browse_newest')
+
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', ()):
+        yield from plan_nodes(child)
+
+
+def explain(cursor, sql, params, generic=False):
+    # prepared hot statements are EXPLAINed as such, with either the custom or the generic plan (the generic
+    # one is what a session switches to after a few EXECUTEs)
+    if statements.prepares(sql):
+        # prepared statements outlive a rollback: a failed EXPLAIN rolls back to the savepoint, so that the
+        # DEALLOCATE runs in a live transaction and the EXPLAIN error is the one raised
+        cursor.execute(f"PREPARE plan_check AS {statements.statements[sql]}")
+        cursor.execute("SAVEPOINT plan_check")
+        try:
+            cursor.execute(f"SET LOCAL plan_cache_mode = {'force_generic_plan' if generic else 'force_custom_plan'}")
+            placeholders = ', '.join(['%s'] * len(params))
+            cursor.execute(f"EXPLAIN (FORMAT JSON) EXECUTE plan_check ({placeholders})" if params
+                           else "EXPLAIN (FORMAT JSON) EXECUTE plan_check", params)
+            plan = cursor.fetchone()[0]
+        except Exception:
+            cursor.execute("ROLLBACK TO SAVEPOINT plan_check")
+            cursor.execute("DEALLOCATE plan_check")
+            raise
+        cursor.execute("RELEASE SAVEPOINT plan_check")
+        cursor.execute("DEALLOCATE plan_check")
+    else:
+        if sql in statements.statements:
+            sql = statements.inline_sql(sql)
+        cursor.execute("EXPLAIN (FORMAT JSON) " + sql, {f"p{i + 1}": value for i, value in enumerate(params)})
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']
+
+
+def parent_table(cursor, relation, cache):
+    # buylog_y2026m05 -> buylog
+    if relation not in cache:
+        cursor.execute("""
+            SELECT COALESCE((SELECT p.relname FROM pg_inherits i JOIN pg_class p ON p.oid = i.inhparent
+                             WHERE i.inhrelid = c.oid), c.relname), c.reltuples
+            FROM pg_class c WHERE c.relname = %s""", (relation,))
+        cache[relation] = cursor.fetchone() or (relation, 0)
+    return cache[relation]
+
+
+def thin_tables(cursor):
+    # -> {table: rows} of the PLAN_TABLES with fewer than SEQ_SCAN_MIN_ROWS rows (summed over partitions;
+    # a table that was never ANALYZEd counts as empty)
+    cursor.execute("""
+        SELECT t.relname, SUM(GREATEST(c.reltuples, 0))
+        FROM pg_class t
+        LEFT JOIN pg_inherits i ON i.inhparent = t.oid
+        JOIN pg_class c ON c.oid = COALESCE(i.inhrelid, t.oid)
+        WHERE t.relname = ANY(%s) AND t.relkind IN ('r', 'p')
+        GROUP BY t.relname""", (list(PLAN_TABLES),))
+    rows = dict(cursor.fetchall())
+    return {table: int(rows.get(table, 0)) for table in PLAN_TABLES if rows.get(table, 0) < SEQ_SCAN_MIN_ROWS}
+
+
+def check_plans(cursor, names=None, cost_scale=1.0, verbose=False):
+    # -> {check name: [problems]}; nothing is executed except the sample queries
+    results, relations = {}, {}
+    for name, (sql, sample, budget, seq_ok) in PLAN_CHECKS.items():
+        if names and name not in names:
+            continue
+        cursor.execute(sample)
+        params = cursor.fetchone()
+        problems = []
+        for generic in ((False, True) if statements.prepares(sql) else (False,)):
+            plan = explain(cursor, sql, params, generic)
+            label = 'generic plan' if generic else 'plan'
+            for node in plan_nodes(plan):
+                if node['Node Type'] not in ('Seq Scan', 'Parallel Seq Scan'):
+                    continue
+                table, rows = parent_table(cursor, node['Relation Name'], relations)
+                if table not in seq_ok and rows >= SEQ_SCAN_MIN_ROWS:
+                    problems.append(f"{label}: Seq Scan on {node['Relation Name']} ({int(rows)} rows)")
+            if name in INDEX_ONLY_CHECKS and not any(node['Node Type'] == 'Index Only Scan' for node in plan_nodes(plan)):
+                problems.append(f"{label}: no Index Only Scan")
+            if name in INDEX_ONLY_CHECKS and any(node['Node Type'] == 'Sort' for node in plan_nodes(plan)):
+                problems.append(f"{label}: Sort")
+            if budget is not None and plan['Total Cost'] > budget * cost_scale:
+                problems.append(f"{label}: cost {plan['Total Cost']:.0f} > budget {budget * cost_scale:.0f}")
+            if verbose:
+                print(f"{name} ({label}): {plan['Node Type']}, cost {plan['Total Cost']:.1f}")
+        results[name] = problems
+    return results
+
+
+def seed(scale):
+    # a dataset large enough for the planner to prefer the indexes; scale 1 = 100k users / 50k products
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'synthetic_data.py')
+    subprocess.run([sys.executable, script, '--reset', '--catalog-dir', '',
+                    '--users', str(int(100000 * scale)), '--sellers', str(max(int(100 * scale), 10)),
+                    '--products', str(int(50000 * scale)), '--searches', str(int(200000 * scale)),
+                    '--purchases', str(int(100000 * scale))], check=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index set of the BE queries and plan-regression checks.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('create', help="create the indexes (and drop retired ones) on the current database")
+    check = sub.add_parser('check', help="EXPLAIN every BE query, fail on a seq scan or an over-budget plan")
+    check.add_argument('--seed', action='store_true', help="recreate the tables and load synthetic data first")
+    check.add_argument('--scale', type=float, default=1.0)
+    check.add_argument('--cost-scale', type=float, default=1.0, help="multiply every cost budget")
+    check.add_argument('--only', nargs='*', default=None, choices=list(PLAN_CHECKS))
+    check.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args()
+
+    if args.command == 'check' and args.seed:
+        seed(args.scale)
+    import database_setup
+    conn = database_setup.conn
+    cursor = conn.cursor()
+    ok = True
+    if args.command == 'create':
+        print(f"Indexes: {', '.join(create_indexes(cursor))}")
+        conn.commit()
+        conn.autocommit = True
+        cursor.execute("ANALYZE")
+    elif thin := thin_tables(cursor):
+        tables = ', '.join(f"{table} ({rows} rows)" for table, rows in thin.items())
+        print(f"Too little data for the plan checks (< {SEQ_SCAN_MIN_ROWS} rows): {tables}. Load some with --seed.")
+        ok = False
+    else:
+        try:
+            results = check_plans(cursor, args.only, args.cost_scale, args.verbose)
+        finally:
+            conn.rollback()
+        for name, problems in results.items():
+            print(f"{name}: {'OK' if not problems else '; '.join(problems)}")
+        ok = not any(results.values())
+    cursor.close()
+    conn.close()
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,152 @@
+import re
+import weakref
+
+# Server-side prepared statements for the hot BE queries.
+# Each statement is PREPAREd once per connection (on first use) and then run with EXECUTE, so Postgres
+# skips parsing and, after a few executions, planning. Statements use $n placeholders; EXECUTE arguments
+# are still passed through psycopg2, never formatted into the SQL. UNPREPARED_STATEMENTS are planned on
+# every execution instead.
+
+PRODUCT_COLUMNS = "product_id, goods_name, image_link, sex, category, price, seller_id, stock_quantity, date_added"
+
+SELLER_COLUMNS = """s.seller_id, s.seller_name, s.password, s.contact_email,
+    s.seller_account + COALESCE((SELECT SUM(l.amount) FROM seller_ledger l
+                                 WHERE l.seller_id = s.seller_id AND l.settled_at IS NULL), 0)"""
+
+# keyset-paginated browsing: sort -> (key column, direction). Each sort, with and without a category,
+# has its own statement, and a covering index (schema.py) that returns a page with an index-only scan
+# starting at the previous page's last (key, product_id)
+BROWSE_COLUMNS = "product_id, goods_name, image_link, sex, category, price, stock_quantity, date_added"
+BROWSE_SORTS = {
+    'price_asc': ('price', 'ASC'),
+    'price_desc': ('price', 'DESC'),
+    'newest': ('date_added', 'DESC'),
+}
+
+# fields a seller may change through update_product, each with its own prepared variant
+UPDATABLE_PRODUCT_FIELDS = ('goods_name', 'image_link', 'sex', 'category', 'price', 'stock_quantity')
+
+HOT_STATEMENTS = {
+    'get_user': "SELECT * FROM users WHERE user_id = $1",
+    'sign_in': "SELECT * FROM users WHERE username = $1 AND password = $2",
+    # seller_account plus the ledger credits not settled into it yet
+    'seller_login': f"SELECT {SELLER_COLUMNS} FROM seller s WHERE s.seller_name = $1 AND s.password = $2",
+    'seller_info': f"SELECT {SELLER_COLUMNS} FROM seller s WHERE s.seller_id = $1",
+    'charge_account': "UPDATE users SET user_account = user_account + $1 WHERE user_id = $2",
+    'add_searchlog': """
+        INSERT INTO searchlog (user_id, search_query) VALUES ($1, $2) RETURNING searchlog_id""",
+    'add_searchresult': """
+        INSERT INTO searchresult (searchlog_id, product_id, rank) VALUES ($1, $2, $3) RETURNING result_id""",
+    # first product per name, for the NL-search hits (which are identified by goods_name)
+    'products_by_names': f"""
+        SELECT DISTINCT ON (goods_name) {PRODUCT_COLUMNS}
+        FROM product WHERE goods_name = ANY($1) ORDER BY goods_name, product_id""",
+    # BE answers these three from product_columns.ProductColumns; the SQL stays as the reference
+    # (benchmark.py prepared, schema.py check)
+    'search_name': f"SELECT {PRODUCT_COLUMNS} FROM product WHERE goods_name LIKE '%' || $1 || '%'",
+    'search_sex': f"SELECT {PRODUCT_COLUMNS} FROM product WHERE sex = $1",
+    'search_category': f"SELECT {PRODUCT_COLUMNS} FROM product WHERE category = $1",
+    # stock_quantity of a sharded product is only refreshed by ledger.settle(); show the live total here
+    'product_info': """
+        SELECT p.product_id, p.goods_name, p.image_link, p.sex, p.category, p.price, p.seller_id,
+            CASE WHEN p.stock_shards > 0
+                THEN (SELECT COALESCE(SUM(s.quantity), 0)::INT FROM product_stock_shard s WHERE s.product_id = p.product_id)
+                ELSE p.stock_quantity END,
+            p.date_added
+        FROM product p WHERE p.product_id = $1 AND p.seller_id = $2""",
+    # purchase: nothing below locks the product or seller row unless the product's stock is unsharded
+    'purchase_product': "SELECT price, seller_id, category, sex, stock_shards FROM product WHERE product_id = $1",
+    'debit_user': """
+        UPDATE users SET user_account = user_account - $1 WHERE user_id = $2 AND user_account >= $1""",
+    'take_stock': """
+        UPDATE product SET stock_quantity = stock_quantity - $1 WHERE product_id = $2 AND stock_quantity >= $1""",
+    # the first shard at or after $3 that can cover the order and no other checkout is holding.
+    # a scalar subquery runs once (InitPlan); joined in FROM it was rescanned per shard row and, with
+    # SKIP LOCKED, could pick a different shard each time and take the stock twice
+    'take_stock_shard': """
+        UPDATE product_stock_shard SET quantity = quantity - $2
+        WHERE product_id = $1 AND shard = (
+            SELECT shard FROM product_stock_shard
+            WHERE product_id = $1 AND quantity >= $2
+            ORDER BY shard < $3, shard
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED)""",
+    'lock_stock_shards': """
+        SELECT shard, quantity FROM product_stock_shard WHERE product_id = $1 AND quantity > 0 ORDER BY shard FOR UPDATE""",
+    'drain_stock_shard': "UPDATE product_stock_shard SET quantity = quantity - $1 WHERE product_id = $2 AND shard = $3",
+    'credit_seller': "INSERT INTO seller_ledger (seller_id, product_id, quantity, amount) VALUES ($1, $2, $3, $4)",
+    'add_buylog': """
+        INSERT INTO buylog (user_id, product_id, quantity)
+        SELECT u.user_id, p.product_id, $1
+        FROM users u
+        INNER JOIN product p ON p.product_id = $2
+        WHERE u.user_id = $3""",
+    'register_product': """
+        INSERT INTO product (goods_name, image_link, sex, category, price, seller_id, stock_quantity)
+        VALUES ($1, $2, $3, $4, $5, $6, $7)
+        RETURNING product_id""",
+    'delete_product': "DELETE FROM product WHERE product_id = $1 AND seller_id = $2",
+}
+
+def browse_sql(sort, by_category):
+    # $1, $2: page cursor, $3..$4: price range, $5: sexes, $6: minimum stock, $7: page size, $8: category
+    column, direction = BROWSE_SORTS[sort]
+    return f"""
+        SELECT {BROWSE_COLUMNS} FROM product
+        WHERE {"category = $8 AND " if by_category else ""}({column}, product_id) {'>' if direction == 'ASC' else '<'} ($1, $2)
+            AND price BETWEEN $3 AND $4 AND sex::TEXT = ANY($5::TEXT[]) AND stock_quantity >= $6
+        ORDER BY {column} {direction}, product_id {direction}
+        LIMIT $7"""
+
+BROWSE_STATEMENTS = {
+    f"browse_{sort}{'_category' if by_category else ''}": browse_sql(sort, by_category)
+    for sort in BROWSE_SORTS for by_category in (False, True)
+}
+HOT_STATEMENTS.update(BROWSE_STATEMENTS)
+# a browse page's filters have no selectivity without their values: the generic plan estimates one row and
+# takes any index plus a Sort, and Postgres switches a prepared statement to it after five executions
+# because it looks cheaper than the custom plans. Planned per page, they keep the index order
+UNPREPARED_STATEMENTS = tuple(BROWSE_STATEMENTS)
+
+HOT_STATEMENTS.update({
+    f'update_product_{field}': f"UPDATE product SET {field} = $1 WHERE product_id = $2 AND seller_id = $3"
+    for field in UPDATABLE_PRODUCT_FIELDS
+})
+
+
+class StatementRegistry:
+    def __init__(self, statements, unprepared=()):
+        self.statements = dict(statements)
+        self.unprepared = set(unprepared)
+        # connection -> names already prepared on that session
+        self.prepared = weakref.WeakKeyDictionary()
+
+    def execute(self, cursor, name, params=()):
+        if name in self.unprepared:
+            cursor.execute(self.inline_sql(name), {f"p{i + 1}": value for i, value in enumerate(params)})
+            return cursor
+        sql = self.statements[name]
+        conn = cursor.connection
+        prepared = self.prepared.setdefault(conn, set())
+        if name not in prepared:
+            cursor.execute(f"PREPARE {name} AS {sql}")
+            prepared.add(name)
+        if params:
+            cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+        else:
+            cursor.execute(f"EXECUTE {name}")
+        return cursor
+
+    def prepares(self, name):
+        return name in self.statements and name not in self.unprepared
+
+    def forget(self, conn):
+        # after a reconnect / DISCARD ALL the session has no prepared statements any more
+        self.prepared.pop(conn, None)
+
+    def inline_sql(self, name):
+        # the same statement with psycopg2 placeholders, for running it unprepared (benchmarks)
+        return re.sub(r"\$(\d+)", r"%(p\1)s", self.statements[name].replace('%', '%%'))
+
+
+statements = StatementRegistry(HOT_STATEMENTS, UNPREPARED_STATEMENTS)
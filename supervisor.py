@@ -0,0 +1,95 @@
+import os
+import time
+import signal
+import argparse
+import subprocess
+import traceback
+from catalog_state import Catalog, publish
+
+# Supervisor mode for multi-process deployments.
+# Parses ./data/itemDB.csv once and publishes the catalog under CATALOG_DIR (shared, mmap-able .npy files),
+# so each worker attaches read-only instead of parsing the CSV again. The catalog is republished when the
+# CSV changes or on SIGHUP; workers pick up the new generation on their next search without a restart.
+#
+#   python3 supervisor.py                                   (publish / refresh only, the default)
+#   CATALOG_DIR=<dir> python3 main.py                       (one per terminal: main.py is interactive)
+#
+# --workers N -- <command> also spawns and restarts N copies of a non-interactive worker command. Their
+# stdin is /dev/null, so the interactive CLI (main.py) is refused there: N copies would share one terminal.
+
+ITEM_DB_PATH = './data/itemDB.csv'
+DEFAULT_CATALOG_DIR = '/dev/shm/musinsa-catalog' if os.path.isdir('/dev/shm') else './data/catalog'
+
+
+class Supervisor:
+    def __init__(self, csv_path, catalog_dir, worker_cmd, n_workers, poll_interval):
+        self.csv_path = csv_path
+        self.catalog_dir = os.path.abspath(catalog_dir)
+        self.worker_cmd = worker_cmd
+        self.n_workers = n_workers
+        self.poll_interval = poll_interval
+        self.csv_mtime = None
+        self.workers = []
+        self.refresh_requested = False
+        self.stopping = False
+
+    def refresh(self):
+        start_time = time.time()
+        print("Catalog Publishing...")
+        mtime = os.stat(self.csv_path).st_mtime_ns
+        catalog = Catalog.from_csv(self.csv_path)
+        generation = publish(catalog, self.catalog_dir)
+        self.csv_mtime = mtime
+        print(f"Catalog generation {generation} published! ({len(catalog)} rows, {round(time.time()-start_time, 2)}s.)")
+
+    def spawn(self):
+        env = dict(os.environ, CATALOG_DIR=self.catalog_dir)
+        return subprocess.Popen(self.worker_cmd, env=env, stdin=subprocess.DEVNULL)
+
+    def run(self):
+        signal.signal(signal.SIGHUP, lambda *_: setattr(self, 'refresh_requested', True))
+        signal.signal(signal.SIGTERM, lambda *_: setattr(self, 'stopping', True))
+        self.refresh()
+        self.workers = [self.spawn() for _ in range(self.n_workers)]
+        print(f"{len(self.workers)} worker(s) started with CATALOG_DIR={self.catalog_dir}")
+        try:
+            while not self.stopping:
+                time.sleep(self.poll_interval)
+                try:
+                    if self.refresh_requested or os.stat(self.csv_path).st_mtime_ns != self.csv_mtime:
+                        self.refresh_requested = False
+                        self.refresh()
+                except Exception:
+                    # keep serving the previous generation
+                    print("Failed to refresh the catalog.")
+                    print(traceback.format_exc())
+                for i, worker in enumerate(self.workers):
+                    if worker.poll() is not None:
+                        print(f"Worker {worker.pid} exited ({worker.returncode}), restarting.")
+                        self.workers[i] = self.spawn()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for worker in self.workers:
+                worker.terminate()
+            for worker in self.workers:
+                worker.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish the catalog once and serve it to worker processes.")
+    parser.add_argument('--csv', default=ITEM_DB_PATH)
+    parser.add_argument('--catalog-dir', default=os.getenv('CATALOG_DIR', DEFAULT_CATALOG_DIR))
+    parser.add_argument('--workers', type=int, default=0)
+    parser.add_argument('--poll-interval', type=float, default=5.0,
+                        help="seconds between checks for a changed CSV / dead workers")
+    parser.add_argument('worker_cmd', nargs=argparse.REMAINDER,
+                        help="non-interactive worker command after '--' (required with --workers)")
+    args = parser.parse_args()
+    worker_cmd = args.worker_cmd[1:] if args.worker_cmd[:1] == ['--'] else args.worker_cmd
+    if args.workers and not worker_cmd:
+        parser.error("--workers needs a worker command after '--'")
+    if args.workers and any(os.path.basename(arg) in ('main.py', 'app.py') for arg in worker_cmd):
+        parser.error("main.py is interactive; run it per terminal with CATALOG_DIR=<catalog dir> instead of --workers")
+
+    Supervisor(args.csv, args.catalog_dir, worker_cmd, args.workers, args.poll_interval).run()
@@ -0,0 +1,330 @@
+import os
+import io
+import time
+import tempfile
+import calendar
+import argparse
+from datetime import date, timedelta
+from multiprocessing import get_context
+import numpy as np
+import psycopg2
+from dotenv import load_dotenv
+from catalog_state import Catalog, StringColumn, SEX_CODES, publish
+
+# Synthetic data at production scale, for validating query plans and performance work on a laptop.
+#
+#   python3 synthetic_data.py --reset --users 1000000 --products 500000 --searches 2000000 --purchases 1000000
+#
+# - popularity is Zipfian: a few products, sellers, categories, queries and heavy users get most of the traffic
+# - searches come in bursty sessions (a diurnal curve, a few flash-sale spikes, seconds between searches)
+#   and log top-k results the way BE.log_search does (one searchlog + one searchresult row per shown product)
+# - every purchase gets its (settled) seller_ledger entry, so ledger.py reconcile still holds
+# - rows are generated in fixed-size chunks, each from its own seed, and COPYed by --workers processes in
+#   parallel; ids are assigned explicitly, so with --reset the same seed and --end-date give the same database
+# - product embeddings (random, clustered by category) are published as a catalog generation under
+#   --catalog-dir; start main.py with CATALOG_DIR=<dir> so NL search runs over the same products
+
+CHUNK_ROWS = 50000
+CATEGORIES = ['반소매', '니트/스웨터', '셔츠/블라우스', '트레이닝/조거', '캡/야구', '데님', '카디건', '코튼',
+              '피케/카라', '나일론/코치', '슈트', '슈트/블레이저', '백팩', '토트백', '후드', '패션스니커즈화']
+ADJECTIVES = ['oversized', 'black', 'white', 'vintage', 'minimal', 'striped', 'cropped', 'relaxed', 'slim',
+              'washed', 'pastel', 'navy', 'beige', 'graphic', 'logo', 'plain', 'wool', 'linen', 'leather',
+              'waterproof', 'summer', 'winter', 'street', 'classic', 'sporty', 'knit', 'check', 'denim',
+              'retro', 'layered']
+PRODUCT_SEXES = ['Male', 'Female', 'Unisex']
+USER_SEXES = ['Male', 'Female', 'Other']
+# share of sessions per hour of day (evening peak)
+DIURNAL = np.array([2, 1, 1, 1, 1, 1, 2, 3, 4, 4, 4, 5, 6, 5, 5, 5, 5, 6, 7, 8, 9, 10, 8, 4], dtype=float)
+TABLE_SEEDS = {'users': 1, 'product': 2, 'searches': 3, 'purchases': 4, 'embeddings': 5}
+IDENTITIES = [('users', 'user_id'), ('seller', 'seller_id'), ('product', 'product_id'), ('searchlog', 'searchlog_id'),
+              ('searchresult', 'result_id'), ('buylog', 'buylog_id'), ('seller_ledger', 'entry_id')]
+
+
+def connect():
+    load_dotenv()
+    return psycopg2.connect(dbname=os.getenv('PG_DBNAME'), user=os.getenv('PG_USERNAME'), password=os.getenv('PG_PASSWORD'),
+                            host=os.getenv('PG_HOST'), port=os.getenv('PG_PORT'))
+
+
+def zipf_ranks(rng, a, n, size):
+    # 0-based ranks in [0, n) with P(rank) ~ 1 / (rank + 1)^a
+    return (rng.zipf(a, size) - 1) % n
+
+
+def timestamps(seconds):
+    return np.datetime_as_string(np.asarray(seconds, dtype='datetime64[s]'), unit='s')
+
+
+def copy_rows(cursor, table, columns, rows):
+    # rows: columns of equal length (str arrays / lists); generated text never contains tabs or backslashes
+    buffer = io.StringIO()
+    buffer.writelines('\t'.join(row) + '\n' for row in zip(*rows))
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+    return len(rows[0])
+
+#--------------------- MODEL ------------------------------#
+
+def build_model(args, bases):
+    # everything the row generators share, derived from the seed only
+    rng = np.random.default_rng(args.seed)
+    n = args.products
+    now = calendar.timegm(args.end_date.timetuple())
+    model = {
+        "seed": args.seed, "bases": bases, "k": args.results_per_search,
+        "users": args.users, "sellers": args.sellers, "products": n,
+        "start": now - args.days * 86400, "end": now,
+        # flash sales: a few hours that attract a burst of sessions
+        "bursts": np.sort(rng.integers(now - args.days * 86400, now - 3600, max(1, args.days // 15))),
+        "user_perm": rng.permutation(args.users),
+        "category_weights": 1 / np.arange(1, len(CATEGORIES) + 1) ** 0.8,
+    }
+    category_p = model["category_weights"] / model["category_weights"].sum()
+    model["product_category"] = rng.choice(len(CATEGORIES), n, p=category_p).astype(np.int16)
+    model["product_adjective"] = rng.integers(0, len(ADJECTIVES), n).astype(np.int16)
+    model["product_sex"] = rng.choice(3, n, p=[0.4, 0.4, 0.2]).astype(np.int8)
+    model["product_seller"] = (zipf_ranks(rng, 1.1, args.sellers, n) + 1 + bases['seller']).astype(np.int64)
+    model["product_price"] = np.clip(np.round(rng.lognormal(np.log(60), 0.8, n), -1) - 0.1, 9.9, 999.9)
+    # popularity order: rank r is the r-th most popular product (row index)
+    popularity = rng.permutation(n)
+    model["popularity"] = popularity
+    # per category, its products in popularity order, concatenated
+    by_category = popularity[np.argsort(model["product_category"][popularity], kind='stable')]
+    sizes = np.bincount(model["product_category"], minlength=len(CATEGORIES))
+    model["category_products"] = by_category
+    model["category_offsets"] = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    model["category_sizes"] = np.maximum(sizes, 1)
+    # queries: (adjective, category) pairs in popularity order
+    model["query_perm"] = rng.permutation(len(ADJECTIVES) * len(CATEGORIES))
+    return model
+
+
+def goods_names(model, rows):
+    ids = rows + 1 + model["bases"]["product"]
+    return [f"{ADJECTIVES[a]} {CATEGORIES[c]} #{i}" for a, c, i in
+            zip(model["product_adjective"][rows], model["product_category"][rows], ids)]
+
+
+def session_times(rng, model, n_sessions):
+    # diurnal day/hour, or (burst_share of them) right after a flash sale starts
+    start, end = model["start"], model["end"]
+    days = rng.integers(0, max(1, (end - start) // 86400), n_sessions)
+    hours = rng.choice(24, n_sessions, p=DIURNAL / DIURNAL.sum())
+    day_start = (start // 86400 + 1) * 86400
+    times = day_start + days * 86400 + hours * 3600 + rng.integers(0, 3600, n_sessions)
+    bursty = rng.random(n_sessions) < 0.1
+    times[bursty] = rng.choice(model["bursts"], bursty.sum()) + rng.exponential(600, bursty.sum()).astype(np.int64)
+    return np.clip(times, start, end - 600)
+
+#--------------------- WORKERS ----------------------------#
+
+_worker = {}
+
+
+def _init_worker(model):
+    _worker['model'] = model
+    _worker['conn'] = connect()
+
+
+def _run(job):
+    kind, chunk, first, count = job
+    model = _worker['model']
+    rng = np.random.default_rng([model["seed"], TABLE_SEEDS[kind], chunk])
+    conn = _worker['conn']
+    cursor = conn.cursor()
+    rows = GENERATORS[kind](cursor, rng, model, first, count)
+    conn.commit()
+    cursor.close()
+    return kind, rows
+
+
+def gen_users(cursor, rng, model, first, count):
+    ids = np.arange(first, first + count) + 1 + model["bases"]["users"]
+    births = np.datetime64('1965-01-01') + rng.integers(0, 43 * 365, count).astype('timedelta64[D]')
+    return copy_rows(cursor, 'users', ['user_id', 'username', 'password', 'sex', 'email', 'date_of_birth'], [
+        ids.astype(str), [f"user{i}" for i in ids], ['password'] * count,
+        np.array(USER_SEXES)[rng.choice(3, count, p=[0.45, 0.5, 0.05])],
+        [f"user{i}@synthetic.example" for i in ids], np.datetime_as_string(births)])
+
+
+def gen_products(cursor, rng, model, first, count):
+    rows = np.arange(first, first + count)
+    added = model["start"] - rng.integers(0, 365 * 86400, count)
+    return copy_rows(cursor, 'product', ['product_id', 'goods_name', 'image_link', 'sex', 'category', 'price',
+                                         'seller_id', 'stock_quantity', 'date_added'], [
+        (rows + 1 + model["bases"]["product"]).astype(str), goods_names(model, rows),
+        [f"https://image.synthetic.example/{i}.jpg" for i in rows + 1 + model["bases"]["product"]],
+        np.array(PRODUCT_SEXES)[model["product_sex"][rows]], np.array(CATEGORIES)[model["product_category"][rows]],
+        np.char.mod('%.2f', model["product_price"][rows]), model["product_seller"][rows].astype(str),
+        rng.integers(0, 500, count).astype(str), timestamps(added)])
+
+
+def gen_searches(cursor, rng, model, first, count):
+    # `count` searches, each logged as k searchlog rows with one searchresult each
+    k = model["k"]
+    sizes = rng.geometric(1 / 3, count)
+    sizes = sizes[:np.searchsorted(np.cumsum(sizes), count) + 1]
+    session_of = np.repeat(np.arange(len(sizes)), sizes)[:count]
+    users = model["user_perm"][zipf_ranks(rng, 1.2, model["users"], len(sizes))][session_of] + 1 + model["bases"]["users"]
+    offsets = np.cumsum(rng.exponential(45, count)).astype(np.int64)
+    offsets -= np.concatenate([[0], offsets[np.cumsum(sizes)[:-1] - 1]])[session_of]  # restart per session
+    times = np.minimum(session_times(rng, model, len(sizes))[session_of] + offsets, model["end"])
+
+    queries = model["query_perm"][zipf_ranks(rng, 1.1, len(model["query_perm"]), count)]
+    adjectives, categories = queries // len(CATEGORIES), queries % len(CATEGORIES)
+    kind = rng.choice(3, count, p=[0.6, 0.25, 0.15])
+    texts = [f"Search Style: {ADJECTIVES[a]} {CATEGORIES[c]}" if t == 0 else
+             f"Filter Category: {CATEGORIES[c]}" if t == 1 else f"Search name: {CATEGORIES[c]}"
+             for a, c, t in zip(adjectives, categories, kind)]
+    # top-k: popular products of the query's category first
+    picks = zipf_ranks(rng, 1.3, 1 << 30, (count, k)) % model["category_sizes"][categories][:, None]
+    products = model["category_products"][np.minimum(model["category_offsets"][categories][:, None] + picks,
+                                                      model["products"] - 1)]
+
+    search_ids = np.arange(first, first + count)[:, None] * k + np.arange(k)[None, :]
+    log_ids = (search_ids + 1 + model["bases"]["searchlog"]).ravel()
+    result_ids = (search_ids + 1 + model["bases"]["searchresult"]).ravel()
+    dates = np.repeat(timestamps(times), k)
+    copy_rows(cursor, 'searchlog', ['searchlog_id', 'user_id', 'search_query', 'search_date'], [
+        log_ids.astype(str), np.repeat(users, k).astype(str), np.repeat(texts, k), dates])
+    return copy_rows(cursor, 'searchresult', ['result_id', 'searchlog_id', 'product_id', 'rank', 'search_date'], [
+        result_ids.astype(str), log_ids.astype(str), (products.ravel() + 1 + model["bases"]["product"]).astype(str),
+        np.tile(np.arange(1, k + 1), count).astype(str), dates])
+
+
+def gen_purchases(cursor, rng, model, first, count):
+    users = model["user_perm"][zipf_ranks(rng, 1.3, model["users"], count)] + 1 + model["bases"]["users"]
+    rows = model["popularity"][zipf_ranks(rng, 1.2, model["products"], count)]
+    quantity = np.minimum(rng.geometric(0.7, count), 5)
+    amount = np.round(model["product_price"][rows] * quantity, 2)
+    times = timestamps(session_times(rng, model, count) + rng.integers(0, 900, count))
+    ids = np.arange(first, first + count) + 1
+    product_ids = (rows + 1 + model["bases"]["product"]).astype(str)
+    quantity = quantity.astype(str)
+    copy_rows(cursor, 'buylog', ['buylog_id', 'user_id', 'product_id', 'quantity', 'purchase_date'], [
+        (ids + model["bases"]["buylog"]).astype(str), users.astype(str), product_ids, quantity, times])
+    return copy_rows(cursor, 'seller_ledger', ['entry_id', 'seller_id', 'product_id', 'quantity', 'amount',
+                                               'created_at', 'settled_at'], [
+        (ids + model["bases"]["seller_ledger"]).astype(str), model["product_seller"][rows].astype(str), product_ids,
+        quantity, np.char.mod('%.2f', amount), times, times])
+
+
+GENERATORS = {'users': gen_users, 'product': gen_products, 'searches': gen_searches, 'purchases': gen_purchases}
+
+#--------------------- CATALOG ----------------------------#
+
+def publish_catalog(model, args):
+    # embeddings = category centroid + noise, L2-normalized; written chunk by chunk into a memmap
+    rng = np.random.default_rng([args.seed, TABLE_SEEDS['embeddings']])
+    centroids = rng.standard_normal((len(CATEGORIES), args.dim)).astype(np.float32)
+    os.makedirs(args.catalog_dir, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=args.catalog_dir) as tmp:
+        embeddings = np.lib.format.open_memmap(os.path.join(tmp, 'embeddings.npy'), mode='w+',
+                                               dtype=np.float32, shape=(args.products, args.dim))
+        for first in range(0, args.products, CHUNK_ROWS):
+            rows = np.arange(first, min(first + CHUNK_ROWS, args.products))
+            chunk_rng = np.random.default_rng([args.seed, TABLE_SEEDS['embeddings'], first // CHUNK_ROWS])
+            x = centroids[model["product_category"][rows]] + 1.5 * chunk_rng.standard_normal((len(rows), args.dim)).astype(np.float32)
+            embeddings[rows] = x / np.linalg.norm(x, ord=2, axis=-1, keepdims=True)
+        sex_codes = np.array([SEX_CODES.index(code) for code in ('M', 'W', 'MW')], dtype=np.int8)
+        catalog = Catalog(embeddings, StringColumn.from_strings(goods_names(model, np.arange(args.products))),
+                          model["product_category"], list(CATEGORIES), sex_codes[model["product_sex"]])
+        generation = publish(catalog, args.catalog_dir)
+        del embeddings, catalog
+    return generation
+
+#--------------------- MAIN -------------------------------#
+
+def months_between(start, end):
+    return (end.year - start.year) * 12 + end.month - start.month
+
+
+def jobs(kind, total):
+    return [(kind, chunk, first, min(CHUNK_ROWS, total - first)) for chunk, first in enumerate(range(0, total, CHUNK_ROWS))]
+
+
+def run_phase(pool, phase_jobs, name):
+    start_time = time.time()
+    counts = {}
+    for kind, rows in pool.imap_unordered(_run, phase_jobs):
+        counts[kind] = counts.get(kind, 0) + rows
+    print(f"{name}: {counts} ({round(time.time() - start_time, 2)}s.)")
+
+
+def main(args):
+    if args.reset:
+        import database_setup
+        database_setup.create_tables()
+    conn = connect()
+    cursor = conn.cursor()
+
+    # the log partitions for the whole generated range
+    from database_setup import create_log_partitions, conn as setup_conn
+    first_day = args.end_date - timedelta(days=args.days)
+    create_log_partitions(months_back=months_between(first_day, args.end_date), today=args.end_date)
+    setup_conn.commit()
+
+    bases = {}
+    for table, column in IDENTITIES:
+        cursor.execute(f"SELECT COALESCE(MAX({column}), 0) FROM {table}")
+        bases[table] = cursor.fetchone()[0]
+    cursor.execute(f"""
+        INSERT INTO seller (seller_id, seller_name, password, contact_email)
+        OVERRIDING SYSTEM VALUE
+        SELECT %(base)s + i, 'seller' || (%(base)s + i), 'password', 'seller' || (%(base)s + i) || '@synthetic.example'
+        FROM generate_series(1, %(n)s) AS i""", {"base": bases['seller'], "n": args.sellers})
+    conn.commit()
+
+    # no product_change row per COPY-ed product; running BE processes pick the load up on their next full reload
+    # (the COPY runs on the workers' connections, so this cannot share their transactions)
+    cursor.execute("ALTER TABLE product DISABLE TRIGGER product_change_trigger")
+    conn.commit()
+    try:
+        model = build_model(args, bases)
+        with get_context('spawn').Pool(args.workers, initializer=_init_worker, initargs=(model,)) as pool:
+            run_phase(pool, jobs('users', args.users) + jobs('product', args.products), "users / products")
+            run_phase(pool, jobs('searches', args.searches) + jobs('purchases', args.purchases), "searches / purchases")
+    finally:
+        # also when the load fails: with the trigger off, the BE product columns silently stop following product
+        conn.rollback()
+        cursor.execute("ALTER TABLE product ENABLE TRIGGER product_change_trigger")
+        conn.commit()
+
+    # identities continue after the explicit ids; sellers are credited with what the ledger says
+    for table, column in IDENTITIES:
+        cursor.execute(f"SELECT setval(pg_get_serial_sequence('{table}', '{column}'), GREATEST(MAX({column}), 1)) FROM {table}")
+    cursor.execute("""
+        UPDATE seller s SET seller_account = s.seller_account + t.amount
+        FROM (SELECT seller_id, SUM(amount) AS amount FROM seller_ledger WHERE entry_id > %s GROUP BY seller_id) t
+        WHERE s.seller_id = t.seller_id""", (bases['seller_ledger'],))
+    conn.commit()
+    conn.autocommit = True
+    start_time = time.time()
+    cursor.execute("ANALYZE")
+    print(f"ANALYZE ({round(time.time() - start_time, 2)}s.)")
+    conn.close()
+
+    if args.catalog_dir:
+        start_time = time.time()
+        generation = publish_catalog(model, args)
+        print(f"Catalog generation {generation} published to {args.catalog_dir} ({round(time.time() - start_time, 2)}s.)")
+        print(f"Start workers with CATALOG_DIR={os.path.abspath(args.catalog_dir)}; delete ./data/trending.pkl to "
+              f"bootstrap trending from the new logs.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load a large synthetic dataset through parallel COPY.")
+    parser.add_argument('--users', type=int, default=1000000)
+    parser.add_argument('--sellers', type=int, default=1000)
+    parser.add_argument('--products', type=int, default=500000)
+    parser.add_argument('--searches', type=int, default=2000000, help="search actions (each logs --results-per-search rows)")
+    parser.add_argument('--results-per-search', type=int, default=5)
+    parser.add_argument('--purchases', type=int, default=1000000)
+    parser.add_argument('--days', type=int, default=90, help="searches and purchases fall into the N days before --end-date")
+    parser.add_argument('--end-date', type=date.fromisoformat, default=date.today(), help="YYYY-MM-DD (default: today)")
+    parser.add_argument('--dim', type=int, default=512, help="embedding dimension (FashionCLIP: 512)")
+    parser.add_argument('--catalog-dir', default='./data/synthetic-catalog', help="'' to skip the embeddings")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--seed', type=int, default=13)
+    parser.add_argument('--reset', action='store_true', help="drop and recreate all tables first (database_setup.py)")
+    main(parser.parse_args())
@@ -0,0 +1,40 @@
+import os
+import sys
+import pytest
+
+# the modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def pg_connect():
+    # opens connections to the .env database (PG_HOST, ...); tests using it are skipped when it cannot be reached
+    psycopg2 = pytest.importorskip('psycopg2')
+    dotenv = pytest.importorskip('dotenv')
+    dotenv.load_dotenv()
+
+    def connect():
+        return psycopg2.connect(dbname=os.getenv('PG_DBNAME'), user=os.getenv('PG_USERNAME'),
+                                password=os.getenv('PG_PASSWORD'), host=os.getenv('PG_HOST'),
+                                port=os.getenv('PG_PORT'), connect_timeout=3)
+    try:
+        connect().close()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"database unreachable: {str(e).strip()}")
+    return connect
+
+
+@pytest.fixture(scope='session')
+def pg_conn(pg_connect):
+    conn = pg_connect()
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def pg_cursor(pg_conn):
+    # everything a test writes is rolled back
+    cursor = pg_conn.cursor()
+    yield cursor
+    pg_conn.rollback()
+    cursor.close()
@@ -0,0 +1,37 @@
+import os
+import time
+import numpy as np
+from image_query import ImageEmbeddingCache
+
+
+def make_cache(cache_dir, **kwargs):
+    # the "model" embeds an image's bytes as a one-hot on their first byte
+    def encode(images):
+        return np.stack([np.eye(8, dtype=np.float32)[image[0] % 8] for image in images])
+    return ImageEmbeddingCache(encode, capacity=2, cache_dir=str(cache_dir), decode_fn=lambda data: data, **kwargs)
+
+
+def test_disk_cache_keeps_the_most_recently_used_files(tmp_path):
+    cache = make_cache(tmp_path, disk_capacity=4)
+    keys = []
+    for i in range(4):
+        keys.append(cache.embed(bytes([i]) * 16)[1])
+        # distinct mtimes, oldest first
+        os.utime(tmp_path / f"{keys[-1]}.npy", (time.time() - 100 + i, time.time() - 100 + i))
+    # a disk hit (evicted from the 2-entry memory LRU) makes the oldest file the newest
+    cache.embed(bytes([0]) * 16)
+    assert cache.metrics()["disk_hits"] == 1
+    cache.embed(bytes([4]) * 16)
+
+    files = {name[:-4] for name in os.listdir(tmp_path)}
+    assert len(files) == 3 and keys[0] in files and keys[1] not in files
+    assert cache.metrics()["disk_files"] == 3
+
+
+def test_old_files_expire(tmp_path):
+    cache = make_cache(tmp_path, max_age=60)
+    _, key = cache.embed(b"\x01" * 16)
+    old = time.time() - 120
+    os.utime(tmp_path / f"{key}.npy", (old, old))
+    assert make_cache(tmp_path, max_age=60).disk_files == 0
+    assert not os.listdir(tmp_path)
@@ -0,0 +1,211 @@
+import threading
+import pytest
+
+import ledger
+from exceptions import NotFoundError, InsufficientStockError, InsufficientFundsError
+
+#--------------------- FAKES ------------------------------#
+
+class FakeCursor:
+    def __init__(self):
+        self.rowcount = -1
+        self.rows = []
+        self.executed = []
+
+    def execute(self, query, params=None):
+        self.executed.append(query)
+        self.rowcount = 1
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeStatements:
+    # records (name, params) and answers each statement with the next scripted (rowcount, rows)
+    def __init__(self, script):
+        self.script = {name: list(results) for name, results in script.items()}
+        self.calls = []
+
+    def execute(self, cursor, name, params=()):
+        self.calls.append((name, params))
+        cursor.rowcount, cursor.rows = self.script[name].pop(0) if self.script.get(name) else (1, [])
+
+    def names(self):
+        return [name for name, _ in self.calls]
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    def install(**script):
+        statements = FakeStatements(script)
+        monkeypatch.setattr(ledger, 'statements', statements)
+        return statements
+    # the first shard a checkout tries
+    monkeypatch.setattr(ledger.random, 'randrange', lambda n: 3)
+    return install
+
+#--------------------- SHARD SELECTION --------------------#
+
+def test_unsharded_stock_is_a_conditional_update(fake):
+    statements = fake(take_stock=[(1, [])])
+    assert ledger.take_stock(FakeCursor(), 7, 2, 0)
+    assert statements.calls == [('take_stock', (2, 7))]
+
+
+def test_sharded_stock_starts_at_a_random_shard(fake):
+    statements = fake(take_stock_shard=[(1, [])])
+    assert ledger.take_stock(FakeCursor(), 7, 2, 16)
+    assert statements.calls == [('take_stock_shard', (7, 2, 3))]
+
+
+def test_order_no_single_shard_covers_drains_shards_in_order(fake):
+    statements = fake(take_stock_shard=[(0, [])], lock_stock_shards=[(3, [(0, 2), (4, 1), (9, 5)])])
+    assert ledger.take_stock(FakeCursor(), 7, 6, 16)
+    assert statements.calls[1:] == [
+        ('lock_stock_shards', (7,)),
+        ('drain_stock_shard', (2, 7, 0)),
+        ('drain_stock_shard', (1, 7, 4)),
+        ('drain_stock_shard', (3, 7, 9)),
+    ]
+
+
+def test_order_above_the_total_of_all_shards_takes_nothing(fake):
+    statements = fake(take_stock_shard=[(0, [])], lock_stock_shards=[(2, [(0, 2), (4, 1)])])
+    assert not ledger.take_stock(FakeCursor(), 7, 4, 16)
+    assert 'drain_stock_shard' not in statements.names()
+
+#--------------------- CHECKOUT / SETTLE ------------------#
+
+def test_checkout_debits_the_user_and_credits_the_seller_through_the_ledger(fake):
+    statements = fake(purchase_product=[(1, [(10, 5, 'shoes', 'Male', 0)])], take_stock=[(1, [])], debit_user=[(1, [])])
+    assert ledger.checkout(FakeCursor(), 1, 7, 3) == ('shoes', 'Male')
+    assert statements.names() == ['purchase_product', 'take_stock', 'debit_user', 'credit_seller', 'add_buylog']
+    assert ('debit_user', (30, 1)) in statements.calls
+    assert ('credit_seller', (5, 7, 3, 30)) in statements.calls
+
+
+@pytest.mark.parametrize("script, error", [
+    ({'purchase_product': [(0, [])]}, NotFoundError),
+    ({'take_stock': [(0, [])]}, InsufficientStockError),
+    ({'debit_user': [(0, [])], 'get_user': [(1, [(1,)])]}, InsufficientFundsError),
+    ({'debit_user': [(0, [])], 'get_user': [(0, [])]}, NotFoundError),
+])
+def test_checkout_failures_write_no_ledger_entry(fake, script, error):
+    script.setdefault('purchase_product', [(1, [(10, 5, 'shoes', 'Male', 0)])])
+    statements = fake(**script)
+    with pytest.raises(error):
+        ledger.checkout(FakeCursor(), 1, 7, 3)
+    assert 'credit_seller' not in statements.names()
+
+
+def test_settle_folds_the_ledger_syncs_sharded_stock_then_prunes():
+    cursor = FakeCursor()
+    assert ledger.settle(cursor) == {"sellers": 1, "products": 1, "pruned": 1}
+    assert cursor.executed == [ledger.SETTLE_SQL, ledger.SYNC_STOCK_SQL, ledger.PRUNE_SQL]
+
+#--------------------- AGAINST THE DATABASE ---------------#
+# pg_cursor / pg_connect skip these when the .env database cannot be reached
+
+def problems_of(cursor, product_id):
+    problems, _ = ledger.reconcile(cursor)
+    return {name: [row for row in rows if row[0] == product_id] for name, rows in problems.items()}
+
+
+def test_sharded_checkouts_reconcile(pg_cursor):
+    cursor = pg_cursor
+    seller_id, product_id, user_ids = ledger.stress_fixture(cursor, 2)
+    ledger.stress_reset(cursor, seller_id, product_id, user_ids, stock=10, shards=4)
+    for user_id in user_ids:
+        ledger.checkout(cursor, user_id, product_id, 3)
+    with pytest.raises(InsufficientStockError):
+        ledger.checkout(cursor, user_ids[0], product_id, 5)
+    ledger.settle(cursor)
+
+    assert not any(problems_of(cursor, product_id).values())
+    cursor.execute("SELECT stock_quantity FROM product WHERE product_id = %s", (product_id,))
+    assert cursor.fetchone()[0] == 4
+    cursor.execute("SELECT seller_account FROM seller WHERE seller_id = %s", (seller_id,))
+    assert cursor.fetchone()[0] == 6 * ledger.STRESS_PRICE
+
+
+def test_reconcile_flags_a_credit_without_a_purchase(pg_cursor):
+    cursor = pg_cursor
+    seller_id, product_id, user_ids = ledger.stress_fixture(cursor, 1)
+    ledger.stress_reset(cursor, seller_id, product_id, user_ids, stock=10, shards=2)
+    ledger.checkout(cursor, user_ids[0], product_id, 1)
+    cursor.execute("INSERT INTO seller_ledger (seller_id, product_id, quantity, amount) VALUES (%s, %s, 1, 10)",
+                   (seller_id, product_id))
+    cursor.execute("DELETE FROM product_stock_shard WHERE product_id = %s AND shard = 1", (product_id,))
+
+    problems = problems_of(cursor, product_id)
+    assert problems["ledger_vs_buylog"] == [(product_id, 1, 2)]
+    assert problems["shard_count"] == [(product_id, 2, 1)]
+
+
+def test_settle_prunes_old_settled_entries_only(pg_cursor):
+    cursor = pg_cursor
+    seller_id, product_id, user_ids = ledger.stress_fixture(cursor, 1)
+    ledger.stress_reset(cursor, seller_id, product_id, user_ids, stock=10, shards=0)
+    # older than anything else in the ledger, so they are in the first (oldest) PRUNE_BATCH
+    for age, settled in (('30 years', True), ('30 years', False), ('1 hour', True)):
+        cursor.execute("""
+            INSERT INTO seller_ledger (seller_id, product_id, quantity, amount, created_at, settled_at)
+            VALUES (%s, %s, 1, 10, LOCALTIMESTAMP - %s::INTERVAL, CASE WHEN %s THEN LOCALTIMESTAMP END)""",
+                       (seller_id, product_id, age, settled))
+    # the old unsettled entry is settled first, and pruned with the other old one
+    assert ledger.settle(cursor, retention='7 days')["pruned"] >= 2
+    cursor.execute("SELECT COUNT(*), COUNT(*) FILTER (WHERE settled_at IS NULL) FROM seller_ledger WHERE seller_id = %s",
+                   (seller_id,))
+    assert cursor.fetchone() == (1, 0)
+    cursor.execute("SELECT seller_account FROM seller WHERE seller_id = %s", (seller_id,))
+    assert cursor.fetchone()[0] == 10
+
+
+@pytest.mark.parametrize("shards, quantity", [(4, 1), (4, 3)])
+def test_concurrent_checkouts_on_the_same_shards_balance(pg_connect, shards, quantity):
+    # clients on their own connections race for one product's shards; stock covers 3/4 of the demand
+    from transactions import TransactionManager
+    clients, orders = 8, 10
+    stock = clients * orders * quantity * 3 // 4
+    setup = pg_connect()
+    cursor = setup.cursor()
+    seller_id, product_id, user_ids = ledger.stress_fixture(cursor, clients)
+    try:
+        ledger.stress_reset(cursor, seller_id, product_id, user_ids, stock, shards)
+        setup.commit()
+        outcomes = []
+        start = threading.Barrier(clients)
+
+        def client(user_id):
+            db = TransactionManager(pg_connect())
+            start.wait()
+            for _ in range(orders):
+                try:
+                    db.run(lambda: ledger.checkout(db.cursor(), user_id, product_id, quantity))
+                    outcomes.append("bought")
+                except InsufficientStockError:
+                    outcomes.append("sold out")
+            db.conn.close()
+
+        threads = [threading.Thread(target=client, args=(user_id,)) for user_id in user_ids]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        ledger.settle(cursor)
+        setup.commit()
+
+        bought, sold_out = outcomes.count("bought"), outcomes.count("sold out")
+        assert bought + sold_out == clients * orders
+        # every unit sold, none twice: a checkout is only refused once less than `quantity` is left
+        assert bought == stock // quantity
+        assert ledger.stress_verify(cursor, seller_id, product_id, user_ids, stock, quantity, bought, sold_out) == []
+        assert not any(problems_of(cursor, product_id).values())
+    finally:
+        setup.rollback()
+        ledger.stress_teardown(cursor, seller_id, product_id, user_ids)
+        setup.commit()
+        setup.close()
@@ -0,0 +1,103 @@
+import time
+import pandas as pd
+import pytest
+
+import product_columns
+from product_columns import ProductColumns, ChangeFeed, FRAME_COLUMNS
+from facets import FacetIndex
+from rerank import RankFeatures
+
+# The product_change feed is the one source of the in-memory copies of product (columns, facets,
+# re-ranking stock): a change must reach all of them.
+
+
+class FakeCursor:
+    # answers each fetchall with the next scripted result
+    def __init__(self, *results):
+        self.results = list(results)
+
+    def execute(self, query, params=None):
+        pass
+
+    def fetchall(self):
+        return self.results.pop(0)
+
+
+def copies(rows):
+    frame = pd.DataFrame(rows, columns=FRAME_COLUMNS)
+    targets = [ProductColumns(), FacetIndex(), RankFeatures()]
+    for target in targets:
+        target.reload(frame)
+    return targets
+
+
+def test_a_change_reaches_every_copy_of_product():
+    columns, facets, features = targets = copies([
+        (1, 'tee', 'a.jpg', 'Male', '반소매', 1500, 3),
+        (2, 'jeans', 'b.jpg', 'Female', '데님', 8000, 5),
+    ])
+    # product 1 is recategorized, repriced and sold out; product 2 is gone
+    cursor = FakeCursor([(11, 1), (12, 2)], [(1, 'tee', 'a.jpg', 'Male', '데님', 25000, 0)])
+    assert ChangeFeed(10).apply(cursor, targets) == 2
+
+    assert [(row['product_id'], row['category'], row['stock_quantity']) for row in columns.where()] == [(1, '데님', 0)]
+    counts = facets.counts()
+    assert counts['category'] == {'데님': 1}
+    assert counts['price'] == {'200~500': 1}
+    assert features.features([1, 2])[2].tolist() == [0.0, 0.0]
+
+
+def test_applied_changes_are_not_applied_again():
+    targets = copies([(1, 'tee', 'a.jpg', 'Male', '반소매', 1500, 3)])
+    feed = ChangeFeed(0)
+    assert feed.apply(FakeCursor([(1, 1)], [(1, 'tee', 'a.jpg', 'Male', '반소매', 1500, 2)]), targets) == 1
+    # the overlap re-reads change 1, which is skipped
+    assert feed.apply(FakeCursor([(1, 1)]), targets) == 0
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def test_the_listener_follows_committed_writes(pg_connect):
+    conn = pg_connect()
+    cursor = conn.cursor()
+    product_columns.install(cursor)
+    cursor.execute("""
+        INSERT INTO seller (seller_name, password, contact_email) VALUES ('feed-test', 'x', 'feed-test@example.com')
+        RETURNING seller_id""")
+    seller_id = cursor.fetchone()[0]
+    conn.commit()
+    columns, facets, features = targets = [ProductColumns(), FacetIndex(), RankFeatures()]
+    feed = product_columns.load_from_db(cursor, targets)
+    conn.commit()
+    stop = product_columns.start_listening(pg_connect, targets, feed, poll=0.1)
+    try:
+        cursor.execute("""
+            INSERT INTO product (goods_name, image_link, sex, category, price, seller_id, stock_quantity)
+            VALUES ('feed-test', '', 'Unisex', 'feed-test', 10, %s, 3) RETURNING product_id""", (seller_id,))
+        product_id = cursor.fetchone()[0]
+        conn.commit()
+        assert wait_for(lambda: facets.counts()['category'].get('feed-test') == 1)
+        assert len(columns.where(category='feed-test')) == 1
+
+        cursor.execute("UPDATE product SET stock_quantity = 0 WHERE product_id = %s", (product_id,))
+        conn.commit()
+        assert wait_for(lambda: features.features([product_id])[2][0] == 0)
+
+        cursor.execute("DELETE FROM product WHERE product_id = %s", (product_id,))
+        conn.commit()
+        assert wait_for(lambda: not columns.where(category='feed-test'))
+        assert 'feed-test' not in facets.counts()['category']
+    finally:
+        stop.set()
+        conn.rollback()
+        cursor.execute("DELETE FROM product WHERE seller_id = %s", (seller_id,))
+        cursor.execute("DELETE FROM seller WHERE seller_id = %s", (seller_id,))
+        conn.commit()
+        conn.close()
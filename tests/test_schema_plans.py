@@ -0,0 +1,51 @@
+import os
+import pytest
+
+import schema
+
+# The plan checks of `python3 schema.py check`, one test per BE query, against the .env database (skipped
+# when it cannot be reached). Seq scans of tables under schema.SEQ_SCAN_MIN_ROWS rows are allowed, so the
+# plan tests error out instead of passing when schema.PLAN_TABLES hold less than that: load a realistic
+# amount of data with `python3 schema.py check --seed`, or set PLAN_SEED_SCALE (e.g. 0.5) to have the tests
+# do it - it recreates the tables. PLAN_COST_SCALE multiplies every cost budget, like --cost-scale.
+
+COST_SCALE = float(os.getenv('PLAN_COST_SCALE', 1.0))
+
+
+@pytest.fixture(scope='session')
+def plan_data(pg_conn):
+    pg_conn.rollback()
+    if os.getenv('PLAN_SEED_SCALE'):
+        schema.seed(float(os.getenv('PLAN_SEED_SCALE')))
+    pg_conn.autocommit = True
+    try:
+        with pg_conn.cursor() as cursor:
+            cursor.execute("ANALYZE")
+            thin = schema.thin_tables(cursor)
+    finally:
+        pg_conn.autocommit = False
+    if thin:
+        tables = ', '.join(f"{table} ({rows} rows)" for table, rows in thin.items())
+        pytest.fail(f"too little data to check plans (< {schema.SEQ_SCAN_MIN_ROWS} rows): {tables}; "
+                    "load some with `python3 schema.py check --seed` or PLAN_SEED_SCALE", pytrace=False)
+
+
+def test_declared_indexes_exist(pg_cursor):
+    pg_cursor.execute("SELECT indexname FROM pg_indexes WHERE indexname = ANY(%s)", ([name for name, _, _ in schema.INDEXES],))
+    found = {name for (name,) in pg_cursor.fetchall()}
+    missing = [name for name, _, _ in schema.INDEXES if name not in found]
+    assert not missing, f"missing indexes (python3 schema.py create): {', '.join(missing)}"
+
+
+def test_retired_indexes_are_gone(pg_cursor):
+    pg_cursor.execute("SELECT indexname FROM pg_indexes WHERE indexname = ANY(%s)", (list(schema.RETIRED_INDEXES),))
+    assert pg_cursor.fetchall() == []
+
+
+@pytest.mark.parametrize('name', list(schema.PLAN_CHECKS))
+def test_query_plan(plan_data, pg_cursor, name):
+    pg_cursor.execute(schema.PLAN_CHECKS[name][1])
+    params = pg_cursor.fetchone()
+    if params is None or None in params:
+        pytest.skip(f"no sample parameters for {name} in this database")
+    assert schema.check_plans(pg_cursor, [name], COST_SCALE)[name] == []
@@ -0,0 +1,74 @@
+import time
+import threading
+import numpy as np
+import pytest
+from text_batcher import TextEncodeBatcher
+
+
+def embed(texts, batch_size):
+    return np.array([[len(text), batch_size] for text in texts], dtype=np.float32)
+
+
+def test_concurrent_callers_share_a_batch_and_get_their_own_row():
+    batcher = TextEncodeBatcher(embed, max_batch_size=8, max_wait_ms=200)
+    results = {}
+    threads = [threading.Thread(target=lambda i=i: results.__setitem__(i, batcher.encode('x' * i))) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batcher.close()
+    assert {i: int(row[0]) for i, row in results.items()} == {i: i for i in range(8)}
+    assert batcher.metrics()["batches"] < 8
+
+
+def test_an_encoder_error_fails_only_its_batch():
+    def encode(texts, batch_size):
+        if 'bad' in texts:
+            raise ValueError("bad text")
+        return embed(texts, batch_size)
+    batcher = TextEncodeBatcher(encode, max_wait_ms=0)
+    with pytest.raises(ValueError):
+        batcher.encode('bad')
+    assert batcher.encode('good')[0] == 4
+    batcher.close()
+
+
+def test_a_worker_killed_by_a_base_exception_fails_its_callers(monkeypatch):
+    # the worker re-raises the KeyboardInterrupt after failing the futures; keep it out of the report
+    monkeypatch.setattr(threading, 'excepthook', lambda args: None)
+    release = threading.Event()
+    calls = []
+
+    def encode(texts, batch_size):
+        calls.append(texts)
+        if len(calls) == 1:
+            release.wait(5)
+            raise KeyboardInterrupt
+        return embed(texts, batch_size)
+
+    batcher = TextEncodeBatcher(encode, max_batch_size=1, max_wait_ms=0)
+    errors = []
+
+    def search(text):
+        try:
+            batcher.encode(text, timeout=5)
+        except Exception as e:
+            errors.append(e)
+
+    # the first request is being encoded when the second one queues up behind it
+    first = threading.Thread(target=search, args=('first',))
+    first.start()
+    while not calls:
+        time.sleep(0.001)
+    second = threading.Thread(target=search, args=('second',))
+    second.start()
+    while batcher.queue.empty():
+        time.sleep(0.001)
+    release.set()
+    first.join(5)
+    second.join(5)
+    assert [type(e) for e in errors] == [RuntimeError, RuntimeError]
+    # a new worker serves the next request
+    assert batcher.encode('after', timeout=5)[0] == 5
+    batcher.close()
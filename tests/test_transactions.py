@@ -0,0 +1,115 @@
+import pytest
+
+psycopg2 = pytest.importorskip('psycopg2')
+
+from transactions import TransactionManager
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.connection = conn
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, name):
+        self.name = name
+        self.autocommit = True
+        self.commits = 0
+
+    def set_session(self, **kwargs):
+        pass
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+class FakeReplica:
+    def __init__(self, name):
+        self.conn = FakeConnection(name)
+        self.served = 0
+
+    def connection(self):
+        return self.conn
+
+
+class FakePool:
+    def __init__(self, *names):
+        self.replicas = [FakeReplica(name) for name in names]
+        self.down = []
+
+    def __bool__(self):
+        return True
+
+    def candidates(self):
+        return [replica for replica in self.replicas if replica not in self.down]
+
+    def mark_down(self, replica, error):
+        self.down.append(replica)
+
+
+@pytest.fixture
+def db():
+    return TransactionManager(FakeConnection('primary'), replicas=FakePool('r1', 'r2'))
+
+
+def test_a_failed_replica_read_moves_to_the_next_replica(db):
+    served_by = []
+
+    @db.replica_read()
+    def read():
+        served_by.append(db.cursor().connection.name)
+        if served_by[-1] == 'r1':
+            raise psycopg2.OperationalError("r1 went away")
+        return 'rows'
+
+    assert read() == 'rows'
+    assert served_by == ['r1', 'r2']
+    assert [replica.conn.name for replica in db.replicas.down] == ['r1']
+
+
+def test_the_primary_serves_when_no_replica_is_left(db):
+    @db.replica_read()
+    def read():
+        if db.cursor().connection.name != 'primary':
+            raise psycopg2.OperationalError("replica down")
+        return 'rows'
+
+    assert read() == 'rows'
+    assert db.primary_reads == 1
+
+
+def test_a_read_that_committed_a_write_is_not_run_again(db):
+    runs = []
+
+    @db.replica_read()
+    def read_and_log():
+        runs.append(1)
+        with db.scope(pin_reads=False):
+            pass
+        db.cursor()
+        raise psycopg2.OperationalError("replica went away after the log was written")
+
+    with pytest.raises(psycopg2.OperationalError):
+        read_and_log()
+    assert len(runs) == 1
+    assert db.conn.commits == 1
+
+
+def test_an_error_raised_by_the_primary_is_not_a_replica_failure(db):
+    @db.replica_read()
+    def read():
+        with db.scope():
+            raise psycopg2.OperationalError("primary went away")
+
+    with pytest.raises(psycopg2.OperationalError):
+        read()
+    assert db.replicas.down == []
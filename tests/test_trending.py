@@ -0,0 +1,106 @@
+import math
+import numpy as np
+import pytest
+
+import trending
+
+# Accuracy of the sketches against exact counts of the same stream: an in-memory Zipf stream here, the
+# current buylog / searchlog (exact SQL counts) when the .env database is reachable.
+
+N = 10
+NOW = 1_700_000_000.0
+CATEGORIES = ['반소매', '데님', '카디건', '코튼']
+SEXES = ['Male', 'Female', 'Unisex']
+
+
+def zipf_stream(seed, events=50000, keys=5000, a=1.2):
+    # [(key, ts)] with a long tail of keys, timestamps spread over the last three days
+    rng = np.random.default_rng(seed)
+    ranks = rng.zipf(a, size=events * 2)
+    ranks = ranks[ranks <= keys][:events]
+    ts = NOW - rng.uniform(0, 3 * 86400, size=len(ranks))
+    return list(zip(ranks.tolist(), ts.tolist()))
+
+
+def exact_top(counts, n=N):
+    return sorted(counts.items(), key=lambda kv: kv[1], reverse=True)[:n]
+
+
+def assert_accurate(stats):
+    assert stats['recall'] >= 0.9, stats
+    assert stats['mean_rel_error'] < 0.05, stats
+
+
+@pytest.mark.parametrize('half_life_hours', [0, 24])
+def test_top_products_match_exact_counts(half_life_hours):
+    tracker = trending.TrendingTracker(half_life_hours=half_life_hours)
+    tracker.landmark = NOW - 3 * 86400
+    exact = {}
+    for product_id, ts in zipf_stream(seed=1):
+        tracker.record_purchase(product_id, CATEGORIES[product_id % 4], SEXES[product_id % 3], ts=ts)
+        exact[product_id] = exact.get(product_id, 0.0) + math.exp(-tracker.decay_rate * (NOW - ts))
+    assert_accurate(trending.compare(tracker.trending_products(n=N, now=NOW), exact_top(exact)))
+
+
+def test_top_products_per_category_and_sex():
+    tracker = trending.TrendingTracker(half_life_hours=24)
+    tracker.landmark = NOW - 3 * 86400
+    exact = {}
+    for product_id, ts in zipf_stream(seed=2):
+        category, sex = CATEGORIES[product_id % 4], SEXES[product_id % 3]
+        tracker.record_purchase(product_id, category, sex, ts=ts)
+        weight = math.exp(-tracker.decay_rate * (NOW - ts))
+        for key in {(category, None), (None, sex), (category, sex)}:
+            group = exact.setdefault(key, {})
+            group[product_id] = group.get(product_id, 0.0) + weight
+    for (category, sex), counts in exact.items():
+        approx = tracker.trending_products(category=category, sex=sex, n=N, now=NOW)
+        assert_accurate(trending.compare(approx, exact_top(counts)))
+
+
+def test_top_queries_match_exact_counts():
+    tracker = trending.TrendingTracker(half_life_hours=0)
+    exact = {}
+    for rank, ts in zipf_stream(seed=3):
+        query = f"query {rank}"
+        tracker.record_query(query, ts=ts)
+        exact[query] = exact.get(query, 0) + 1
+    assert_accurate(trending.compare(tracker.top_queries(N, now=NOW), exact_top(exact)))
+
+
+def test_renormalizing_keeps_the_ranking():
+    # a year at a one-hour half-life renormalizes many times; the decayed counts stay exact for one key
+    tracker = trending.TrendingTracker(half_life_hours=1)
+    tracker.landmark = NOW - 365 * 86400
+    for day in range(365, 0, -1):
+        tracker.record_purchase(1, '데님', 'Male', ts=NOW - day * 86400)
+    tracker.record_purchase(2, '데님', 'Male', quantity=3, ts=NOW - 3600)
+    tracker.record_purchase(3, '데님', 'Male', ts=NOW - 3600)
+    (first, score), (second, _), (third, _) = tracker.trending_products(n=3, now=NOW)
+    assert (first, second, third) == (2, 3, 1)
+    assert score == pytest.approx(1.5)
+
+
+def test_checkpoint_round_trip(tmp_path):
+    tracker = trending.TrendingTracker(checkpoint_path=str(tmp_path / 'trending.pkl'))
+    tracker.landmark = NOW - 3 * 86400
+    for product_id, ts in zipf_stream(seed=4, events=2000):
+        tracker.record_purchase(product_id, '데님', 'Female', ts=ts)
+        tracker.record_query(f"query {product_id}", ts=ts)
+    tracker.checkpoint()
+    restored = trending.TrendingTracker.load(tracker.checkpoint_path)
+    assert restored.trending_products(sex='Female', now=NOW) == tracker.trending_products(sex='Female', now=NOW)
+    assert restored.top_queries(now=NOW) == tracker.top_queries(now=NOW)
+    assert restored.events == tracker.events
+
+
+def test_bootstrap_matches_exact_sql_counts(pg_conn):
+    tracker = trending.bootstrap_from_db(trending.TrendingTracker(), pg_conn)
+    pg_conn.commit()
+    if not tracker.events:
+        pytest.skip("no buylog / searchlog rows in this database")
+    with pg_conn.cursor() as cursor:
+        cursor.execute("SELECT DISTINCT category FROM product")
+        categories = [category for (category,) in cursor.fetchall()]
+    for name, stats in trending.accuracy_report(tracker, pg_conn, n=N, categories=categories).items():
+        assert stats['recall'] >= 0.9, (name, stats)
@@ -0,0 +1,137 @@
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future
+import numpy as np
+
+# Dynamic micro-batching in front of a text encoder (FashionCLIP's encode_text).
+# Concurrent callers enqueue one text each; a single worker thread waits until either
+# max_batch_size texts are queued or max_wait_ms has passed since the oldest one arrived,
+# encodes them in one forward pass and hands every caller its own row back.
+
+_STOP = object()
+
+
+class TextEncodeBatcher:
+    def __init__(self, encode_fn, max_batch_size=32, max_wait_ms=5, history=1024):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.worker = None
+        # metrics
+        self.requests = 0
+        self.batches = 0
+        self.batch_sizes = {}
+        self.queue_delays = deque(maxlen=history)
+        self.encode_seconds = 0.0
+
+    def _submit(self, texts):
+        # queued under the lock, so a worker that is dying (see _abandon) either sees these items or has
+        # already cleared self.worker and a new one is started for them
+        enqueued = time.perf_counter()
+        futures = [Future() for _ in texts]
+        with self.lock:
+            if self.worker is None:
+                self.worker = threading.Thread(target=self._loop, name="text-batcher", daemon=True)
+                self.worker.start()
+            for text, future in zip(texts, futures):
+                self.queue.put((text, future, enqueued))
+        return futures
+
+    def encode(self, text, timeout=None):
+        # blocks until the batch containing `text` is encoded; returns a 1-D embedding
+        return self._submit([text])[0].result(timeout)
+
+    def encode_many(self, texts, timeout=None):
+        # a caller that already has several texts still shares the forward pass with everyone else
+        return np.stack([future.result(timeout) for future in self._submit(texts)])
+
+    def _collect(self):
+        first = self.queue.get()
+        if first is _STOP:
+            return None
+        batch = [first]
+        deadline = first[2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self.queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _loop(self):
+        batch = []
+        try:
+            while True:
+                batch = self._collect()
+                if batch is None:
+                    return
+                dispatched = time.perf_counter()
+                texts = [text for text, _, _ in batch]
+                try:
+                    embeddings = self.encode_fn(texts, batch_size=len(texts))
+                except Exception as e:
+                    for _, future, _ in batch:
+                        future.set_exception(e)
+                    continue
+                encoded = time.perf_counter()
+                for row, (_, future, _) in zip(embeddings, batch):
+                    future.set_result(row)
+                with self.lock:
+                    self.requests += len(batch)
+                    self.batches += 1
+                    self.batch_sizes[len(batch)] = self.batch_sizes.get(len(batch), 0) + 1
+                    self.queue_delays.extend(dispatched - enqueued for _, _, enqueued in batch)
+                    self.encode_seconds += encoded - dispatched
+        except BaseException as e:
+            # KeyboardInterrupt / SystemExit raised inside encode_fn ends the thread
+            self._abandon(batch or [], e)
+            raise
+
+    def _abandon(self, batch, error):
+        # fail every request the dying worker would have answered, instead of leaving its caller blocked;
+        # the next encode() starts a new worker
+        failure = RuntimeError(f"text encoder worker stopped: {error!r}")
+        with self.lock:
+            self.worker = None
+            pending = list(batch)
+            while True:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _STOP:
+                    pending.append(item)
+        for _, future, _ in pending:
+            if not future.done():
+                future.set_exception(failure)
+
+    def metrics(self):
+        with self.lock:
+            delays = np.array(self.queue_delays) * 1000 if self.queue_delays else np.zeros(1)
+            return {
+                "requests": self.requests,
+                "batches": self.batches,
+                "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+                "max_batch_size": max(self.batch_sizes, default=0),
+                "batch_size_histogram": dict(sorted(self.batch_sizes.items())),
+                "queue_delay_ms_mean": float(delays.mean()),
+                "queue_delay_ms_p50": float(np.percentile(delays, 50)),
+                "queue_delay_ms_p95": float(np.percentile(delays, 95)),
+                "queue_delay_ms_max": float(delays.max()),
+                "encode_ms_per_batch": self.encode_seconds * 1000 / self.batches if self.batches else 0.0
+            }
+
+    def close(self):
+        if self.worker is not None:
+            self.queue.put(_STOP)
+            self.worker.join()
+            self.worker = None
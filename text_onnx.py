@@ -0,0 +1,145 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+# CPU backend for the style-search text encoder: FashionCLIP's text tower exported to ONNX, weights
+# quantized to int8 (dynamic quantization: activations stay float, matmuls run on int8 weights) and run
+# with onnxruntime. Selected in app.py with TEXT_ENCODER=onnx; the image tower stays on FashionCLIP.
+#
+#   python3 text_onnx.py export --out ./data/text-onnx     (needs torch + fashion_clip, once)
+#   python3 text_onnx.py parity --model-dir ./data/text-onnx
+#       cosine similarity of the int8 embeddings against FashionCLIP's, and top-10 overlap on the
+#       catalog; exits 1 below --min-cosine
+#   python3 benchmark.py encoder --model-dir ./data/text-onnx --threads 1 2 4
+
+FP32_MODEL = 'text_tower.onnx'
+INT8_MODEL = 'text_tower.int8.onnx'
+MAX_LENGTH = 77  # CLIP's context length
+
+PARITY_TEXTS = [
+    "oversized black hoodie", "white leather sneakers", "floral summer dress", "slim fit blue jeans",
+    "wool camel coat", "striped cotton t-shirt", "red plaid flannel shirt", "black leather biker jacket",
+    "pleated midi skirt", "running shoes", "cropped knit cardigan", "denim trucker jacket",
+    "linen wide pants", "minimal silver necklace", "canvas tote bag", "padded winter parka",
+    "graphic print sweatshirt", "navy blazer", "vintage washed cap", "chunky platform loafers",
+]
+
+
+def export(out_dir, model_name='fashion-clip', opset=14, per_channel=True):
+    # -> (fp32 path, int8 path); also saves the tokenizer next to them
+    import torch
+    from fashion_clip.fashion_clip import FashionCLIP
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    class TextTower(torch.nn.Module):
+        def __init__(self, clip):
+            super().__init__()
+            self.clip = clip
+
+        def forward(self, input_ids, attention_mask):
+            return self.clip.get_text_features(input_ids=input_ids, attention_mask=attention_mask)
+
+    os.makedirs(out_dir, exist_ok=True)
+    fclip = FashionCLIP(model_name)
+    tokenizer = fclip.preprocess.tokenizer
+    tokens = tokenizer(PARITY_TEXTS[:2], padding=True, truncation=True, max_length=MAX_LENGTH, return_tensors='pt')
+    fp32_path, int8_path = os.path.join(out_dir, FP32_MODEL), os.path.join(out_dir, INT8_MODEL)
+    with torch.no_grad():
+        torch.onnx.export(TextTower(fclip.model.cpu()).eval(), (tokens['input_ids'], tokens['attention_mask']), fp32_path,
+                          input_names=['input_ids', 'attention_mask'], output_names=['text_embeds'],
+                          dynamic_axes={'input_ids': {0: 'batch', 1: 'sequence'},
+                                        'attention_mask': {0: 'batch', 1: 'sequence'},
+                                        'text_embeds': {0: 'batch'}},
+                          opset_version=opset)
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8, per_channel=per_channel)
+    tokenizer.save_pretrained(out_dir)
+    return fp32_path, int8_path
+
+
+class OnnxTextEncoder:
+    def __init__(self, model_dir, threads=0, model_file=INT8_MODEL):
+        # threads: onnxruntime intra-op threads (0: one per physical core). Concurrent searches are
+        # already merged into one call by TextEncodeBatcher, so a single inter-op thread is enough.
+        import onnxruntime as ort
+        from transformers import CLIPTokenizerFast
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(os.path.join(model_dir, model_file), options,
+                                            providers=['CPUExecutionProvider'])
+        self.tokenizer = CLIPTokenizerFast.from_pretrained(model_dir)
+
+    def encode_text(self, text, batch_size=32):
+        # same contract as FashionCLIP.encode_text: list of str -> (N, 512) unnormalized embeddings
+        embeddings = []
+        for start in range(0, len(text), batch_size):
+            tokens = self.tokenizer(list(text[start:start + batch_size]), padding=True, truncation=True,
+                                    max_length=MAX_LENGTH, return_tensors='np')
+            embeddings.append(self.session.run(['text_embeds'], {
+                'input_ids': tokens['input_ids'].astype(np.int64),
+                'attention_mask': tokens['attention_mask'].astype(np.int64)
+            })[0])
+        return np.concatenate(embeddings) if embeddings else np.zeros((0, 512), dtype=np.float32)
+
+
+def normalize(embeddings):
+    return embeddings / np.linalg.norm(embeddings, ord=2, axis=-1, keepdims=True)
+
+
+def parity(reference, candidate, texts, catalog_embeddings=None, k=10):
+    # reference / candidate: objects with encode_text. -> {"cosine": per-text similarity, "overlap": top-k overlap}
+    texts = ['a photo of ' + text for text in texts]
+    expected = normalize(np.asarray(reference.encode_text(texts, batch_size=32), dtype=np.float32))
+    actual = normalize(np.asarray(candidate.encode_text(texts, batch_size=32), dtype=np.float32))
+    result = {"cosine": (expected * actual).sum(-1)}
+    if catalog_embeddings is not None:
+        expected_top = np.argsort(-(catalog_embeddings @ expected.T), axis=0)[:k].T
+        actual_top = np.argsort(-(catalog_embeddings @ actual.T), axis=0)[:k].T
+        result["overlap"] = np.array([len(set(e) & set(a)) / k for e, a in zip(expected_top, actual_top)])
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="int8 ONNX text encoder: export and parity check.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    export_parser = sub.add_parser('export', help="export FashionCLIP's text tower and quantize it to int8")
+    export_parser.add_argument('--out', default='./data/text-onnx')
+    export_parser.add_argument('--opset', type=int, default=14)
+    parity_parser = sub.add_parser('parity', help="compare the int8 embeddings with FashionCLIP's")
+    parity_parser.add_argument('--model-dir', default='./data/text-onnx')
+    parity_parser.add_argument('--model-file', default=INT8_MODEL)
+    parity_parser.add_argument('--texts', default=None, help="file with one query per line (default: built-in set)")
+    parity_parser.add_argument('--catalog-csv', default='./data/itemDB.csv', help="'' to skip the top-k overlap")
+    parity_parser.add_argument('--min-cosine', type=float, default=0.98)
+    parity_parser.add_argument('--threads', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        start_time = time.time()
+        for path in export(args.out, opset=args.opset):
+            print(f"{path}: {os.path.getsize(path) / 2 ** 20:.1f} MiB")
+        print(f"Exported ({round(time.time() - start_time, 2)}s.)")
+        sys.exit(0)
+
+    from fashion_clip.fashion_clip import FashionCLIP
+    texts = PARITY_TEXTS
+    if args.texts:
+        with open(args.texts) as f:
+            texts = [line.strip() for line in f if line.strip()]
+    catalog_embeddings = None
+    if args.catalog_csv and os.path.exists(args.catalog_csv):
+        from catalog_state import Catalog
+        catalog_embeddings = normalize(Catalog.from_csv(args.catalog_csv).embeddings)
+    result = parity(FashionCLIP('fashion-clip'), OnnxTextEncoder(args.model_dir, args.threads, args.model_file),
+                    texts, catalog_embeddings)
+    cosine = result["cosine"]
+    print(f"{len(texts)} queries, cosine vs FashionCLIP: min {cosine.min():.4f}, mean {cosine.mean():.4f}")
+    for text, value in sorted(zip(texts, cosine), key=lambda item: item[1])[:3]:
+        print(f"  lowest: {value:.4f} {text}")
+    if "overlap" in result:
+        print(f"top-10 overlap on the catalog: min {result['overlap'].min():.2f}, mean {result['overlap'].mean():.2f}")
+    sys.exit(0 if cosine.min() >= args.min_cosine else 1)
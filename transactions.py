@@ -0,0 +1,189 @@
+import time
+import random
+import functools
+import threading
+from contextlib import contextmanager
+import psycopg2
+from psycopg2 import errors
+
+# Unit-of-work transaction scoping for BE.
+# The connection runs in autocommit mode, so a plain read is one round trip with no COMMIT.
+# Everything one logical action writes goes through a single scope():
+#
+#     with db.scope():            # or decorate the BE method with @db.transactional()
+#         ...                     # nested scopes join the outermost one
+#
+# The outermost scope commits once (or rolls back on error). transactional() re-runs the whole
+# action when Postgres reports a serialization failure or a deadlock. after_commit() defers
+# in-memory side effects (e.g. trending counters) until the data they describe is committed.
+# replica_read() runs a read-only method on a read replica (if any are configured), failing over to the
+# next replica / the primary; for read_your_writes seconds after a pinning write (purchase, charge, ...)
+# commits, this thread's reads stay on the primary. A failover runs the method again, so it must not
+# write: do the reads in the decorated method and the writes (search logs) in its caller. A method that
+# commits a write anyway is not re-run; its replica error is raised.
+
+RETRYABLE_ERRORS = (errors.SerializationFailure, errors.DeadlockDetected)
+# errors that mean "this replica is unusable right now", not "this query is wrong"
+REPLICA_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+
+class TransactionManager:
+    def __init__(self, conn=None, retries=3, backoff=0.02, replicas=None, read_your_writes=5.0):
+        # conn may be attached later, so BE methods can be decorated before anything connects
+        self.conn = None
+        if conn is not None:
+            self.attach(conn)
+        self.retries = retries
+        self.backoff = backoff
+        self.replicas = replicas
+        self.read_your_writes = read_your_writes
+        self.local = threading.local()
+        # one connection: scopes from different threads must not interleave, and autocommit reads wait
+        # for an open scope to finish
+        self.lock = threading.RLock()
+        self.commits = 0
+        self.rollbacks = 0
+        self.retried = 0
+        self.primary_reads = 0
+
+    def attach(self, conn):
+        conn.autocommit = True
+        self.conn = conn
+
+    def in_scope(self):
+        return getattr(self.local, 'depth', 0) > 0
+
+    def cursor(self):
+        # the cursor of the current scope, the replica cursor of a replica_read, or a fresh autocommit cursor
+        if self.in_scope():
+            return self.local.cursor
+        read_cursor = getattr(self.local, 'read_cursor', None)
+        if read_cursor is not None:
+            return read_cursor
+        # not while another thread's scope has the connection out of autocommit (a read there would run
+        # inside that transaction, or open an implicit one after its commit). Background jobs should use a
+        # TransactionManager of their own rather than share one.
+        with self.lock:
+            if not self.conn.autocommit:
+                raise RuntimeError("connection is not in autocommit mode outside of a scope")
+            return self.conn.cursor()
+
+    def after_commit(self, fn):
+        if self.in_scope():
+            self.local.callbacks.append(fn)
+        else:
+            fn()
+
+    @contextmanager
+    def scope(self, readonly=False, isolation_level=None, pin_reads=True):
+        if self.in_scope():
+            self.local.depth += 1
+            try:
+                yield self.local.cursor
+            finally:
+                self.local.depth -= 1
+            return
+
+        try:
+            with self._transaction(readonly, isolation_level, pin_reads) as cursor:
+                yield cursor
+        except REPLICA_ERRORS as e:
+            # everything in a scope runs on the primary: replica_read must not take this for a replica failure
+            self.local.primary_error = e
+            raise
+
+    @contextmanager
+    def _transaction(self, readonly, isolation_level, pin_reads):
+        with self.lock:
+            self.conn.set_session(isolation_level=isolation_level, readonly=readonly, autocommit=False)
+            self.local.depth = 1
+            self.local.cursor = self.conn.cursor()
+            self.local.callbacks = []
+            try:
+                yield self.local.cursor
+                self.conn.commit()
+                self.commits += 1
+                if not readonly:
+                    self.local.writes = getattr(self.local, 'writes', 0) + 1
+                if pin_reads and not readonly:
+                    self.local.last_write = time.monotonic()
+            except BaseException:
+                self.conn.rollback()
+                self.rollbacks += 1
+                self.local.callbacks = []
+                raise
+            finally:
+                callbacks = self.local.callbacks
+                self.local.cursor.close()
+                self.local.depth = 0
+                self.local.cursor = None
+                self.local.callbacks = []
+                self.conn.set_session(isolation_level='DEFAULT', readonly='DEFAULT', autocommit=True)
+            for fn in callbacks:
+                fn()
+
+    def run(self, fn, *args, readonly=False, isolation_level=None, pin_reads=True, **kwargs):
+        # run fn inside one transaction, retrying the whole unit on serialization failures / deadlocks
+        if self.in_scope():
+            return fn(*args, **kwargs)
+        attempt = 0
+        while True:
+            try:
+                with self.scope(readonly=readonly, isolation_level=isolation_level, pin_reads=pin_reads):
+                    return fn(*args, **kwargs)
+            except RETRYABLE_ERRORS:
+                attempt += 1
+                if attempt > self.retries:
+                    raise
+                self.retried += 1
+                time.sleep(self.backoff * (2 ** (attempt - 1)) * (1 + random.random()))
+
+    def transactional(self, readonly=False, isolation_level=None, pin_reads=True):
+        # pin_reads=False for writes nobody reads back right away (search logs)
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                return self.run(func, *args, readonly=readonly, isolation_level=isolation_level,
+                                pin_reads=pin_reads, **kwargs)
+            return wrapper
+        return decorator
+
+    def _pinned_to_primary(self):
+        last_write = getattr(self.local, 'last_write', None)
+        return last_write is not None and time.monotonic() - last_write < self.read_your_writes
+
+    def replica_read(self):
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if (not self.replicas or self.in_scope() or self._pinned_to_primary()
+                        or getattr(self.local, 'read_cursor', None) is not None):
+                    return func(*args, **kwargs)
+                for replica in self.replicas.candidates():
+                    writes = getattr(self.local, 'writes', 0)
+                    try:
+                        self.local.read_cursor = replica.connection().cursor()
+                        result = func(*args, **kwargs)
+                        replica.served += 1
+                        return result
+                    except REPLICA_ERRORS as e:
+                        if getattr(self.local, 'primary_error', None) is e:
+                            raise  # raised by the primary (e.g. a write nested in the read, or its commit)
+                        self.replicas.mark_down(replica, e)
+                        if getattr(self.local, 'writes', 0) != writes:
+                            raise  # a write already committed; running func again would repeat it
+                    finally:
+                        self.local.read_cursor = None
+                        self.local.primary_error = None
+                # no healthy replica left
+                self.primary_reads += 1
+                return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def stats(self):
+        stats = {"commits": self.commits, "rollbacks": self.rollbacks, "retries": self.retried}
+        if self.replicas:
+            stats["primary_fallback_reads"] = self.primary_reads
+            stats["replicas"] = self.replicas.status()
+        return stats
@@ -0,0 +1,293 @@
+import os
+import math
+import time
+import pickle
+import hashlib
+import threading
+import numpy as np
+
+# Streaming "what's hot" counters.
+# Purchases and searches are fed in as they are written (see BE.purchase / BE.log_search),
+# so trending lists never need a GROUP BY over buylog / searchlog.
+# Counts are exponentially time-decayed with forward decay: an event at time t is stored with
+# weight exp(lambda * (t - landmark)), so every stored value decays at the same rate and can be
+# compared without touching it again. Reading multiplies by exp(-lambda * (now - landmark)).
+
+#--------------------- SKETCHES ---------------------------#
+
+class CountMinSketch:
+    def __init__(self, width=4096, depth=4):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.float64)
+
+    def _columns(self, key):
+        # one stable digest per key (python's hash() is salted per process, which breaks checkpoints)
+        digest = hashlib.blake2b(repr(key).encode('utf-8'), digest_size=4 * self.depth).digest()
+        return [int.from_bytes(digest[4 * i:4 * i + 4], 'little') % self.width for i in range(self.depth)]
+
+    def add(self, key, weight=1.0):
+        cols = self._columns(key)
+        rows = range(self.depth)
+        self.table[rows, cols] += weight
+        return float(self.table[rows, cols].min())
+
+    def estimate(self, key):
+        return float(self.table[range(self.depth), self._columns(key)].min())
+
+    def scale(self, factor):
+        self.table *= factor
+
+
+class TopK:
+    # keeps the k heaviest keys seen so far; values are sketch estimates at their last update
+    def __init__(self, k):
+        self.k = k
+        self.items = {}
+
+    def offer(self, key, value):
+        if key in self.items or len(self.items) < self.k:
+            self.items[key] = value
+            return
+        weakest = min(self.items, key=self.items.get)
+        if value > self.items[weakest]:
+            del self.items[weakest]
+            self.items[key] = value
+
+    def scale(self, factor):
+        for key in self.items:
+            self.items[key] *= factor
+
+    def top(self, n=None):
+        ranked = sorted(self.items.items(), key=lambda kv: kv[1], reverse=True)
+        return ranked[:n] if n else ranked
+
+#--------------------- TRACKER ----------------------------#
+
+class TrendingTracker:
+    # rescale everything once stored weights reach exp(RENORMALIZE_AT)
+    RENORMALIZE_AT = 60.0
+
+    def __init__(self, half_life_hours=24, top_k=20, width=4096, depth=4,
+                 checkpoint_path=None, checkpoint_interval=300):
+        self.half_life_hours = half_life_hours
+        self.decay_rate = math.log(2) / (half_life_hours * 3600) if half_life_hours else 0.0
+        self.top_k = top_k
+        self.landmark = time.time()
+        self.products = CountMinSketch(width, depth)
+        self.queries = CountMinSketch(width, depth)
+        self.product_groups = {}
+        self.query_top = TopK(top_k)
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self.events = 0
+        self.lock = threading.Lock()
+        self._stop = None
+
+    def _weight(self, amount, ts):
+        exponent = self.decay_rate * (ts - self.landmark)
+        if exponent > self.RENORMALIZE_AT:
+            self._renormalize(ts)
+            exponent = 0.0
+        return amount * math.exp(exponent)
+
+    def _renormalize(self, ts):
+        factor = math.exp(-self.decay_rate * (ts - self.landmark))
+        for sketch in (self.products, self.queries):
+            sketch.scale(factor)
+        for top in list(self.product_groups.values()) + [self.query_top]:
+            top.scale(factor)
+        self.landmark = ts
+
+    def _group(self, key):
+        if key not in self.product_groups:
+            self.product_groups[key] = TopK(self.top_k)
+        return self.product_groups[key]
+
+    @staticmethod
+    def _group_key(category=None, sex=None):
+        return (category, sex)
+
+    def record_purchase(self, product_id, category, sex, quantity=1, ts=None):
+        ts = time.time() if ts is None else ts
+        with self.lock:
+            estimate = self.products.add(product_id, self._weight(quantity, ts))
+            for key in {(None, None), (category, None), (None, sex), (category, sex)}:
+                self._group(key).offer(product_id, estimate)
+            self.events += 1
+
+    def record_query(self, search_query, ts=None):
+        ts = time.time() if ts is None else ts
+        with self.lock:
+            estimate = self.queries.add(search_query, self._weight(1, ts))
+            self.query_top.offer(search_query, estimate)
+            self.events += 1
+
+    def _decayed(self, ranked, now):
+        factor = math.exp(-self.decay_rate * (now - self.landmark))
+        return [(key, value * factor) for key, value in ranked]
+
+    def trending_products(self, category=None, sex=None, n=10, now=None):
+        # [(product_id, decayed purchase count)], best first
+        now = time.time() if now is None else now
+        with self.lock:
+            group = self.product_groups.get(self._group_key(category, sex))
+            ranked = group.top(n) if group else []
+            return self._decayed(ranked, now)
+
+    def top_queries(self, n=10, now=None):
+        # [(search_query, decayed search count)], best first
+        now = time.time() if now is None else now
+        with self.lock:
+            return self._decayed(self.query_top.top(n), now)
+
+    #--------------------- CHECKPOINTS ------------------------#
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['lock'], state['_stop']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+        self._stop = None
+
+    def checkpoint(self, path=None):
+        path = path or self.checkpoint_path
+        if not path:
+            return
+        with self.lock:
+            payload = pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            tracker = pickle.load(f)
+        tracker.checkpoint_path = path
+        return tracker
+
+    def start_checkpointing(self):
+        if not self.checkpoint_path or self._stop:
+            return
+        self._stop = stop = threading.Event()
+
+        def loop():
+            while not stop.wait(self.checkpoint_interval):
+                try:
+                    self.checkpoint()
+                except OSError as e:
+                    print(f"Trending checkpoint failed: {e}")
+
+        threading.Thread(target=loop, name="trending-checkpoint", daemon=True).start()
+
+    def stop_checkpointing(self):
+        if self._stop:
+            self._stop.set()
+            self._stop = None
+        self.checkpoint()
+
+#--------------------- DB BOOTSTRAP / ACCURACY ------------#
+
+# one searchlog row is written per returned product, so a search is counted by its rank-1 result
+SEARCH_EVENTS_SQL = """
+    SELECT sl.search_query, sl.search_date
+    FROM searchlog sl
+    JOIN searchresult sr ON sr.searchlog_id = sl.searchlog_id AND sr.rank = 1"""
+
+PURCHASE_EVENTS_SQL = """
+    SELECT b.product_id, p.category, p.sex, b.quantity, b.purchase_date
+    FROM buylog b
+    JOIN product p ON p.product_id = b.product_id"""
+
+
+def bootstrap_from_db(tracker, conn, batch_size=10000):
+    # cold start without a checkpoint: replay the logs once through a server-side cursor
+    # (needs an open transaction; committing is left to the caller)
+    with conn.cursor(name="trending_bootstrap") as cur:
+        cur.itersize = batch_size
+        cur.execute(PURCHASE_EVENTS_SQL)
+        for product_id, category, sex, quantity, purchase_date in cur:
+            tracker.record_purchase(product_id, category, sex, quantity, ts=purchase_date.timestamp())
+    with conn.cursor(name="trending_bootstrap") as cur:
+        cur.itersize = batch_size
+        cur.execute(SEARCH_EVENTS_SQL)
+        for search_query, search_date in cur:
+            tracker.record_query(search_query, ts=search_date.timestamp())
+    return tracker
+
+
+def exact_trending_products(cursor, decay_rate, category=None, sex=None, n=10):
+    cursor.execute("""
+        SELECT b.product_id,
+               SUM(b.quantity * EXP(-%s * EXTRACT(EPOCH FROM (LOCALTIMESTAMP - b.purchase_date)))) AS score
+        FROM buylog b
+        JOIN product p ON p.product_id = b.product_id
+        WHERE (%s IS NULL OR p.category = %s) AND (%s::product_sex_type IS NULL OR p.sex = %s)
+        GROUP BY b.product_id
+        ORDER BY score DESC
+        LIMIT %s""", (decay_rate, category, category, sex, sex, n))
+    return [(product_id, float(score)) for product_id, score in cursor.fetchall()]
+
+
+def exact_top_queries(cursor, decay_rate, n=10):
+    cursor.execute(f"""
+        SELECT q.search_query,
+               SUM(EXP(-%s * EXTRACT(EPOCH FROM (LOCALTIMESTAMP - q.search_date)))) AS score
+        FROM ({SEARCH_EVENTS_SQL}) q
+        GROUP BY q.search_query
+        ORDER BY score DESC
+        LIMIT %s""", (decay_rate, n))
+    return [(query, float(score)) for query, score in cursor.fetchall()]
+
+
+def compare(approx, exact):
+    # recall of the exact top-n and mean relative error of the sketch estimates on it
+    if not exact:
+        return {"recall": 1.0, "mean_rel_error": 0.0, "n": 0}
+    approx = dict(approx)
+    hits = [key for key, _ in exact if key in approx]
+    errors = [abs(approx[key] - score) / score for key, score in exact if key in approx and score > 0]
+    return {
+        "recall": len(hits) / len(exact),
+        "mean_rel_error": sum(errors) / len(errors) if errors else 0.0,
+        "n": len(exact)
+    }
+
+
+def accuracy_report(tracker, conn, n=10, categories=(), sexes=('Male', 'Female', 'Unisex')):
+    cursor = conn.cursor()
+    now = time.time()
+    report = {"queries": compare(tracker.top_queries(n, now=now), exact_top_queries(cursor, tracker.decay_rate, n))}
+    report["products"] = compare(tracker.trending_products(n=n, now=now),
+                                 exact_trending_products(cursor, tracker.decay_rate, n=n))
+    for category in categories:
+        report[f"category={category}"] = compare(tracker.trending_products(category=category, n=n, now=now),
+                                                 exact_trending_products(cursor, tracker.decay_rate, category=category, n=n))
+    for sex in sexes:
+        report[f"sex={sex}"] = compare(tracker.trending_products(sex=sex, n=n, now=now),
+                                       exact_trending_products(cursor, tracker.decay_rate, sex=sex, n=n))
+    conn.commit()
+    cursor.close()
+    return report
+
+
+if __name__ == "__main__":
+    # replay the current logs into a fresh tracker and check it against exact SQL counts
+    from database_setup import conn
+
+    start_time = time.time()
+    tracker = bootstrap_from_db(TrendingTracker(), conn)
+    conn.commit()
+    print("Trending bootstrap done!", f"({round(time.time()-start_time, 2)}s., {tracker.events} events)")
+    with conn.cursor() as cur:
+        cur.execute("SELECT DISTINCT category FROM product")
+        categories = [row[0] for row in cur.fetchall()]
+    conn.commit()
+    for name, stats in accuracy_report(tracker, conn, categories=categories).items():
+        print(f"{name}: recall@{stats['n']}={stats['recall']:.3f}, mean relative error={stats['mean_rel_error']:.4f}")
+    conn.close()
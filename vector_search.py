@@ -0,0 +1,200 @@
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+
+# Exact (brute-force) cosine top-k over the catalog embedding matrix, split into row shards.
+# Each shard is scored with one matrix product and reduced with argpartition, so no worker ever
+# sorts more than k * n_shards candidates; the per-shard winners are merged at the end.
+#   mode='thread'  : shards are views of one matrix, scored by a thread pool (BLAS releases the GIL)
+#   mode='process' : the matrix lives in a SharedMemory block that worker processes attach to once, or, when
+#                    it was loaded from an .npy file (a published catalog generation), workers mmap that file.
+#                    Workers are spawned, and spawned processes re-run the __main__ script as __mp_main__:
+#                    a script using this mode must keep its startup under `if __name__ == '__main__'`
+#                    (main.py imports app.py only there).
+
+
+def top_k(scores, k):
+    # scores: (Q, N) -> (indices, values) of the k best per row, best first
+    k = min(k, scores.shape[1])
+    if k < scores.shape[1]:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    values = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-values, axis=1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(values, order, axis=1)
+
+
+def score_shard(matrix, start, stop, queries, k):
+    indices, values = top_k(queries @ matrix[start:stop].T, k)
+    return indices + start, values
+
+#--------------------- SCORE FUSION -----------------------#
+# Multi-phrase queries ("oversized" + "black" - "logo"): every phrase is one row of `queries`,
+# weights may be negative.
+
+STATS_SAMPLE = 20000  # catalog rows behind the per-phrase score statistics
+
+
+def score_stats(matrix, sample=STATS_SAMPLE):
+    # mean and covariance of (a strided sample of) the catalog rows: phrase q scores the catalog with
+    # mean q . mean and variance q^T cov q
+    rows = np.asarray(matrix[::max(1, -(-len(matrix) // sample))], dtype=np.float64)
+    mean = rows.mean(0)
+    centered = rows - mean
+    return mean, centered.T @ centered / max(1, len(rows) - 1)
+
+
+def fuse_weighted_sum(queries, weights, stats=None):
+    # sum_i w_i * (q_i . x) == (sum_i w_i * q_i) . x, so the weighted sum needs a single query vector.
+    # With stats (score_stats), each phrase's scores are z-normalized before summing, so a phrase whose
+    # cosines spread wider does not drown out the others; that only rescales q_i and shifts every score by
+    # the same constant. The sum is mapped back onto the cosine scale of an average phrase (a single phrase
+    # keeps its plain cosine). -> (query vector, score offset)
+    weights = np.asarray(weights, dtype=np.float64)
+    if stats is None:
+        return (weights @ queries).astype(queries.dtype), 0.0
+    mean, cov = stats
+    phrases = queries.astype(np.float64)
+    mu = phrases @ mean
+    sigma = np.sqrt(np.maximum(np.einsum('id,de,ie->i', phrases, cov, phrases), 1e-12))
+    total = np.abs(weights).sum() or 1.0
+    scale = (np.abs(weights) @ sigma) / total ** 2
+    query = scale * ((weights / sigma) @ phrases)
+    offset = (np.abs(weights) @ mu) / total - scale * (weights * mu / sigma).sum()
+    return query.astype(queries.dtype), float(offset)
+
+
+def fuse_rrf(indices, weights, k, rrf_k=60):
+    # reciprocal rank fusion of per-query top lists (Q, N): sum_i w_i / (rrf_k + rank_i)
+    contributions = np.asarray(weights, dtype=np.float64)[:, None] / (rrf_k + np.arange(1, indices.shape[1] + 1))
+    ids, inverse = np.unique(indices.ravel(), return_inverse=True)
+    fused = np.bincount(inverse.ravel(), weights=contributions.ravel(), minlength=len(ids))
+    # items only the negative phrases found (or that they outweigh) are dropped
+    keep = fused > 0
+    ids, fused = ids[keep], fused[keep]
+    order, values = top_k(fused[np.newaxis, :], k)
+    return ids[order[0]], values[0]
+
+#--------------------- PROCESS WORKERS --------------------#
+
+_worker = {}
+
+
+def _attach(name, shape, dtype):
+    try:
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # python < 3.13
+        shm = shared_memory.SharedMemory(name=name)
+    _worker['shm'] = shm
+    _worker['matrix'] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _map_file(path, shape, dtype):
+    matrix = np.load(path, mmap_mode='r')
+    if matrix.shape != tuple(shape) or matrix.dtype != dtype:
+        raise ValueError(f"{path}: expected {shape} {dtype}, found {matrix.shape} {matrix.dtype}")
+    _worker['matrix'] = matrix
+
+
+def _score_attached(start, stop, queries, k):
+    return score_shard(_worker['matrix'], start, stop, queries, k)
+
+#--------------------- INDEX ------------------------------#
+
+class ShardedIndex:
+    def __init__(self, matrix, n_workers=None, n_shards=None, mode='thread', dtype=np.float32, path=None):
+        # path: the .npy file `matrix` was loaded from; in process mode workers map it instead of a copy
+        self.n_workers = max(1, n_workers or os.cpu_count() or 1)
+        self.mode = mode
+        if getattr(matrix, 'dtype', None) != np.dtype(dtype):
+            path = None  # workers would have to convert the file anyway
+        matrix = np.ascontiguousarray(matrix, dtype=dtype)
+        self.shape = matrix.shape
+        self.dtype = matrix.dtype
+        n_shards = min(n_shards or self.n_workers, max(1, self.shape[0]))
+        bounds = np.linspace(0, self.shape[0], n_shards + 1).astype(int)
+        self.shards = list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+        self.shm = None
+        self.executor = None
+        self.stats = None
+
+        if mode == 'process' and path:
+            self.matrix = matrix
+            self.executor = ProcessPoolExecutor(max_workers=self.n_workers, mp_context=get_context('spawn'),
+                                                initializer=_map_file, initargs=(path, self.shape, self.dtype))
+        elif mode == 'process':
+            self.shm = shared_memory.SharedMemory(create=True, size=max(1, matrix.nbytes))
+            try:
+                self.matrix = np.ndarray(self.shape, dtype=self.dtype, buffer=self.shm.buf)
+                self.matrix[:] = matrix
+                self.executor = ProcessPoolExecutor(max_workers=self.n_workers, mp_context=get_context('spawn'),
+                                                    initializer=_attach, initargs=(self.shm.name, self.shape, self.dtype))
+            except BaseException:
+                self.close()
+                raise
+        elif mode == 'thread':
+            self.matrix = matrix
+            if self.n_workers > 1 and len(self.shards) > 1:
+                self.executor = ThreadPoolExecutor(max_workers=self.n_workers, thread_name_prefix="vector-search")
+        else:
+            raise ValueError(f"Unknown search mode: {mode}")
+
+    def __len__(self):
+        return self.shape[0]
+
+    def search(self, queries, k):
+        # queries: (D,) or (Q, D), already L2-normalized -> (indices, scores) with shape (k,) or (Q, k)
+        single = np.ndim(queries) == 1
+        queries = np.atleast_2d(np.asarray(queries, dtype=self.dtype))
+        if self.executor is None:
+            parts = [score_shard(self.matrix, start, stop, queries, k) for start, stop in self.shards]
+        elif self.mode == 'process':
+            futures = [self.executor.submit(_score_attached, start, stop, queries, k) for start, stop in self.shards]
+            parts = [f.result() for f in futures]
+        else:
+            futures = [self.executor.submit(score_shard, self.matrix, start, stop, queries, k) for start, stop in self.shards]
+            parts = [f.result() for f in futures]
+
+        # merge: the global top-k is among the per-shard top-k lists
+        candidates = np.concatenate([indices for indices, _ in parts], axis=1)
+        values = np.concatenate([values for _, values in parts], axis=1)
+        order, scores = top_k(values, k)
+        indices = np.take_along_axis(candidates, order, axis=1)
+        return (indices[0], scores[0]) if single else (indices, scores)
+
+    def score_stats(self):
+        # on the first fused search: a D x D covariance over at most STATS_SAMPLE rows
+        if self.stats is None:
+            self.stats = score_stats(self.matrix)
+        return self.stats
+
+    def search_fused(self, queries, weights, k, method='sum', depth=None, rrf_k=60, normalize=True):
+        # queries: (Q, D) L2-normalized phrase embeddings -> fused (indices, scores), best first
+        # normalize: z-normalize every phrase's scores before the weighted sum (see fuse_weighted_sum)
+        queries = np.atleast_2d(np.asarray(queries, dtype=self.dtype))
+        if method == 'sum':
+            query, offset = fuse_weighted_sum(queries, weights, self.score_stats() if normalize else None)
+            indices, scores = self.search(query, k)
+            return indices, scores + offset
+        if method == 'rrf':
+            # one pass scores every phrase; each phrase contributes its top `depth`
+            indices, _ = self.search(queries, depth or max(4 * k, 50))
+            return fuse_rrf(indices, weights, k, rrf_k)
+        raise ValueError(f"Unknown fusion method: {method}")
+
+    def close(self):
+        # the SharedMemory block is unlinked even if the pool fails to shut down or a view is still exported
+        try:
+            if self.executor:
+                self.executor.shutdown(wait=True)
+        finally:
+            self.executor = None
+            if self.shm:
+                shm, self.shm = self.shm, None
+                self.matrix = None
+                try:
+                    shm.close()
+                finally:
+                    shm.unlink()